@@ -1,11 +1,12 @@
 import os
 import re
-import csv
 import math
 import random
 from datetime import datetime
 
+from structure.instance import compactIntegerDistances
 from structure import solution
+from structure import evaluations
 
 from constructives import cgrasp
 try:
@@ -13,6 +14,10 @@ try:
 except ImportError:
     cgr2 = None  # fallback
 
+from experiments import runner
+from experiments import sink
+from experiments import store
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 os.chdir(BASE_DIR)
 
@@ -31,6 +36,9 @@ SEED = 12345
 
 PICK_MODE = "rand"  # "first" o "rand"
 
+JOB_WORKERS = 1     # procesos ejecutando jobs (instancia, método, param, iter)
+RESUME = False      # True: continúa una ejecución cortada (salta las iteraciones ya guardadas)
+
 EPS = 1e-9
 
 # -----------------------
@@ -70,7 +78,9 @@ def load_ran_instance(path, p):
         i, j, val = ln.split()
         i = int(i); j = int(j); val = float(val)
         d[i][j] = d[j][i] = val
-    return {"name": os.path.basename(path), "n": n, "p": p, "d": d, "dataset": "Ran"}
+    inst = {"name": os.path.basename(path), "n": n, "p": p, "d": d, "dataset": "Ran"}
+    compactIntegerDistances(inst)  # distancias enteras: filas int16/int32 y cubetas en solution
+    return inst
 
 def load_instance(dataset, path, p):
     if dataset == "Geo":
@@ -116,16 +126,6 @@ def check_solution(sol):
     of_eval = solution.evaluate(sol)
     assert abs(sol["of"] - of_eval) <= 1e-6, (sol["of"], of_eval)
 
-def write_csv(path, rows):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", newline="", encoding="utf-8") as f:
-        if not rows:
-            return
-        fieldnames = list(rows[0].keys())
-        w = csv.DictWriter(f, fieldnames=fieldnames)
-        w.writeheader()
-        w.writerows(rows)
-
 # -----------------------
 # Ejecución 1 iteración (solo constructivo)
 # -----------------------
@@ -167,7 +167,7 @@ def build_12_instance_plan():
             m_first = int(round(0.1 * n))
             path_first = pick_one_from_range(
                 files, 0, 10,
-                seed_key=hash((dataset, n, "first10")) % 10**6
+                seed_key=runner.jobSeed(0, dataset, n, "first10") % 10**6
             )
             plan.append({
                 "dataset": dataset, "n": n, "m": m_first,
@@ -178,7 +178,7 @@ def build_12_instance_plan():
             m_second = int(round(0.3 * n))
             path_second = pick_one_from_range(
                 files, 10, 20,
-                seed_key=hash((dataset, n, "second10")) % 10**6
+                seed_key=runner.jobSeed(0, dataset, n, "second10") % 10**6
             )
             plan.append({
                 "dataset": dataset, "n": n, "m": m_second,
@@ -191,75 +191,93 @@ def build_12_instance_plan():
 # -----------------------
 # Experimento principal
 # -----------------------
+# columnas de cgr_cgr2_iterlog.csv que identifican una iteración (+ "of", distance_evals, move_evals)
+ITER_KEY = ("inst_idx", "dataset", "group", "instance", "n", "m", "method", "param", "iter")
+
+
+def run_job(job):
+    # un job = 1 construcción; cada iteración fija su propia semilla (run_constructive)
+    inst = runner.cachedInstance((job["path"], job["m"]), load_instance, job["dataset"], job["path"], job["m"])
+    counts = evaluations.snapshot()
+    ofv = run_constructive(inst, job["method"], job["param"], job["iter"])
+    return {"of": ofv, **evaluations.since(counts)}
+
+
+def build_jobs(plan):
+    jobs = []
+    for inst_idx, item in enumerate(plan, start=1):
+        for method in ["CGR", "CGR2"]:
+            for param in PARAMS:
+                for it in range(1, ITERS + 1):
+                    jobs.append({**item, "inst_idx": inst_idx, "instance": os.path.basename(item["path"]),
+                                 "method": method, "param": param, "iter": it, "seed": SEED})
+    return jobs
+
+
 def experiment_cgr_vs_cgr2_12inst():
     log("== Experimento: CGR vs CGR2 (12 instancias, params 0.1..0.9) ==")
     log(f"CWD: {os.getcwd()}")
     os.makedirs("results", exist_ok=True)
 
-    iter_rows = []      # guarda cada iteración (lo que pediste)
-    summary_rows = []   # best por instancia/metodo/param
+    iterlog_path = os.path.join("results", "cgr_cgr2_iterlog.csv")
+    summary_path = os.path.join("results", "cgr_cgr2_summary.csv")
+
+    db = store.openStore()  # results/results.sqlite
+    # solo append: cada iteración (lo que pediste) y el best por instancia/metodo/param
+    iter_sink = sink.openSink(iterlog_path, ITER_KEY, resume=RESUME, store=db)
+    summary_sink = sink.openSink(summary_path, ("dataset", "instance", "method", "param"),
+                                 resume=RESUME, store=db)
 
     plan = build_12_instance_plan()
     log(f"Instancias seleccionadas: {len(plan)} (esperadas 12)")
 
+    def on_instance(inst_idx, done):
+        item = done[0][0]
+        dataset, n, m, group, name = item["dataset"], item["n"], item["m"], item["group"], item["instance"]
+        log(f"[{inst_idx}/12] {dataset}|n={n}|m={m}|{name} (grupo={group})")
 
-    for inst_idx, item in enumerate(plan, start=1):
-        dataset, n, m, group, path = item["dataset"], item["n"], item["m"], item["group"], item["path"]
-        inst = load_instance(dataset, path, p=m)
-        inst_id = f"{dataset}|n={n}|m={m}|{inst['name']}"
-
-        log(f"[{inst_idx}/12] {inst_id} (grupo={group})")
+        vals = {}
+        for job, res in done:
+            vals.setdefault((job["method"], job["param"]), []).append(res["of"])
 
+        summary_rows = []
         for method in ["CGR", "CGR2"]:
+            rows_this = []
             for param in PARAMS:
-                vals = []
-                for it in range(1, ITERS + 1):
-                    ofv = run_constructive(inst, method, param, it)
-                    vals.append(ofv)
-
-                    iter_rows.append({
-                        "inst_idx": inst_idx,
-                        "dataset": dataset,
-                        "group": group,
-                        "instance": inst["name"],
-                        "n": n,
-                        "m": m,
-                        "method": method,
-                        "param": param,
-                        "iter": it,
-                        "of": ofv,
-                    })
-
-                summary_rows.append({
+                rows_this.append({
                     "inst_idx": inst_idx,
                     "dataset": dataset,
                     "group": group,
-                    "instance": inst["name"],
+                    "instance": name,
                     "n": n,
                     "m": m,
                     "method": method,
                     "param": param,
-                    "best_of": max(vals),
+                    "best_of": max(vals[(method, param)]),
                     "is_best_param": 0,
                 })
 
-
-            rows_this = [r for r in summary_rows
-                         if r["inst_idx"] == inst_idx and r["method"] == method]
-
             best_val = max(r["best_of"] for r in rows_this)
 
             for r in rows_this:
                 r["is_best_param"] = 1 if abs(r["best_of"] - best_val) < 1e-9 else 0
+            summary_rows.extend(rows_this)
 
-        # guardado parcial
-        write_csv(os.path.join("results", "cgr_cgr2_iterlog.csv"), iter_rows)
-        write_csv(os.path.join("results", "cgr_cgr2_summary.csv"), summary_rows)
+        # guardado incremental (resume: solo las filas nuevas)
+        sink.append(summary_sink, sink.newRows(summary_sink, summary_rows))
         log("  [SAVE] CSVs actualizados")
 
+    try:
+        runner.runJobs(build_jobs(plan), run_job, workers=JOB_WORKERS,
+                       group_key=lambda job: job["inst_idx"], on_group=on_instance, sink=iter_sink)
+    finally:
+        sink.closeSink(iter_sink)
+        sink.closeSink(summary_sink)
+        store.closeStore(db)
+
     log("[OK] Guardado final:")
-    log(os.path.abspath(os.path.join("results", "cgr_cgr2_iterlog.csv")))
-    log(os.path.abspath(os.path.join("results", "cgr_cgr2_summary.csv")))
+    log(os.path.abspath(iterlog_path))
+    log(os.path.abspath(summary_path))
 
 if __name__ == "__main__":
     experiment_cgr_vs_cgr2_12inst()
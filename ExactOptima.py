@@ -0,0 +1,156 @@
+
+# Optimos exactos (n=100, 250) -> results/optima.csv
+# Se calculan una sola vez: las instancias ya probadas en el fichero se saltan.
+import os, re, csv, math, random, time
+from datetime import datetime
+
+from structure.instance import compactIntegerDistances
+from algorithms import exact
+from experiments import store
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+os.chdir(BASE_DIR)
+
+# ---------------- CONFIG ----------------
+INST_DIR = "instances"
+DATASETS = ["Geo", "Ran"]
+NS = [100, 250]
+M_FRACS = [0.1, 0.3]
+INSTANCES_PER_GROUP = 10
+
+SEED = 12345
+TIME_LIMIT = 600          # por instancia; si se agota queda proven=0
+OPTIMA_PATH = os.path.join("results", "optima.csv")
+OPTIMA_KEY = ("dataset", "instance", "m")
+
+
+# ---------------- Utils ----------------
+def log(msg):
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}", flush=True)
+
+def extract_idx(path):
+    base = os.path.basename(path)
+    m = re.search(r"(\d+)\.txt$", base)
+    return int(m.group(1)) if m else 10**9
+
+def list_instance_paths(dataset, n, base_dir=INST_DIR):
+    folder = os.path.join(base_dir, dataset)
+    files = [os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(".txt")]
+    pat = re.compile(rf"\b{n}\b")
+    files = [f for f in files if pat.search(os.path.basename(f))]
+    files.sort(key=extract_idx)
+    return files
+
+def m_for_instance(n, idx_file):
+    block = (idx_file - 1) // INSTANCES_PER_GROUP
+    frac = M_FRACS[min(block, len(M_FRACS) - 1)]
+    return int(round(frac * n)), frac
+
+def read_rows(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+def write_rows(path, rows):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=exact.OPTIMA_FIELDS)
+        w.writeheader()
+        w.writerows(rows)
+
+# -------- loaders --------
+def load_geo_instance(path, p):
+    with open(path, "r") as f:
+        lines = [ln.strip() for ln in f if ln.strip()]
+    n = int(lines[0]); K = int(lines[1])
+    coords = []
+    for ln in lines[2:2+n]:
+        parts = ln.split()
+        vec = list(map(float, parts[1:1+K]))
+        coords.append(vec)
+    d = [[0.0]*n for _ in range(n)]
+    for i in range(n):
+        for j in range(i+1, n):
+            s = 0.0
+            for a, b in zip(coords[i], coords[j]):
+                diff = a - b
+                s += diff*diff
+            dist = math.sqrt(s)
+            d[i][j] = d[j][i] = dist
+    return {"name": os.path.basename(path), "n": n, "p": p, "d": d, "dataset": "Geo"}
+
+def load_ran_instance(path, p):
+    with open(path, "r") as f:
+        lines = [ln.strip() for ln in f if ln.strip()]
+    n = int(lines[0])
+    d = [[0.0]*n for _ in range(n)]
+    for ln in lines[1:]:
+        i, j, val = ln.split()
+        i = int(i); j = int(j); val = float(val)
+        d[i][j] = d[j][i] = val
+    inst = {"name": os.path.basename(path), "n": n, "p": p, "d": d, "dataset": "Ran"}
+    compactIntegerDistances(inst)  # distancias enteras: filas int16/int32 y cubetas en solution
+    return inst
+
+def load_instance(dataset, path, p):
+    if dataset == "Geo":
+        return load_geo_instance(path, p)
+    if dataset == "Ran":
+        return load_ran_instance(path, p)
+    raise ValueError(dataset)
+
+
+# ---------------- Experiment ----------------
+def experiment():
+    rows = read_rows(OPTIMA_PATH)
+    done = {(r["dataset"], r["instance"], int(r["m"])) for r in rows if r["proven"] == "1"}
+    rows = [r for r in rows if (r["dataset"], r["instance"], int(r["m"])) in done]
+    db = store.openStore()  # results/results.sqlite (tabla optima = el CSV)
+    store.clearTable(db, "optima")
+    store.insertRows(db, "optima", [{k: store.parseValue(v) for k, v in r.items()} for r in rows], OPTIMA_KEY)
+
+    for dataset in DATASETS:
+        for n in NS:
+            paths = list_instance_paths(dataset, n)
+            if not paths:
+                log(f"[WARN] No hay instancias para {dataset} n={n}")
+                continue
+            log(f"== Dataset={dataset} n={n}. Total instancias: {len(paths)} ==")
+
+            for path in paths:
+                m, frac = m_for_instance(n, extract_idx(path))
+                name = os.path.basename(path)
+                if (dataset, name, m) in done:
+                    continue
+
+                inst = load_instance(dataset, path, p=m)
+                random.seed(SEED)
+                st = {}
+                t0 = time.perf_counter()
+                best = exact.solve(inst, time_limit=TIME_LIMIT, stats=st)
+                elapsed = time.perf_counter() - t0
+
+                log(f"  {name} m={m}: of={best['of']} proven={st['proven']} "
+                    f"ub={st['upper_bound']} nodes={st['nodes']} ({round(elapsed, 2)}s)")
+                row = {
+                    "dataset": dataset,
+                    "instance": name,
+                    "n": n,
+                    "m": m,
+                    "optimum": best["of"],
+                    "proven": 1 if st["proven"] else 0,
+                    "upper_bound": st["upper_bound"],
+                    "time_s": elapsed,
+                    "nodes": st["nodes"],
+                }
+                rows.append(row)
+                # guardado parcial
+                write_rows(OPTIMA_PATH, rows)
+                store.insertRows(db, "optima", [row], OPTIMA_KEY)
+
+    store.closeStore(db)
+    log(f"[OK] Saved: {os.path.abspath(OPTIMA_PATH)}")
+
+if __name__ == "__main__":
+    experiment()
@@ -8,12 +8,23 @@ import copy
 import statistics as stats
 from datetime import datetime
 
+from structure.instance import compactIntegerDistances
 from structure import solution
 from constructives import cgrasp
 from localsearch import lsfirstimp
+from structure import stopping
+from structure import deadline as dl
+from structure import bounds
+from structure import evaluations
+from structure import profile
+from structure import trace as traces
 
 
 from algorithms.grasp_pr_time import execute as grasp_pr_execute
+from algorithms import exact
+from experiments import runner
+from experiments import sink
+from experiments import store
 
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -35,11 +46,39 @@ INSTANCES_PER_GROUP = 10
 REPS = 3
 SEED = 12345
 
+METHODS = ["GRASP", "GRASP_PR"]
+JOB_WORKERS = 1          # processes running (instance, method, rep) jobs
+RESUME = False           # True: continue an interrupted run (skips the stored jobs/rows)
+
 ALPHA = 0.1
 
 # PR params
 PR_ES_SIZE = 10
 PR_TIME_DOING_GRASP = 0.6
+PR_WORKERS = 1           # processes for the GRASP phase of GRASP_PR (only with JOB_WORKERS = 1)
+
+# Evaluation budget (distance lookups, structure/evaluations) per rep instead
+# of the time limit: results independent of the machine. None -> time limit.
+EVAL_BUDGET = None
+
+# Local search stopping policy (None -> old cap: 50 iters if n >= 500 else 200)
+# e.g. stopping.stagnation(20, max_iter=200)
+LS_STOP = None
+
+# Profiling por fase (structure/profile): añade a cada rep de finalcomparison_runs
+# el tiempo por fase, llamadas a solution, iteraciones de LS y caminos de PR
+PROFILE = False
+
+# "comparison" (Dev_avg / #Best of METHODS) or "time_to_target": TTT_ATTEMPTS
+# independent attempts per (instance, method), each stopped as soon as its
+# best reaches the target (or after TTT_MAX_TIME s / EVAL_BUDGET evaluations).
+# target = reference * (1 - TTT_TARGET_GAP), reference = proven optimum
+# (results/optima.csv) or best known value (results/finalcomparison.csv).
+BENCHMARK = "comparison"
+TTT_ATTEMPTS = 50
+TTT_MAX_TIME = 60.0
+TTT_TARGET_GAP = 0.0
+TTT_INSTANCES_PER_GROUP = 2      # primeras instancias de cada bloque de m
 
 
 # -----------------------
@@ -107,7 +146,9 @@ def load_ran_instance(path, p):
         i, j, val = ln.split()
         i = int(i); j = int(j); val = float(val)
         d[i][j] = d[j][i] = val
-    return {"name": os.path.basename(path), "n": n, "p": p, "d": d, "dataset": "Ran"}
+    inst = {"name": os.path.basename(path), "n": n, "p": p, "d": d, "dataset": "Ran"}
+    compactIntegerDistances(inst)  # distancias enteras: filas int16/int32 y cubetas en solution
+    return inst
 
 def load_instance(dataset, path, p):
     if dataset == "Geo":
@@ -126,169 +167,178 @@ def check_solution(sol):
     for v in sol["sol"]:
         assert 0 <= v < n
     assert len(sol["sol"]) == inst["p"]
+    counts = evaluations.snapshot()
     of_eval = solution.evaluate(sol)
+    evaluations.restore(counts)  # la comprobación no gasta presupuesto
     assert abs(sol["of"] - of_eval) <= 1e-6, (sol["of"], of_eval)
 
 
 # -----------------------
 # Methods (time-based)
 # -----------------------
-def grasp_time_execute(inst, alpha, time_limit):
+def grasp_time_execute(inst, alpha, time_limit, ls_stop=None, run_stats=None, max_evaluations=None,
+                       trace=None):
 
     best = None
     iters = 0
-    t0 = time.time()
+    # deadline monotónico (+ presupuesto de evaluaciones), comprobado también dentro del constructivo y la LS
+    counts = evaluations.snapshot()
+    deadline = dl.createDeadline(time_limit, max_evaluations)
 
 
-    mi = 50 if inst["n"] >= 500 else 200
+    if ls_stop is None:
+        ls_stop = stopping.defaultLocalSearch(inst)
+    ls_reasons = {}
 
     while True:
-        # No empieces otra iteración si ya se acabó el tiempo
-        if time.time() - t0 >= time_limit:
+        # No empieces otra iteración si ya se acabó el tiempo (o se alcanzó el objetivo)
+        if dl.expired(deadline) or traces.reached(trace):
             break
 
+        t0 = profile.start()
+        sol = cgrasp.construct(inst, alpha, deadline)
+        profile.stop("construction", t0)
+        if sol is None:
+            break
         iters += 1
-        sol = cgrasp.construct(inst, alpha)
+        t0 = profile.start()
         check_solution(sol)
+        profile.stop("check_solution", t0)
 
-
-        if time.time() - t0 >= time_limit:
-            break
-
-        lsfirstimp.improve(sol, max_iter=mi)
+        t0 = profile.start()
+        stopping.countReason(ls_reasons, lsfirstimp.improve(sol, stop=ls_stop, deadline=deadline))
+        profile.stop("local_search", t0)
+        t0 = profile.start()
         check_solution(sol)
+        profile.stop("check_solution", t0)
 
         if best is None or sol["of"] > best["of"]:
+            t0 = profile.start()
             best = copy.deepcopy(sol)
-
+            profile.stop("deepcopy", t0)
+            traces.record(trace, best["of"], "grasp")
+            # óptimo demostrado: no tiene sentido seguir
+            if bounds.isOptimal(best["of"], bounds.upperBound(inst)):
+                break
+
+    overshoot = dl.overshoot(deadline)
+    counted = evaluations.since(counts)
+    reason = "target" if traces.reached(trace) else dl.expiredReason(deadline) or "optimal"
+    log(f"    GRASP stopped ({reason}) after {iters} iterations. "
+        f"LS stops: {ls_reasons}. Overshoot: {round(overshoot, 4)}s. Evaluations: {counted}")
+    if run_stats is not None:
+        run_stats["overshoot_s"] = overshoot
+        run_stats.update(counted)
     return best, iters
 
 
 
-def run_method_reps(inst, method_name, time_limit_instance):
-
-
-    best_vals = []
-    total_time = 0.0
-
-    for r in range(REPS):
-
-        random.seed(SEED + 1000*r + (0 if method_name == "GRASP" else 1))
-
-        t0 = time.time()
-        if method_name == "GRASP":
-            best_sol, iters = grasp_time_execute(inst, ALPHA, time_limit_instance)
-
-        elif method_name == "GRASP_PR":
-            best_sol, iters = grasp_pr_execute(
-                inst,
-                ALPHA,
-                PR_ES_SIZE,
-                time_limit_instance,
-                PR_TIME_DOING_GRASP
-            )
-
-        else:
-            raise ValueError(method_name)
-        total_time += (time.time() - t0)
+def run_method_rep(inst, method_name, time_limit_instance, r):
+    random.seed(SEED + 1000*r + (0 if method_name == "GRASP" else 1))
+    return run_method(inst, method_name, time_limit_instance)
 
-        best_vals.append(best_sol["of"])
 
+def run_method(inst, method_name, time_limit_instance, trace=None):
+    if PROFILE:
+        profile.enable()
+        profile.reset()
+    run_stats = {}
+    t0 = time.time()
+    if method_name == "GRASP":
+        best_sol, iters = grasp_time_execute(inst, ALPHA, time_limit_instance, ls_stop=LS_STOP,
+                                             run_stats=run_stats, max_evaluations=EVAL_BUDGET, trace=trace)
+
+    elif method_name == "GRASP_PR":
+        best_sol, iters = grasp_pr_execute(
+            inst,
+            ALPHA,
+            PR_ES_SIZE,
+            time_limit_instance,
+            PR_TIME_DOING_GRASP,
+            ls_stop=LS_STOP,
+            workers=PR_WORKERS,
+            stats=run_stats,
+            max_evaluations=EVAL_BUDGET,
+            trace=trace
+        )
+
+    else:
+        raise ValueError(method_name)
+
+    res = {"of": best_sol["of"], "overshoot_s": run_stats["overshoot_s"], "time_s": time.time() - t0,
+           "distance_evals": run_stats["distance_evals"], "move_evals": run_stats["move_evals"]}
+    if PROFILE:
+        res.update(profile.row())
+    return res
+
+
+def summarize_reps(rep_results):
+    best_vals = [r["of"] for r in rep_results]
+    total_time = sum(r["time_s"] for r in rep_results)
     return {
+        **dl.summarizeOvershoots([r["overshoot_s"] for r in rep_results]),
         "best_method_of": max(best_vals),
         "avg_best_of": sum(best_vals) / len(best_vals),
         "std_best_of": stats.pstdev(best_vals) if len(best_vals) > 1 else 0.0,
-        "avg_time_per_rep": total_time / REPS,
-        "reps": REPS
+        "avg_time_per_rep": total_time / len(rep_results),
+        "avg_distance_evals": sum(r["distance_evals"] for r in rep_results) / len(rep_results),
+        "avg_move_evals": sum(r["move_evals"] for r in rep_results) / len(rep_results),
+        "reps": len(rep_results)
     }
 
 
-# -----------------------
-# Experiment
-# -----------------------
-def experiment():
-    os.makedirs("results", exist_ok=True)
-    per_instance_rows = []
+def run_method_reps(inst, method_name, time_limit_instance):
+    return summarize_reps([run_method_rep(inst, method_name, time_limit_instance, r) for r in range(REPS)])
+
+
+def time_limit_for(n):
+    if EVAL_BUDGET is not None:
+        return None  # para el presupuesto de evaluaciones
+    return 30.0 if n == 500 else 15.0
 
+
+def run_job(job):
+    # un job = (instancia, método, rep); la instancia se reusa dentro del proceso
+    inst = runner.cachedInstance((job["path"], job["m"]), load_instance, job["dataset"], job["path"], job["m"])
+    ub = bounds.upperBound(inst)  # fuera del tiempo de las reps (queda en inst)
+    res = run_method_rep(inst, job["method"], job["time_limit"], job["rep"])
+    res["upper_bound"] = ub
+    res["name"] = inst["name"]
+    return res
+
+
+def build_jobs():
+    jobs = []
     for dataset in DATASETS:
         for n in NS:
             paths = list_instance_paths(dataset, n)
             if not paths:
                 log(f"[WARN] No hay instancias para {dataset} n={n}")
                 continue
-
-            log(f"== Dataset={dataset} n={n}. Total instancias: {len(paths)} ==")
-
             for path in paths:
                 idx_file = extract_idx(path)
                 m, frac = m_for_instance(n, idx_file)
+                for method in METHODS:
+                    for r in range(REPS):
+                        jobs.append({"dataset": dataset, "n": n, "path": path, "idx_file": idx_file,
+                                     "instance": os.path.basename(path), "m": m, "frac": frac, "method": method, "rep": r,
+                                     "time_limit": time_limit_for(n),
+                                     "seed": SEED + 1000*r + (0 if method == "GRASP" else 1)})
+    return jobs
 
-                inst = load_instance(dataset, path, p=m)
-                if n == 500:
-                    time_limit_instance = 30.0
-                else:
-                    time_limit_instance = 15.0
-
-                log(f"  Instancia: {inst['name']} (idx={idx_file}) -> m={m} (frac={frac})")
-
-                # Ejecutar ambos métodos (10 reps cada uno)
-                r_grasp = run_method_reps(inst, "GRASP", time_limit_instance)
-                r_pr = run_method_reps(inst, "GRASP_PR", time_limit_instance)
-
-                best_global = max(r_grasp["best_method_of"], r_pr["best_method_of"])
-
-                def make_row(method_label, r):
-                    rel_dev = 0.0 if best_global <= EPS else (best_global - r["best_method_of"]) / best_global
-                    is_best = 1 if abs(r["best_method_of"] - best_global) <= 1e-9 else 0
-                    return {
-                        "dataset": dataset,
-                        "instance": inst["name"],
-                        "n": n,
-                        "m": m,
-                        "frac": frac,
 
-                        "method": method_label,
-                        "best_method_of": r["best_method_of"],
-                        "best_global_of": best_global,
-                        "relative_dev": rel_dev,
-                        "is_best": is_best,
-
-                        "reps": r["reps"],
-                        "time_limit_s": time_limit_instance,
-                        "alpha": ALPHA,
-
-                        # opcional (útil)
-                        "avg_best_of": r["avg_best_of"],
-                        "std_best_of": r["std_best_of"],
-                        "avg_time_per_rep_s": r["avg_time_per_rep"],
-
-                        # PR params (vacío en GRASP)
-                        "es_size": PR_ES_SIZE if method_label == "GRASP_PR" else "",
-                        "time_doing_grasp": PR_TIME_DOING_GRASP if method_label == "GRASP_PR" else "",
-                    }
-
-                per_instance_rows.append(make_row("GRASP", r_grasp))
-                per_instance_rows.append(make_row("GRASP_PR", r_pr))
-
-                # guardado parcial
-                per_instance_path = os.path.join("results", "finalcomparison.csv")
-                with open(per_instance_path, "w", newline="", encoding="utf-8") as f:
-                    fieldnames = list(per_instance_rows[0].keys())
-                    w = csv.DictWriter(f, fieldnames=fieldnames)
-                    w.writeheader()
-                    w.writerows(per_instance_rows)
-
-                log(f"[SAVE] {os.path.abspath(per_instance_path)}")
+# -----------------------
+# Experiment
+# -----------------------
+def accumulate(summary_acc, row):
+    key = (row["dataset"], row["n"], row["m"], row["method"], row["time_limit_s"])
+    acc = summary_acc.setdefault(key, {"dev_sum": 0.0, "best_sum": 0, "count": 0})
+    acc["dev_sum"] += row["relative_dev"]
+    acc["best_sum"] += row["is_best"]
+    acc["count"] += 1
 
 
-    summary_acc = {}
-    for row in per_instance_rows:
-        key = (row["dataset"], row["n"], row["m"], row["method"], row["time_limit_s"])
-        acc = summary_acc.setdefault(key, {"dev_sum": 0.0, "best_sum": 0, "count": 0})
-        acc["dev_sum"] += row["relative_dev"]
-        acc["best_sum"] += row["is_best"]
-        acc["count"] += 1
-
+def summary_rows_from(summary_acc):
     summary_rows = []
     for (dataset, n, m, method,tlim), acc in summary_acc.items():
         summary_rows.append({
@@ -301,23 +351,252 @@ def experiment():
             "num_instances": acc["count"],
             "reps": REPS,
             "time_limit_used": tlim,
+            "eval_budget": "" if EVAL_BUDGET is None else EVAL_BUDGET,
             "alpha": ALPHA,
             "es_size": PR_ES_SIZE if method == "GRASP_PR" else "",
             "time_doing_grasp": PR_TIME_DOING_GRASP if method == "GRASP_PR" else "",
         })
 
     summary_rows.sort(key=lambda r: (r["dataset"], r["n"], r["m"], r["method"]))
+    return summary_rows
+
+
+def experiment():
+    os.makedirs("results", exist_ok=True)
+    optima = exact.loadOptima(os.path.join("results", "optima.csv"))  # ExactOptima.py
 
+    if JOB_WORKERS > 1 and PR_WORKERS > 1:
+        raise ValueError("PR_WORKERS > 1 needs JOB_WORKERS = 1 (pool workers cannot fork)")
+
+    runs_path = os.path.join("results", "finalcomparison_runs.csv")
+    per_instance_path = os.path.join("results", "finalcomparison.csv")
     summary_path = os.path.join("results", "summaryfinalcomp.csv")
-    with open(summary_path, "w", newline="", encoding="utf-8") as f:
-        fieldnames = list(summary_rows[0].keys()) if summary_rows else []
-        w = csv.DictWriter(f, fieldnames=fieldnames)
-        if fieldnames:
-            w.writeheader()
-            w.writerows(summary_rows)
+
+    db = store.openStore()  # results/results.sqlite
+    # append-only: una fila por rep (checkpoint) y una por (instancia, método)
+    runs_sink = sink.openSink(runs_path, ("dataset", "instance", "method", "rep"), resume=RESUME, store=db)
+    rows_sink = sink.openSink(per_instance_path, ("dataset", "instance", "method"), resume=RESUME, store=db)
+
+    summary_acc = {}
+    for row in rows_sink["rows"]:
+        accumulate(summary_acc, row)
+
+    jobs = build_jobs()
+    log(f"== {len(jobs)} jobs ({len(METHODS)} métodos x {REPS} reps), JOB_WORKERS={JOB_WORKERS}, "
+        f"{len(runs_sink['rows'])} reps ya guardadas ==")
+
+    def on_instance(key, done):
+        dataset, n, path = key
+        first = done[0][0]
+        m, frac, time_limit_instance = first["m"], first["frac"], first["time_limit"]
+        name = done[0][1]["name"]
+        ub = done[0][1]["upper_bound"]
+        opt = optima.get((dataset, name, m))
+        log(f"  Instancia: {name} (idx={first['idx_file']}) -> m={m} (frac={frac})")
+
+        by_method = {}
+        for job, res in done:
+            by_method.setdefault(job["method"], []).append(res)
+        summaries = {method: summarize_reps(by_method[method]) for method in METHODS}
+
+        best_global = max(r["best_method_of"] for r in summaries.values())
+
+        def make_row(method_label, r):
+            rel_dev = 0.0 if best_global <= EPS else (best_global - r["best_method_of"]) / best_global
+            is_best = 1 if abs(r["best_method_of"] - best_global) <= 1e-9 else 0
+            return {
+                "dataset": dataset,
+                "instance": name,
+                "n": n,
+                "m": m,
+                "frac": frac,
+
+                "method": method_label,
+                "best_method_of": r["best_method_of"],
+                "best_global_of": best_global,
+                "relative_dev": rel_dev,
+                "is_best": is_best,
+                "upper_bound": ub,
+                "gap_to_ub": bounds.gap(r["best_method_of"], ub),
+                "optimum": "" if opt is None else opt,
+                "dev_to_optimum": "" if opt is None else bounds.gap(r["best_method_of"], opt),
+
+                "reps": r["reps"],
+                "time_limit_s": "" if time_limit_instance is None else time_limit_instance,
+                "eval_budget": "" if EVAL_BUDGET is None else EVAL_BUDGET,
+                "alpha": ALPHA,
+
+                # opcional (útil)
+                "avg_best_of": r["avg_best_of"],
+                "std_best_of": r["std_best_of"],
+                "avg_time_per_rep_s": r["avg_time_per_rep"],
+                "avg_overshoot_s": r["avg_overshoot_s"],
+                "max_overshoot_s": r["max_overshoot_s"],
+                "avg_distance_evals": r["avg_distance_evals"],
+                "avg_move_evals": r["avg_move_evals"],
+
+                # PR params (vacío en GRASP)
+                "es_size": PR_ES_SIZE if method_label == "GRASP_PR" else "",
+                "time_doing_grasp": PR_TIME_DOING_GRASP if method_label == "GRASP_PR" else "",
+            }
+
+        rows = sink.newRows(rows_sink, [make_row(method, summaries[method]) for method in METHODS])
+        sink.append(rows_sink, rows)
+        for row in rows:
+            accumulate(summary_acc, row)
+        # resumen incremental
+        sink.writeAtomic(summary_path, summary_rows_from(summary_acc))
+
+        log(f"[SAVE] {os.path.abspath(per_instance_path)}")
+
+    try:
+        runner.runJobs(jobs, run_job, workers=JOB_WORKERS,
+                       group_key=lambda job: (job["dataset"], job["n"], job["path"]),
+                       on_group=on_instance, sink=runs_sink)
+    finally:
+        sink.closeSink(runs_sink)
+        sink.closeSink(rows_sink)
+        store.closeStore(db)
+
+    sink.writeAtomic(summary_path, summary_rows_from(summary_acc))
+
+    log(f"[OK] summary: {os.path.abspath(summary_path)}")
+
+
+# -----------------------
+# Time-to-target
+# -----------------------
+def ttt_references():
+    """(dataset, instance, m) -> (reference, source): proven optimum or best
+    value known from a previous comparison."""
+    refs = {}
+    path = os.path.join("results", "finalcomparison.csv")
+    if os.path.exists(path):
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                key = (row["dataset"], row["instance"], int(row["m"]))
+                refs[key] = (max(float(row["best_global_of"]), refs.get(key, (0.0,))[0]), "best_known")
+    for key, opt in exact.loadOptima(os.path.join("results", "optima.csv")).items():
+        refs[key] = (opt, "optimum")
+    return refs
+
+
+def run_ttt_job(job):
+    # un job = un intento (instancia, método); para al alcanzar el objetivo
+    inst = runner.cachedInstance((job["path"], job["m"]), load_instance, job["dataset"], job["path"], job["m"])
+    bounds.upperBound(inst)  # fuera del tiempo del intento (queda en inst)
+    trace = traces.createTrace(job["target"])
+    res = run_method(inst, job["method"], None if EVAL_BUDGET is not None else TTT_MAX_TIME, trace)
+    hit = traces.timeToTarget(trace, job["target"])
+    return {
+        "target": job["target"],
+        "reached": 0 if hit is None else 1,
+        "ttt_s": "" if hit is None else hit[0],
+        "ttt_evals": "" if hit is None else hit[1],
+        "final_of": res["of"],
+        "time_s": res["time_s"],
+        "distance_evals": res["distance_evals"],
+        "move_evals": res["move_evals"],
+        "trace": traces.formatEvents(trace["events"]),
+    }
+
+
+def build_ttt_jobs(refs):
+    jobs = []
+    for dataset in DATASETS:
+        for n in NS:
+            for path in list_instance_paths(dataset, n):
+                idx_file = extract_idx(path)
+                if (idx_file - 1) % INSTANCES_PER_GROUP >= TTT_INSTANCES_PER_GROUP:
+                    continue
+                m, frac = m_for_instance(n, idx_file)
+                name = os.path.basename(path)
+                if (dataset, name, m) not in refs:
+                    log(f"[WARN] Sin valor de referencia para {name} (m={m}): ExactOptima.py o comparison")
+                    continue
+                ref, source = refs[(dataset, name, m)]
+                for method in METHODS:
+                    for a in range(TTT_ATTEMPTS):
+                        jobs.append({"dataset": dataset, "n": n, "path": path, "idx_file": idx_file,
+                                     "instance": name, "m": m, "frac": frac, "method": method, "attempt": a,
+                                     "reference": ref, "reference_source": source,
+                                     "target": ref * (1 - TTT_TARGET_GAP),
+                                     "seed": runner.jobSeed(SEED, dataset, name, m, method, a)})
+    return jobs
+
+
+def ttt_rows(results):
+    """Filas de distribución y de resumen de un (instancia, método). La
+    distribución es la empírica de los intentos que llegan al objetivo, con
+    probabilidad (i - 0.5) / intentos para el i-ésimo (gráficas TTT); tiempo y
+    evaluaciones se ordenan cada uno por su lado."""
+    job0 = results[0][0]
+    hits = [res for _, res in results if res["reached"] == 1]
+    times_s = sorted(res["ttt_s"] for res in hits)
+    evals = sorted(res["ttt_evals"] for res in hits)
+    base = {"dataset": job0["dataset"], "instance": job0["instance"], "n": job0["n"], "m": job0["m"],
+            "method": job0["method"]}
+    dist = [{**base, "rank": i + 1, "probability": (i + 0.5) / len(results),
+             "ttt_s": times_s[i], "ttt_evals": evals[i]} for i in range(len(hits))]
+    summary = {
+        **base,
+        "target": job0["target"],
+        "reference": job0["reference"],
+        "reference_source": job0["reference_source"],
+        "target_gap": TTT_TARGET_GAP,
+        "attempts": len(results),
+        "reached": len(hits),
+        "success_rate": len(hits) / len(results),
+        "avg_ttt_s": sum(times_s) / len(hits) if hits else "",
+        "median_ttt_s": stats.median(times_s) if hits else "",
+        "avg_ttt_evals": sum(evals) / len(hits) if hits else "",
+        "median_ttt_evals": stats.median(evals) if hits else "",
+        "max_time_s": "" if EVAL_BUDGET is not None else TTT_MAX_TIME,
+        "eval_budget": "" if EVAL_BUDGET is None else EVAL_BUDGET,
+    }
+    return dist, summary
+
+
+def time_to_target():
+    os.makedirs("results", exist_ok=True)
+    if JOB_WORKERS > 1 and PR_WORKERS > 1:
+        raise ValueError("PR_WORKERS > 1 needs JOB_WORKERS = 1 (pool workers cannot fork)")
+
+    runs_path = os.path.join("results", "ttt_runs.csv")
+    dist_path = os.path.join("results", "ttt_distribution.csv")
+    summary_path = os.path.join("results", "ttt_summary.csv")
+
+    jobs = build_ttt_jobs(ttt_references())
+    db = store.openStore()  # results/results.sqlite
+    runs_sink = sink.openSink(runs_path, ("dataset", "instance", "method", "attempt"), resume=RESUME, store=db)
+    dist_sink = sink.openSink(dist_path, ("dataset", "instance", "method", "rank"), resume=RESUME, store=db)
+    summary_sink = sink.openSink(summary_path, ("dataset", "instance", "method"), resume=RESUME, store=db)
+    log(f"== Time-to-target: {len(jobs)} intentos ({TTT_ATTEMPTS} por instancia y método), "
+        f"JOB_WORKERS={JOB_WORKERS}, {len(runs_sink['rows'])} ya guardados ==")
+
+    def on_group(key, done):
+        dist, summary = ttt_rows(done)
+        sink.append(dist_sink, sink.newRows(dist_sink, dist))
+        sink.append(summary_sink, sink.newRows(summary_sink, [summary]))
+        log(f"  {summary['instance']} {summary['method']}: objetivo {summary['target']:.6f}, "
+            f"{summary['reached']}/{summary['attempts']} intentos, mediana "
+            f"{summary['median_ttt_s'] if summary['reached'] else '-'} s")
+
+    try:
+        runner.runJobs(jobs, run_ttt_job, workers=JOB_WORKERS,
+                       group_key=lambda job: (job["dataset"], job["instance"], job["method"]),
+                       on_group=on_group, sink=runs_sink)
+    finally:
+        sink.closeSink(runs_sink)
+        sink.closeSink(dist_sink)
+        sink.closeSink(summary_sink)
+        store.closeStore(db)
 
     log(f"[OK] summary: {os.path.abspath(summary_path)}")
 
 
 if __name__ == "__main__":
-    experiment()
\ No newline at end of file
+    if BENCHMARK == "time_to_target":
+        time_to_target()
+    else:
+        experiment()
\ No newline at end of file
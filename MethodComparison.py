@@ -1,15 +1,18 @@
 import os
 import re
-import csv
 import math
-import random
 import time
 import statistics as stats
 from datetime import datetime
+from structure.instance import compactIntegerDistances
 from structure import solution
+from structure import evaluations
 
 from constructives import cgrasp,cgr2
 from localsearch import lsfirstimp, lsbestimp
+from experiments import runner
+from experiments import sink
+from experiments import store
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 os.chdir(BASE_DIR)
@@ -26,7 +29,9 @@ NS = [100,250, 500]
 M_FRACS = [0.1,0.3]
 INSTANCES_PER_GROUP = 10       # 10 instàncies per (dataset,n,m)
 ITERS = 100                    # 100 solucions per instància i mètode
-SEED = 12345                   # per reproduïbilitat
+SEED = 12345                   # per reproduïbilitat (cada job en deriva la seva llavor)
+JOB_WORKERS = 1                # processos executant jobs (instància, mètode)
+RESUME = False                 # True: continua una execució tallada (salta els jobs ja guardats)
 
 
 ALPHA_TEUA = 0.1
@@ -73,7 +78,9 @@ def load_ran_instance(path, p):
         i, j, val = ln.split()
         i = int(i); j = int(j); val = float(val)
         d[i][j] = d[j][i] = val
-    return {"name": os.path.basename(path), "n": n, "p": p, "d": d, "dataset": "Ran"}
+    inst = {"name": os.path.basename(path), "n": n, "p": p, "d": d, "dataset": "Ran"}
+    compactIntegerDistances(inst)  # distancias enteras: filas int16/int32 y cubetas en solution
+    return inst
 
 
 def load_instance(dataset, path, p):
@@ -115,8 +122,10 @@ def check_solution(sol):
         assert 0 <= v < n
     # mida final
     assert len(sol["sol"]) == inst["p"]
-    # consistència of
+    # consistència of (la comprovació no compta com a evaluacions del mètode)
+    counts = evaluations.snapshot()
     of_eval = solution.evaluate(sol)
+    evaluations.restore(counts)
     assert abs(sol["of"] - of_eval) <= 1e-6, (sol["of"], of_eval)
 
 
@@ -169,41 +178,36 @@ def run_one_iteration(inst, constructive_name, ls_name):
     return sol["of"], elapsed
 
 
-# -----------------------
-# Experiments i CSV
-# -----------------------
-def experiment():
-    log("Començant experiments")
-    log(f"CWD (on guardarà results): {os.getcwd()}")
-    os.makedirs("results", exist_ok=True)
-    log("Carpeta 'results' creada (si no existia)")
-    random.seed(SEED)
-
-    per_instance_rows = []
-    summary_rows = []
-
-
-    def rank_points(values_dict):
-        # values_dict: method_key -> best_value
-        items = sorted(values_dict.items(), key=lambda x: x[1], reverse=True)
-        # ranks amb empats
-        points = {}
-        pts_by_rank = [6, 5, 4, 3, 2, 1]
-        i = 0
-        while i < len(items):
-            j = i
-            while j < len(items) and abs(items[j][1] - items[i][1]) <= 1e-9:
-                j += 1
-            # empats en [i, j)
-            avg_pts = sum(pts_by_rank[i:j]) / (j - i)
-            for t in range(i, j):
-                points[items[t][0]] = avg_pts
-            i = j
-        return points
-
-
-    group_data = {}
-
+def run_job(job):
+    # un job = ITERS iteracions d'un mètode sobre una instància
+    inst = runner.cachedInstance((job["path"], job["m"]), load_instance, job["dataset"], job["path"], job["m"])
+    cname, lsname = job["method"]
+    log(f"    -> {inst['name']}: mètode {cname}+{lsname} ({ITERS} iteracions)")
+
+    vals = []
+    times = []
+    counts = evaluations.snapshot()
+    for it in range(ITERS):
+        ofv, dt = run_one_iteration(inst, cname, lsname)
+        vals.append(ofv)
+        times.append(dt)
+
+        if (it + 1) % 10 == 0:
+            log(f"       iter {it + 1}/{ITERS}")
+    counted = evaluations.since(counts)
+
+    best_v = max(vals)
+    avg_v = sum(vals) / len(vals)
+    std_v = stats.pstdev(vals) if len(vals) > 1 else 0.0
+    avg_t = sum(times) / len(times)
+    log(f"       FI {cname}+{lsname}: best={best_v:.6f} avg={avg_v:.6f} t/iter={avg_t:.6f}s")
+    return {"name": inst["name"], "best": best_v, "avg": avg_v, "std": std_v, "avg_time": avg_t,
+            "avg_distance_evals": counted["distance_evals"] / ITERS,
+            "avg_move_evals": counted["move_evals"] / ITERS}
+
+
+def build_jobs():
+    jobs = []
     for dataset in DATASETS:
         for n in NS:
 
@@ -212,116 +216,36 @@ def experiment():
                 log(f"[WARN] No hi ha instàncies per dataset={dataset}, n={n}")
                 continue
 
-            log(f"== Dataset={dataset}, n={n}. Total instàncies: {len(paths)} ==")
-
             for path in paths:
                 idx_file = extract_idx(path)  # 1,2,3,...
 
                 # bloque 0: 1-10 ; bloque 1: 11-20 ; ...
                 block = (idx_file - 1) // INSTANCES_PER_GROUP
-
-
                 if block >= len(M_FRACS):
                     continue
 
-
-
                 frac = M_FRACS[block]
                 m = int(round(frac * n))
+                for method in METHODS:
+                    jobs.append({"dataset": dataset, "n": n, "path": path, "m": m, "frac": frac,
+                                 "instance": os.path.basename(path), "method": method,
+                                 "constructive": method[0], "local_search": method[1],
+                                 "seed": runner.jobSeed(SEED, dataset, os.path.basename(path), m, method)})
+    return jobs
 
-                inst = load_instance(dataset, path, p=m)
-                log(f"  Instància: {inst['name']}  -> m={m} (frac={frac})")
-
-                # executa 100 iteracions per cada mètode
-                method_stats = {}
-                method_best = {}
-                method_time = {}
-
-                for (cname, lsname) in METHODS:
-                    vals = []
-                    times = []
-                    log(f"    -> Mètode {cname}+{lsname} ({ITERS} iteracions)")
-
-                    for it in range(ITERS):
-                        ofv, dt = run_one_iteration(inst, cname, lsname)
-                        vals.append(ofv)
-                        times.append(dt)
-
-                        if (it + 1) % 10 == 0:
-                            log(f"       iter {it + 1}/{ITERS}")
-
-                    best_v = max(vals)
-                    avg_v = sum(vals) / len(vals)
-                    std_v = stats.pstdev(vals) if len(vals) > 1 else 0.0
-                    avg_t = sum(times) / len(times)
-
-                    log(f"       FI {cname}+{lsname}: best={best_v:.6f} avg={avg_v:.6f} t/iter={avg_t:.6f}s")
-
-                    method_stats[(cname, lsname)] = (best_v, avg_v, std_v)
-                    method_best[(cname, lsname)] = best_v
-                    method_time[(cname, lsname)] = avg_t
-
-                # mejor global en la instancia
-                best_global = max(method_best.values())
-
-                # filas por método, ya con desviación y bandera
-                for (cname, lsname) in METHODS:
-                    best_v, avg_v, std_v = method_stats[(cname, lsname)]
-                    avg_t = method_time[(cname, lsname)]
-
-                    rel_dev = 0.0
-                    if best_global > EPS:
-                        rel_dev = (best_global - best_v) / best_global
-
-                    is_best = 1 if abs(best_v - best_global) <= 1e-9 else 0
-
-                    per_instance_rows.append({
-                        "dataset": dataset,
-                        "instance": inst["name"],
-                        "n": n,
-                        "m": m,
-                        "constructive": cname,
-                        "local_search": lsname,
-                        "best_method_of": best_v,
-                        "best_global_of": best_global,
-                        "relative_dev": rel_dev,
-                        "is_best": is_best,
-                        "avg_time_per_iter": avg_t,
-                        "avg_of": avg_v,
-                        "std_of": std_v,
-                        "iters": ITERS,
-                        "alpha_teua": ALPHA_TEUA if cname == "CGR" else "",
-                        "beta": BETA if cname == "CGR2" else "",
-                    })
-
-                    key = (dataset, n, m)
-                    group_data.setdefault(key, []).append(method_best)
-                    # --- guardat parcial per no perdre progrés ---
-                    os.makedirs("results", exist_ok=True)
-
-                    per_instance_path = os.path.join("results", "per_instance.csv")
-                    with open(per_instance_path, "w", newline="", encoding="utf-8") as f:
-                        fieldnames = list(per_instance_rows[0].keys()) if per_instance_rows else []
-                        w = csv.DictWriter(f, fieldnames=fieldnames)
-                        if fieldnames:
-                            w.writeheader()
-                            w.writerows(per_instance_rows)
-
-                    print("[SAVE] per_instance:", os.path.abspath(per_instance_path))
-
-    # construeix summary: Dev, #Best, Score
-    # -----------------------
-    # Summary desde per_instance_rows
-    # -----------------------
-    summary_acc = {}  # key=(dataset,n,m,constructive,local_search) -> acumuladores
-
-    for row in per_instance_rows:
-        key = (row["dataset"], row["n"], row["m"], row["constructive"], row["local_search"])
-        acc = summary_acc.setdefault(key, {"dev_sum": 0.0, "best_sum": 0, "count": 0})
-        acc["dev_sum"] += row["relative_dev"]
-        acc["best_sum"] += row["is_best"]
-        acc["count"] += 1
 
+# -----------------------
+# Experiments i CSV
+# -----------------------
+def accumulate(summary_acc, row):
+    key = (row["dataset"], row["n"], row["m"], row["constructive"], row["local_search"])
+    acc = summary_acc.setdefault(key, {"dev_sum": 0.0, "best_sum": 0, "count": 0})
+    acc["dev_sum"] += row["relative_dev"]
+    acc["best_sum"] += row["is_best"]
+    acc["count"] += 1
+
+
+def summary_rows_from(summary_acc):
     summary_rows = []
     for (dataset, n, m, cname, lsname), acc in summary_acc.items():
         summary_rows.append({
@@ -338,24 +262,123 @@ def experiment():
 
     # ordenado bonito
     summary_rows.sort(key=lambda r: (r["dataset"], r["n"], r["m"], r["constructive"], r["local_search"]))
+    return summary_rows
 
-    # escriu CSVs
+
+def experiment():
+    log("Començant experiments")
+    log(f"CWD (on guardarà results): {os.getcwd()}")
     os.makedirs("results", exist_ok=True)
+    log("Carpeta 'results' creada (si no existia)")
 
+    runs_path = os.path.join("results", "per_instance_runs.csv")
     per_instance_path = os.path.join("results", "per_instance.csv")
-    with open(per_instance_path, "w", newline="", encoding="utf-8") as f:
-        fieldnames = list(per_instance_rows[0].keys()) if per_instance_rows else []
-        w = csv.DictWriter(f, fieldnames=fieldnames)
-        w.writeheader()
-        w.writerows(per_instance_rows)
+    summary_path = os.path.join("results", "summary.csv")
 
+    db = store.openStore()  # results/results.sqlite
+    # només append: una fila per job (checkpoint) i una per (instància, mètode)
+    runs_sink = sink.openSink(runs_path, ("dataset", "instance", "constructive", "local_search"),
+                              resume=RESUME, store=db)
+    rows_sink = sink.openSink(per_instance_path, ("dataset", "instance", "constructive", "local_search"),
+                              resume=RESUME, store=db)
 
-    summary_path = os.path.join("results", "summary.csv")
-    with open(summary_path, "w", newline="", encoding="utf-8") as f:
-        fieldnames = list(summary_rows[0].keys()) if summary_rows else []
-        w = csv.DictWriter(f, fieldnames=fieldnames)
-        w.writeheader()
-        w.writerows(summary_rows)
+    # resum incremental: acumuladors de (dataset,n,m,constructive,local_search)
+    summary_acc = {}
+    for row in rows_sink["rows"]:
+        accumulate(summary_acc, row)
+
+    def rank_points(values_dict):
+        # values_dict: method_key -> best_value
+        items = sorted(values_dict.items(), key=lambda x: x[1], reverse=True)
+        # ranks amb empats
+        points = {}
+        pts_by_rank = [6, 5, 4, 3, 2, 1]
+        i = 0
+        while i < len(items):
+            j = i
+            while j < len(items) and abs(items[j][1] - items[i][1]) <= 1e-9:
+                j += 1
+            # empats en [i, j)
+            avg_pts = sum(pts_by_rank[i:j]) / (j - i)
+            for t in range(i, j):
+                points[items[t][0]] = avg_pts
+            i = j
+        return points
+
+
+    group_data = {}
+
+    jobs = build_jobs()
+    log(f"{len(jobs)} jobs ({len(METHODS)} mètodes per instància), JOB_WORKERS={JOB_WORKERS}")
+
+    def on_instance(key, done):
+        dataset, n, path = key
+        m, frac = done[0][0]["m"], done[0][0]["frac"]
+        name = done[0][1]["name"]
+        log(f"  Instància: {name}  -> m={m} (frac={frac})")
+
+        method_res = {job["method"]: res for job, res in done}
+        method_best = {method: res["best"] for method, res in method_res.items()}
+
+        # mejor global en la instancia
+        best_global = max(method_best.values())
+
+        # filas por método, ya con desviación y bandera
+        rows = []
+        for (cname, lsname) in METHODS:
+            res = method_res[(cname, lsname)]
+            best_v = res["best"]
+
+            rel_dev = 0.0
+            if best_global > EPS:
+                rel_dev = (best_global - best_v) / best_global
+
+            is_best = 1 if abs(best_v - best_global) <= 1e-9 else 0
+
+            rows.append({
+                "dataset": dataset,
+                "instance": name,
+                "n": n,
+                "m": m,
+                "constructive": cname,
+                "local_search": lsname,
+                "best_method_of": best_v,
+                "best_global_of": best_global,
+                "relative_dev": rel_dev,
+                "is_best": is_best,
+                "avg_time_per_iter": res["avg_time"],
+                "avg_distance_evals_per_iter": res["avg_distance_evals"],
+                "avg_move_evals_per_iter": res["avg_move_evals"],
+                "avg_of": res["avg"],
+                "std_of": res["std"],
+                "iters": ITERS,
+                "alpha_teua": ALPHA_TEUA if cname == "CGR" else "",
+                "beta": BETA if cname == "CGR2" else "",
+            })
+
+            key = (dataset, n, m)
+            group_data.setdefault(key, []).append(method_best)
+
+        # --- guardat incremental per no perdre progrés (resume: només les files noves) ---
+        rows = sink.newRows(rows_sink, rows)
+        sink.append(rows_sink, rows)
+        for row in rows:
+            accumulate(summary_acc, row)
+        sink.writeAtomic(summary_path, summary_rows_from(summary_acc))
+
+        print("[SAVE] per_instance:", os.path.abspath(per_instance_path))
+
+    try:
+        runner.runJobs(jobs, run_job, workers=JOB_WORKERS,
+                       group_key=lambda job: (job["dataset"], job["n"], job["path"]),
+                       on_group=on_instance, sink=runs_sink)
+    finally:
+        sink.closeSink(runs_sink)
+        sink.closeSink(rows_sink)
+        store.closeStore(db)
+
+    # construeix summary: Dev, #Best (des de les files guardades)
+    sink.writeAtomic(summary_path, summary_rows_from(summary_acc))
 
     print(f"[OK] CSV per instància: {per_instance_path}")
     print(f"[OK] CSV resum:        {summary_path}")
@@ -0,0 +1,279 @@
+
+# F-race de configuraciones de GRASP+PR (alpha, es_size, time_doing_grasp)
+# Las configuraciones se evalúan instancia a instancia y se descartan en cuanto
+# el test de Friedman las da por peores; las supervivientes se escriben con el
+# mismo formato que configs_per_instance.csv (TimeGRASPR.py).
+import os, re, math, random, itertools
+import statistics as stats
+from datetime import datetime
+
+from structure.instance import compactIntegerDistances
+from algorithms.grasp_pr_time import execute  # GRASP+PR time-based
+from structure import bounds
+from experiments import race
+from experiments import runner
+from experiments import sink
+from experiments import store
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+os.chdir(BASE_DIR)
+
+EPS = 1e-12
+
+# ---------------- CONFIG ----------------
+INST_DIR = "instances"
+DATASETS = ["Geo", "Ran"]
+NS = [100, 250, 500]
+M_FRACS = [0.1, 0.3]
+INSTANCES_PER_GROUP = 10
+
+SEED = 12345
+TIME_LIMIT = 15
+EVAL_BUDGET = None       # presupuesto de evaluaciones (consultas de distancia) en lugar de TIME_LIMIT
+RUNS = 1                 # runs por (instancia, configuración); el valor es el mejor
+
+ALPHAS = [0.1, 0.3]
+ELITE_SIZES = [5, 10, 15]
+TIME_DOING_GRASP = [0.4, 0.6, 0.8]
+
+CONFIDENCE = 0.95
+MIN_BLOCKS = 5           # instancias antes del primer test
+MAX_EXPERIMENTS = 600    # presupuesto: número máximo de runs
+JOB_WORKERS = 1
+RESUME = False           # True: reutiliza las runs ya guardadas (la carrera se repite igual)
+
+CANDIDATES = [{"alpha": a, "es_size": es, "time_doing_grasp": tg}
+              for a, es, tg in itertools.product(ALPHAS, ELITE_SIZES, TIME_DOING_GRASP)]
+CONFIG_COLS = ("alpha", "es_size", "time_doing_grasp")
+
+
+# ---------------- Utils ----------------
+def log(msg):
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}", flush=True)
+
+def extract_idx(path):
+    base = os.path.basename(path)
+    m = re.search(r"(\d+)\.txt$", base)
+    return int(m.group(1)) if m else 10**9
+
+def list_instance_paths(dataset, n, base_dir=INST_DIR):
+    folder = os.path.join(base_dir, dataset)
+    files = [os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(".txt")]
+    pat = re.compile(rf"\b{n}\b")
+    files = [f for f in files if pat.search(os.path.basename(f))]
+    files.sort(key=extract_idx)
+    return files
+
+def m_for_instance(n, idx_file):
+    block = (idx_file - 1) // INSTANCES_PER_GROUP
+    frac = M_FRACS[min(block, len(M_FRACS) - 1)]
+    return int(round(frac * n)), frac
+
+# -------- loaders --------
+def load_geo_instance(path, p):
+    with open(path, "r") as f:
+        lines = [ln.strip() for ln in f if ln.strip()]
+    n = int(lines[0]); K = int(lines[1])
+    coords = []
+    for ln in lines[2:2+n]:
+        parts = ln.split()
+        vec = list(map(float, parts[1:1+K]))
+        coords.append(vec)
+    d = [[0.0]*n for _ in range(n)]
+    for i in range(n):
+        for j in range(i+1, n):
+            s = 0.0
+            for a, b in zip(coords[i], coords[j]):
+                diff = a - b
+                s += diff*diff
+            dist = math.sqrt(s)
+            d[i][j] = d[j][i] = dist
+    return {"name": os.path.basename(path), "n": n, "p": p, "d": d, "dataset": "Geo"}
+
+def load_ran_instance(path, p):
+    with open(path, "r") as f:
+        lines = [ln.strip() for ln in f if ln.strip()]
+    n = int(lines[0])
+    d = [[0.0]*n for _ in range(n)]
+    for ln in lines[1:]:
+        i, j, val = ln.split()
+        i = int(i); j = int(j); val = float(val)
+        d[i][j] = d[j][i] = val
+    inst = {"name": os.path.basename(path), "n": n, "p": p, "d": d, "dataset": "Ran"}
+    compactIntegerDistances(inst)  # distancias enteras: filas int16/int32 y cubetas en solution
+    return inst
+
+def load_instance(dataset, path, p):
+    if dataset == "Geo":
+        return load_geo_instance(path, p)
+    if dataset == "Ran":
+        return load_ran_instance(path, p)
+    raise ValueError(dataset)
+
+# ---------------- Runs ----------------
+def run_job(job):
+    # un job = (instancia, configuración, run)
+    inst = runner.cachedInstance((job["path"], job["m"]), load_instance, job["dataset"], job["path"], job["m"])
+    ub = bounds.upperBound(inst)  # fuera del tiempo de la run (queda en inst)
+    run_stats = {}
+    best_sol, iters = execute(
+        inst,
+        alpha=job["alpha"],
+        es_size=job["es_size"],
+        time_limit=TIME_LIMIT if EVAL_BUDGET is None else None,
+        time_doing_grasp=job["time_doing_grasp"],
+        stats=run_stats,
+        max_evaluations=EVAL_BUDGET,
+    )
+    return {"of": best_sol["of"], "iters": iters, "upper_bound": ub,
+            "distance_evals": run_stats["distance_evals"], "move_evals": run_stats["move_evals"]}
+
+def race_instances():
+    """Todas las instancias del plan en orden aleatorio (fijo por SEED), para
+    que las primeras de la carrera mezclen datasets y tamaños."""
+    plan = []
+    for dataset in DATASETS:
+        for n in NS:
+            paths = list_instance_paths(dataset, n)
+            if not paths:
+                log(f"[WARN] No hay instancias para {dataset} n={n}")
+                continue
+            for path in paths:
+                idx_file = extract_idx(path)
+                m, frac = m_for_instance(n, idx_file)
+                plan.append({"dataset": dataset, "n": n, "path": path, "instance": os.path.basename(path),
+                             "idx_file": idx_file, "m": m, "frac": frac})
+    random.Random(SEED).shuffle(plan)
+    return plan
+
+def instance_jobs(item, cands):
+    jobs = []
+    for c in cands:
+        cfg = CANDIDATES[c]
+        for r in range(RUNS):
+            jobs.append({**item, **cfg, "cand": c, "run": r,
+                         "seed": runner.jobSeed(SEED, item["dataset"], item["instance"],
+                                                cfg["alpha"], cfg["es_size"], cfg["time_doing_grasp"], r)})
+    return jobs
+
+def instance_rows(item, values, evals, ub, cands):
+    """Filas con el formato de configs_per_instance.csv de las configuraciones
+    cands en una instancia (values: cand -> [of de cada run], evals: cand ->
+    [(distance_evals, move_evals) de cada run])."""
+    cfg_best = {c: max(values[c]) for c in cands}
+    best_global = max(cfg_best.values())
+    rows = []
+    for c in cands:
+        v = values[c]
+        e = evals[c]
+        best_v = cfg_best[c]
+        rel_dev = 0.0 if best_global <= EPS else (best_global - best_v) / best_global
+        is_best = 1 if abs(best_v - best_global) <= 1e-9 else 0
+        rows.append({
+            "dataset": item["dataset"],
+            "instance": item["instance"],
+            "n": item["n"],
+            "m": item["m"],
+            "frac": item["frac"],
+            "alpha": CANDIDATES[c]["alpha"],
+            "time_limit_s": TIME_LIMIT if EVAL_BUDGET is None else "",
+            "eval_budget": "" if EVAL_BUDGET is None else EVAL_BUDGET,
+            "runs": RUNS,
+
+            "es_size": CANDIDATES[c]["es_size"],
+            "time_doing_grasp": CANDIDATES[c]["time_doing_grasp"],
+
+            "best_es_of": best_v,
+            "best_global_of": best_global,
+            "relative_dev": rel_dev,
+            "is_best": is_best,
+            "upper_bound": ub,
+            "gap_to_ub": bounds.gap(best_v, ub),
+
+            "avg_of": sum(v) / len(v),
+            "std_of": stats.pstdev(v) if len(v) > 1 else 0.0,
+            "avg_distance_evals": sum(x for x, _ in e) / len(e),
+            "avg_move_evals": sum(x for _, x in e) / len(e),
+        })
+    return rows
+
+# ---------------- Experiment ----------------
+def experiment():
+    os.makedirs("results", exist_ok=True)
+    runs_path = os.path.join("results", "race_runs.csv")
+    log_path = os.path.join("results", "race_log.csv")
+    per_instance_path = os.path.join("results", "race_per_instance.csv")
+    summary_path = os.path.join("results", "race_summary.csv")
+
+    db = store.openStore()  # results/results.sqlite
+    runs_sink = sink.openSink(runs_path, ("dataset", "instance") + CONFIG_COLS + ("run",),
+                              resume=RESUME, store=db)
+    log_sink = sink.openSink(log_path, ("block",), resume=False, store=db)
+
+    rc = race.createRace(CANDIDATES, confidence=CONFIDENCE, min_blocks=MIN_BLOCKS)
+    plan = race_instances()
+    raced = []        # (item, values, evals, ub) de cada instancia evaluada
+    experiments = 0
+    log(f"F-race: {len(CANDIDATES)} configuraciones, {len(plan)} instancias, "
+        f"presupuesto {MAX_EXPERIMENTS} runs de "
+        + (f"{TIME_LIMIT}s" if EVAL_BUDGET is None else f"{EVAL_BUDGET} evaluaciones"))
+
+    try:
+        for item in plan:
+            cands = list(rc["alive"])
+            if len(cands) == 1 or experiments + len(cands) * RUNS > MAX_EXPERIMENTS:
+                break
+            done = runner.runJobs(instance_jobs(item, cands), run_job, workers=JOB_WORKERS, sink=runs_sink)
+            experiments += len(done)
+
+            values = {c: [] for c in cands}
+            evals = {c: [] for c in cands}
+            for job, res in done:
+                values[job["cand"]].append(res["of"])
+                evals[job["cand"]].append((res["distance_evals"], res["move_evals"]))
+            raced.append((item, values, evals, done[0][1]["upper_bound"]))
+
+            dropped = race.addBlock(rc, {c: max(values[c]) for c in cands}, label=item["instance"])
+            step = rc["history"][-1]
+            sink.append(log_sink, [{
+                "block": step["block"],
+                "dataset": item["dataset"],
+                "instance": item["instance"],
+                "alive_before": step["alive_before"],
+                "friedman": "" if step["statistic"] is None else step["statistic"],
+                "p_value": "" if step["p_value"] is None else step["p_value"],
+                "dropped": ";".join(str(CANDIDATES[c]) for c in dropped),
+                "experiments": experiments,
+            }])
+            log(f"  [{step['block']}] {item['instance']} (m={item['m']}): {len(rc['alive'])} vivas"
+                + (f", p={step['p_value']:.4f}" if step["p_value"] is not None else "")
+                + (f", descartadas {len(dropped)}" if dropped else ""))
+    finally:
+        sink.closeSink(runs_sink)
+        sink.closeSink(log_sink)
+
+    survivors = rc["alive"]
+    log(f"Supervivientes ({experiments} runs): {[CANDIDATES[c] for c in survivors]}")
+
+    # supervivientes con el formato de configs_per_instance.csv
+    rows_sink = sink.openSink(per_instance_path, ("dataset", "instance") + CONFIG_COLS, resume=False, store=db)
+    for item, values, evals, ub in raced:
+        sink.append(rows_sink, instance_rows(item, values, evals, ub, survivors))
+    sink.closeSink(rows_sink)
+
+    summary = store.summarize(db, "race_per_instance", "best_es_of", ("dataset", "instance", "m"),
+                              CONFIG_COLS, ("dataset", "n", "m"))
+    sink.writeAtomic(summary_path, [{**{k: r[k] for k in ("dataset", "n", "m")},
+                                     "time_limit_s": TIME_LIMIT if EVAL_BUDGET is None else "",
+                                     "eval_budget": "" if EVAL_BUDGET is None else EVAL_BUDGET,
+                                     "runs": RUNS,
+                                     **{k: r[k] for k in CONFIG_COLS + ("Dev_avg", "#Best", "num_instances")}}
+                                    for r in summary])
+    store.closeStore(db)
+
+    log("[OK] Saved:")
+    log(os.path.abspath(per_instance_path))
+    log(os.path.abspath(summary_path))
+
+if __name__ == "__main__":
+    experiment()
@@ -0,0 +1,67 @@
+
+# Resúmenes (Dev_avg, #Best, puntos por ranking) desde results/results.sqlite
+# Los drivers escriben en el store al ir guardando; IMPORT_CSV = True carga
+# antes los CSV de results/ (resultados de ejecuciones anteriores al store).
+import os, time
+from datetime import datetime
+
+from experiments import store
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+os.chdir(BASE_DIR)
+
+# ---------------- CONFIG ----------------
+IMPORT_CSV = True
+
+# tabla -> (columna maximizada, columnas de instancia, configuraciones comparadas, grupos, clave)
+REPORTS = {
+    "per_instance": ("best_method_of", ("dataset", "instance", "m"), ("constructive", "local_search"),
+                     ("dataset", "n", "m"), ("dataset", "instance", "constructive", "local_search")),
+    "configs_per_instance": ("best_es_of", ("dataset", "instance", "m"), ("es_size",),
+                             ("dataset", "n", "m"), ("dataset", "instance", "es_size")),
+    "finalcomparison": ("best_method_of", ("dataset", "instance", "m"), ("method",),
+                        ("dataset", "n", "m"), ("dataset", "instance", "method")),
+    "race_per_instance": ("best_es_of", ("dataset", "instance", "m"), ("alpha", "es_size", "time_doing_grasp"),
+                          ("dataset", "n", "m"), ("dataset", "instance", "alpha", "es_size", "time_doing_grasp")),
+    "cgr_cgr2_summary": ("best_of", ("dataset", "instance", "method"), ("param",),
+                         ("dataset", "n", "method"), ("dataset", "instance", "method", "param")),
+}
+
+
+def log(msg):
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}", flush=True)
+
+def show(title, rows):
+    log(title)
+    if not rows:
+        print("  (sin filas)")
+        return
+    cols = list(rows[0].keys())
+    print("  " + " | ".join(cols))
+    for r in rows:
+        print("  " + " | ".join(f"{r[c]:.6f}" if isinstance(r[c], float) else str(r[c]) for c in cols))
+
+
+def main():
+    db = store.openStore()
+    if IMPORT_CSV:
+        for table, (_, _, _, _, key) in REPORTS.items():
+            path = os.path.join("results", table + ".csv")
+            if os.path.exists(path):
+                log(f"[IMPORT] {path}: {store.importCsv(db, path, key)} filas")
+
+    present = set(store.tables(db))
+    for table, (value, inst_cols, config_cols, group_cols, _) in REPORTS.items():
+        if table not in present:
+            continue
+        t0 = time.perf_counter()
+        summary = store.summarize(db, table, value, inst_cols, config_cols, group_cols)
+        points = store.rankPoints(db, table, value, inst_cols, config_cols, group_cols)
+        elapsed = time.perf_counter() - t0
+        show(f"== {table}: Dev_avg / #Best ({round(1000 * elapsed, 1)} ms) ==", summary)
+        show(f"== {table}: puntos por ranking ==", points)
+
+    store.closeStore(db)
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,16 @@
 
 # compare_grasppr_configs_like_final.py
-import os, re, csv, math, random, time
+import os, re, math, random
 import statistics as stats
 from datetime import datetime
 
+from structure.instance import compactIntegerDistances
 from algorithms.grasp_pr_time import execute  # GRASP+PR time-based
+from structure import bounds
+from structure import profile
+from experiments import runner
+from experiments import sink
+from experiments import store
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 os.chdir(BASE_DIR)
@@ -21,10 +27,15 @@ INSTANCES_PER_GROUP = 10
 ALPHA = 0.1
 SEED = 12345
 TIME_LIMIT = 15
+EVAL_BUDGET = None       # presupuesto de evaluaciones (consultas de distancia) en lugar de TIME_LIMIT
 RUNS = 3
 
 ELITE_SIZES = [ 5, 10, 15]
 TIME_DOING_GRASP = 0.6   # fijo
+WORKERS = 1              # procesos para la fase GRASP
+JOB_WORKERS = 1          # procesos del runner: jobs (instancia, es_size, run) en paralelo
+RESUME = False           # True: continúa una ejecución cortada (salta los jobs ya guardados)
+PROFILE = False          # True: tiempo por fase y contadores (structure/profile) en configs_runs.csv
 
 
 # ---------------- Utils ----------------
@@ -49,16 +60,6 @@ def m_for_instance(n, idx_file):
     frac = M_FRACS[min(block, len(M_FRACS) - 1)]
     return int(round(frac * n)), frac
 
-def write_csv(path, rows):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    if not rows:
-        return
-    with open(path, "w", newline="", encoding="utf-8") as f:
-        fieldnames = list(rows[0].keys())
-        w = csv.DictWriter(f, fieldnames=fieldnames)
-        w.writeheader()
-        w.writerows(rows)
-
 # -------- loaders (cópialos de tu script actual) --------
 def load_geo_instance(path, p):
     with open(path, "r") as f:
@@ -89,7 +90,9 @@ def load_ran_instance(path, p):
         i, j, val = ln.split()
         i = int(i); j = int(j); val = float(val)
         d[i][j] = d[j][i] = val
-    return {"name": os.path.basename(path), "n": n, "p": p, "d": d, "dataset": "Ran"}
+    inst = {"name": os.path.basename(path), "n": n, "p": p, "d": d, "dataset": "Ran"}
+    compactIntegerDistances(inst)  # distancias enteras: filas int16/int32 y cubetas en solution
+    return inst
 
 def load_instance(dataset, path, p):
     if dataset == "Geo":
@@ -102,106 +105,120 @@ def load_instance(dataset, path, p):
 def run_one(inst, es_size, run_id):
     seed = SEED + 100000 * run_id + 97 * es_size
     random.seed(seed)
+    if PROFILE:
+        profile.enable()
+        profile.reset()
 
+    run_stats = {}
     best_sol, iters = execute(
         inst,
         alpha=ALPHA,
         es_size=es_size,
-        time_limit=TIME_LIMIT,
+        time_limit=TIME_LIMIT if EVAL_BUDGET is None else None,
         time_doing_grasp=TIME_DOING_GRASP,
+        workers=WORKERS,
+        stats=run_stats,
+        max_evaluations=EVAL_BUDGET,
     )
-    return best_sol["of"], iters
-
-
-# ---------------- Experiment ----------------
-def experiment():
-    os.makedirs("results", exist_ok=True)
-    per_instance_rows = []
-    summary_rows = []
-
-    per_instance_path = os.path.join("results", "configs_per_instance.csv")
-    summary_path = os.path.join("results", "configs_summary.csv")
-
-    # acumuladores summary
-    summary_acc = {}  # (dataset,n,m,es_size,split) -> dev_sum, best_sum, count
-
+    return best_sol["of"], iters, run_stats
+
+def run_job(job):
+    # un job = (instancia, es_size, run); la instancia se reusa dentro del proceso
+    inst = runner.cachedInstance(job["path"], load_instance, job["dataset"], job["path"], job["m"])
+    ub = bounds.upperBound(inst)  # fuera del tiempo de la run (queda en inst)
+    ofv, iters, run_stats = run_one(inst, job["es_size"], job["run"])
+    res = {"of": ofv, "iters": iters, "upper_bound": ub, "name": inst["name"],
+           "distance_evals": run_stats["distance_evals"], "move_evals": run_stats["move_evals"]}
+    if PROFILE:
+        res.update(profile.row())
+    return res
+
+def build_jobs():
+    jobs = []
     for dataset in DATASETS:
         for n in NS:
             paths = list_instance_paths(dataset, n)
             if not paths:
                 log(f"[WARN] No hay instancias para {dataset} n={n}")
                 continue
-
-            log(f"== Dataset={dataset} n={n}. Instancias={len(paths)} ==")
-
             for path in paths:
                 idx_file = extract_idx(path)
                 m, frac = m_for_instance(n, idx_file)
-                inst = load_instance(dataset, path, p=m)
+                for es_size in ELITE_SIZES:
+                    for r in range(RUNS):
+                        jobs.append({"dataset": dataset, "n": n, "path": path, "idx_file": idx_file,
+                                     "instance": os.path.basename(path),
+                                     "m": m, "frac": frac, "es_size": es_size, "run": r,
+                                     "seed": SEED + 100000 * r + 97 * es_size})
+    return jobs
 
-                log(f"  {inst['name']} (idx={idx_file}) -> m={m} (frac={frac})")
 
-                es_best = {}
-                es_avg = {}
-                es_std = {}
+# ---------------- Experiment ----------------
+def instance_rows(results):
+    """Filas de configs_per_instance.csv de una instancia a partir de sus jobs."""
+    job0, res0 = results[0]
+    ub = res0["upper_bound"]
+    vals = {}
+    evals = {}
+    for job, res in results:
+        vals.setdefault(job["es_size"], []).append(res["of"])
+        evals.setdefault(job["es_size"], []).append((res["distance_evals"], res["move_evals"]))
+
+    es_best = {es: max(v) for es, v in vals.items()}
+    best_global = max(es_best.values())
+
+    rows = []
+    for es_size in ELITE_SIZES:
+        v = vals[es_size]
+        e = evals[es_size]
+        best_v = es_best[es_size]
+        rel_dev = 0.0 if best_global <= EPS else (best_global - best_v) / best_global
+        is_best = 1 if abs(best_v - best_global) <= 1e-9 else 0
+        rows.append({
+            "dataset": job0["dataset"],
+            "instance": res0["name"],
+            "n": job0["n"],
+            "m": job0["m"],
+            "frac": job0["frac"],
+            "alpha": ALPHA,
+            "time_limit_s": TIME_LIMIT if EVAL_BUDGET is None else "",
+            "eval_budget": "" if EVAL_BUDGET is None else EVAL_BUDGET,
+            "runs": RUNS,
 
-                for es_size in ELITE_SIZES:
-                    vals = []
-                    for r in range(RUNS):
-                        ofv, _ = run_one(inst, es_size, r)
-                        vals.append(ofv)
+            "es_size": es_size,
+            "time_doing_grasp": TIME_DOING_GRASP,
 
-                    es_best[es_size] = max(vals)
-                    es_avg[es_size] = sum(vals) / len(vals)
-                    es_std[es_size] = stats.pstdev(vals) if len(vals) > 1 else 0.0
+            "best_es_of": best_v,
+            "best_global_of": best_global,
+            "relative_dev": rel_dev,
+            "is_best": is_best,
+            "upper_bound": ub,
+            "gap_to_ub": bounds.gap(best_v, ub),
+
+            "avg_of": sum(v) / len(v),
+            "std_of": stats.pstdev(v) if len(v) > 1 else 0.0,
+            "avg_distance_evals": sum(x for x, _ in e) / len(e),
+            "avg_move_evals": sum(x for _, x in e) / len(e),
+        })
+    return rows
 
-                best_global = max(es_best.values())
+def accumulate(summary_acc, row):
+    acc_key = (row["dataset"], row["n"], row["m"], row["es_size"])
+    acc = summary_acc.setdefault(acc_key, {"dev_sum": 0.0, "best_sum": 0, "count": 0})
+    acc["dev_sum"] += row["relative_dev"]
+    acc["best_sum"] += row["is_best"]
+    acc["count"] += 1
 
-                for es_size in ELITE_SIZES:
-                    best_v = es_best[es_size]
-                    rel_dev = 0.0 if best_global <= EPS else (best_global - best_v) / best_global
-                    is_best = 1 if abs(best_v - best_global) <= 1e-9 else 0
-
-                    per_instance_rows.append({
-                        "dataset": dataset,
-                        "instance": inst["name"],
-                        "n": n,
-                        "m": m,
-                        "frac": frac,
-                        "alpha": ALPHA,
-                        "time_limit_s": TIME_LIMIT,
-                        "runs": RUNS,
-
-                        "es_size": es_size,
-                        "time_doing_grasp": TIME_DOING_GRASP,
-
-                        "best_es_of": best_v,
-                        "best_global_of": best_global,
-                        "relative_dev": rel_dev,
-                        "is_best": is_best,
-
-                        "avg_of": es_avg[es_size],
-                        "std_of": es_std[es_size],
-                    })
-
-                    acc_key = (dataset, n, m, es_size)
-                    acc = summary_acc.setdefault(acc_key, {"dev_sum": 0.0, "best_sum": 0, "count": 0})
-                    acc["dev_sum"] += rel_dev
-                    acc["best_sum"] += is_best
-                    acc["count"] += 1
-
-                # guardado incremental
-                write_csv(per_instance_path, per_instance_rows)
-                log("    [SAVE] configs_per_instance.csv actualizado")
-
-    # 4) Summary
+def summary_rows(summary_acc):
+    rows = []
     for (dataset, n, m, es_size), acc in summary_acc.items():
-        summary_rows.append({
+        rows.append({
             "dataset": dataset,
             "n": n,
             "m": m,
             "alpha": ALPHA,
-            "time_limit_s": TIME_LIMIT,
+            "time_limit_s": TIME_LIMIT if EVAL_BUDGET is None else "",
+            "eval_budget": "" if EVAL_BUDGET is None else EVAL_BUDGET,
             "runs": RUNS,
             "es_size": es_size,
             "time_doing_grasp": TIME_DOING_GRASP,
@@ -209,11 +226,55 @@ def experiment():
             "#Best": acc["best_sum"],
             "num_instances": acc["count"],
         })
+    rows.sort(key=lambda r: (r["dataset"], r["n"], r["m"], r["es_size"]))
+    return rows
 
-    summary_rows.sort(key=lambda r: (r["dataset"], r["n"], r["m"], r["es_size"]))
+def experiment():
+    if JOB_WORKERS > 1 and WORKERS > 1:
+        raise ValueError("JOB_WORKERS > 1 y WORKERS > 1 a la vez: usa solo uno de los dos")
+    os.makedirs("results", exist_ok=True)
 
+    runs_path = os.path.join("results", "configs_runs.csv")
+    per_instance_path = os.path.join("results", "configs_per_instance.csv")
+    summary_path = os.path.join("results", "configs_summary.csv")
 
-    write_csv(summary_path, summary_rows)
+    db = store.openStore()  # results/results.sqlite
+    # una fila por run (checkpoint) y una por (instancia, es_size), solo append
+    runs_sink = sink.openSink(runs_path, ("dataset", "instance", "es_size", "run"), resume=RESUME, store=db)
+    rows_sink = sink.openSink(per_instance_path, ("dataset", "instance", "es_size"), resume=RESUME, store=db)
+
+    summary_acc = {}  # (dataset,n,m,es_size) -> dev_sum, best_sum, count
+    for row in rows_sink["rows"]:
+        accumulate(summary_acc, row)
+
+    jobs = build_jobs()
+    n_instances = len({job["path"] for job in jobs})
+    finished = [0]
+
+    def on_instance(path, results):
+        finished[0] += 1
+        job0, res0 = results[0]
+        log(f"  {os.path.basename(path)} (idx={job0['idx_file']}) -> m={job0['m']} (frac={job0['frac']}) "
+            f"UB={res0['upper_bound']} [{finished[0]}/{n_instances}]")
+        rows = sink.newRows(rows_sink, instance_rows(results))  # resume: solo las filas nuevas
+        sink.append(rows_sink, rows)
+        for row in rows:
+            accumulate(summary_acc, row)
+        # resumen incremental
+        sink.writeAtomic(summary_path, summary_rows(summary_acc))
+        log("    [SAVE] configs_per_instance.csv / configs_summary.csv actualizados")
+
+    skipped = sum(1 for job in jobs if sink.contains(runs_sink, (job["dataset"], job["instance"], job["es_size"], job["run"])))
+    log(f"{len(jobs)} jobs ({n_instances} instancias, {skipped} ya guardados), {JOB_WORKERS} procesos")
+    try:
+        runner.runJobs(jobs, run_job, workers=JOB_WORKERS, group_key=lambda j: j["path"],
+                       on_group=on_instance, sink=runs_sink)
+    finally:
+        sink.closeSink(runs_sink)
+        sink.closeSink(rows_sink)
+        store.closeStore(db)
+
+    sink.writeAtomic(summary_path, summary_rows(summary_acc))
 
     log("[OK] Saved:")
     log(os.path.abspath(per_instance_path))
@@ -221,4 +282,3 @@ def experiment():
 
 if __name__ == "__main__":
     experiment()
-
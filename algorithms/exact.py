@@ -0,0 +1,192 @@
+"""
+Exact solver for Max-Min Diversity.
+
+OF* >= t iff the threshold graph G_t (edges with d >= t) has a p-clique, so
+OF* is the largest distinct distance t for which G_t has one. We keep
+  lo: value with a known p-clique (a heuristic solution gives the start),
+  hi: value proven without one (the upper bound of structure/bounds + 1 step),
+and binary search the distinct distances in between. Each test is a
+branch-and-bound for a p-clique on bitsets over the (p-1)-core of G_t,
+pruned with greedy colourings (MCQ style: a set coloured with c colours has
+no clique larger than c).
+"""
+import bisect
+import csv
+import os
+
+from constructives import cgrasp
+from localsearch import lsfirstimp
+from structure import bounds
+from structure import deadline as dl
+from structure import solution
+from structure import trace as traces
+
+
+class _Timeout(Exception):
+    pass
+
+
+def _colour_order(adj, P):
+    """Greedy colouring of P. Returns (vertices, colours) in colour class order;
+    colours[k] bounds the clique size in the first k+1 vertices."""
+    order = []
+    colours = []
+    c = 0
+    uncoloured = P
+    while uncoloured:
+        c += 1
+        avail = uncoloured
+        while avail:
+            low = avail & -avail
+            v = low.bit_length() - 1
+            uncoloured &= ~low
+            avail &= ~(adj[v] | low)
+            order.append(v)
+            colours.append(c)
+    return order, colours
+
+
+def _expand(adj, P, R, p, counters, deadline):
+    counters['nodes'] += 1
+    if counters['nodes'] % 1000 == 0 and dl.expired(deadline):
+        raise _Timeout()
+
+    order, colours = _colour_order(adj, P)
+    # del color més alt al més baix: si ni així arribem a p, podem tallar
+    for k in range(len(order) - 1, -1, -1):
+        if len(R) + colours[k] < p:
+            return None
+        v = order[k]
+        R.append(v)
+        if len(R) == p:
+            return list(R)
+        NP = P & adj[v]
+        if len(R) + NP.bit_count() >= p:
+            found = _expand(adj, NP, R, p, counters, deadline)
+            if found is not None:
+                return found
+        R.pop()
+        P &= ~(1 << v)
+    return None
+
+
+def _renumber(adj, alive):
+    """Core vertices renumbered 0..k-1 by non-increasing degree, so that the
+    greedy colourings (lowest bit first) follow the MCQ initial order.
+    Returns (local adjacency list, local -> original node)."""
+    nodes = []
+    rest = alive
+    while rest:
+        low = rest & -rest
+        nodes.append(low.bit_length() - 1)
+        rest &= ~low
+    nodes.sort(key=lambda u: -(adj[u] & alive).bit_count())
+    pos = {u: k for k, u in enumerate(nodes)}
+    local = []
+    for u in nodes:
+        mask = 0
+        nb = adj[u] & alive
+        while nb:
+            low = nb & -nb
+            mask |= 1 << pos[low.bit_length() - 1]
+            nb &= ~low
+        local.append(mask)
+    return local, nodes
+
+
+def findClique(inst, t, r=None, counters=None, deadline=None):
+    """A p-set with all its distances >= t, or None if there is none.
+    Raises _Timeout if the deadline expires before deciding."""
+    if counters is None:
+        counters = {'nodes': 0}
+    adj, alive = bounds.thresholdCore(inst, t, r)
+    if alive.bit_count() < inst['p']:
+        return None
+    local, nodes = _renumber(adj, alive)
+    found = _expand(local, (1 << len(nodes)) - 1, [], inst['p'], counters, deadline)
+    if found is None:
+        return None
+    return [nodes[k] for k in found]
+
+
+def _initial_solution(inst, tries=10):
+    best = None
+    for _ in range(tries):
+        sol = cgrasp.construct(inst, 0.1)
+        lsfirstimp.improve(sol)
+        if best is None or sol['of'] > best['of']:
+            best = sol
+    return best
+
+
+def solve(inst, time_limit=None, initial=None, stats=None, trace=None):
+    """
+    Optimal solution of inst.
+
+    initial: optional solution used as lower bound (default: a few GRASP
+             iterations).
+    time_limit: seconds; if the search runs out of time the best solution
+                found is returned and stats['proven'] is False.
+    stats: optional dict, filled with proven, lower/upper bound, the number of
+           threshold tests and of branch-and-bound nodes.
+    trace: optional structure/trace (phase "initial", then "exact" for each
+           better clique found).
+    """
+    deadline = dl.createDeadline(time_limit) if time_limit is not None else None
+    n, d = inst['n'], inst['d']
+
+    best = initial if initial is not None else _initial_solution(inst)
+    best = {'instance': inst, 'sol': set(best['sol']), 'of': best['of']}
+    traces.record(trace, best['of'], "initial")
+    ub = bounds.upperBound(inst)
+    r = bounds._row_values(inst)
+
+    values = sorted({d[u][v] for u in range(n) for v in range(u + 1, n)})
+    # invariant: values[lo] has a p-clique, values[hi] (if < len) has none
+    lo = bisect.bisect_right(values, best['of'] + bounds.EPS) - 1
+    hi = bisect.bisect_right(values, ub + bounds.EPS)
+    counters = {'nodes': 0}
+    tests = 0
+    proven = True
+    try:
+        while hi - lo > 1:
+            # first try the top value: with a tight bound a single test proves it
+            mid = hi - 1 if tests == 0 else (lo + hi) // 2
+            tests += 1
+            found = findClique(inst, values[mid], r, counters, deadline)
+            if found is None:
+                hi = mid
+            else:
+                lo = mid
+                best = {'instance': inst, 'sol': set(found), 'of': 0.0}
+                best['of'] = solution.evaluate(best)
+                traces.record(trace, best['of'], "exact")
+    except _Timeout:
+        proven = False
+
+    if stats is not None:
+        stats['proven'] = proven
+        stats['lower_bound'] = best['of']
+        stats['upper_bound'] = values[hi - 1] if hi - 1 > lo else best['of']
+        stats['tests'] = tests
+        stats['nodes'] = counters['nodes']
+    return best
+
+
+# ---------------------------------------------------------------------------
+# Cached optima (results/optima.csv)
+# ---------------------------------------------------------------------------
+OPTIMA_FIELDS = ["dataset", "instance", "n", "m", "optimum", "proven", "upper_bound", "time_s", "nodes"]
+
+
+def loadOptima(path):
+    """{(dataset, instance, m): optimum} with the proven optima of the file
+    ({} if it does not exist)."""
+    if not os.path.exists(path):
+        return {}
+    optima = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if row["proven"] == "1":
+                optima[(row["dataset"], row["instance"], int(row["m"]))] = float(row["optimum"])
+    return optima
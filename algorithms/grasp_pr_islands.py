@@ -0,0 +1,193 @@
+from algorithms import parallel
+from algorithms import prgreedy_good
+from constructives import cgrasp
+from localsearch import lsbestimp, lsfirstimp
+from structure import deadline as dl
+from structure import elite
+from structure import evaluations
+from structure import stopping
+from structure import trace as traces
+import multiprocessing
+import queue
+import random
+import time
+
+LOCAL_SEARCHES = {"FLS": lsfirstimp, "BLS": lsbestimp}
+
+
+def defaultIslands(k):
+    """k diverse island configurations (alpha, elite size, local search)."""
+    alphas = [0.1, 0.3, 0.05, 0.5, 0.2, -1]     # -1 -> random alpha per construction
+    sizes = [10, 5, 15]
+    searches = ["FLS", "BLS"]
+    return [{'alpha': alphas[i % len(alphas)],
+             'es_size': sizes[i % len(sizes)],
+             'ls': searches[i % len(searches)]} for i in range(k)]
+
+
+def _island(island_id, meta, config, seed, time_limit, max_evaluations, migration_interval, inbox, outbox,
+            results, trace=None):
+    """GRASP+PR loop of one island (runs in its own process).
+
+    Builds GRASP solutions until the Elite Set is full, then relinks the
+    pending elite pairs; when no pairs remain it goes back to GRASP. Every
+    migration_interval seconds it sends its best member to the next island
+    and inserts the ones received from the previous island.
+    max_evaluations: evaluation budget of this island (None: time only).
+    trace: the coordinator's trace; the island records into a copy (same
+    start, its own evaluation count) and returns the events.
+    """
+    counts = evaluations.snapshot()
+    deadline = dl.createDeadline(time_limit, max_evaluations)
+    if trace is not None:
+        trace = dict(trace, evals_start=evaluations.COUNTS['distances'], events=[])
+    random.seed(seed)
+    inst, shm = parallel.attachInstance(meta)
+
+    ls = LOCAL_SEARCHES[config['ls']]
+    ls_stop = config.get('ls_stop') or stopping.defaultLocalSearch(inst)
+    pool = elite.createElitePool(config['es_size'], order=config.get('pair_order', "diversity"))
+    pr_options = {'mode': config.get('pr_mode', "both"),
+                  'max_fraction': config.get('pr_fraction', 1.0),
+                  'max_no_improve': config.get('pr_no_improve')}
+
+    best = None
+    iterations = relinks = sent = received = 0
+    next_migration = time.monotonic() + migration_interval
+
+    while not dl.expired(deadline):
+        pair = elite.nextPair(pool) if len(pool['members']) >= pool['size'] else None
+        if pair is None:
+            sol = cgrasp.construct(inst, config['alpha'], deadline)
+            if sol is None:
+                break
+            iterations += 1
+        else:
+            relinks += 1
+            sol = prgreedy_good.relink(*pair, **pr_options, deadline=deadline)
+        ls.improve(sol, stop=ls_stop, deadline=deadline)
+        elite.update(pool, sol)
+
+        if best is None or sol['of'] > best['of']:
+            best = {'sol': sorted(sol['sol']), 'of': sol['of']}
+            traces.record(trace, sol['of'], "grasp" if pair is None else "pr")
+
+        if time.monotonic() >= next_migration:
+            next_migration = time.monotonic() + migration_interval
+            top = elite.best(pool)
+            outbox.put((island_id, sorted(top['sol']), top['of']))
+            sent += 1
+            while True:
+                try:
+                    _, selection, of = inbox.get_nowait()
+                except queue.Empty:
+                    break
+                received += 1
+                elite.update(pool, parallel.rebuild(inst, selection, of))
+                if best is None or of > best['of']:
+                    best = {'sol': selection, 'of': of}
+                    traces.record(trace, of, "migrant")
+
+    if best is None:
+        best = {'sol': None, 'of': -float('inf')}
+    result = {'island': island_id, 'config': config, 'sol': best['sol'], 'of': best['of'],
+              'iterations': iterations, 'relinks': relinks, 'sent': sent, 'received': received,
+              'overshoot_s': dl.overshoot(deadline),
+              'evaluation_overshoot': dl.evaluationOvershoot(deadline),
+              'events': trace['events'] if trace is not None else []}
+    result.update(evaluations.since(counts))
+    results.put(result)
+    # migrants nobody will read must not block the exit of the process
+    outbox.cancel_join_thread()
+    inst['d'] = None
+    shm.close()
+
+
+def execute(inst, islands=None, time_limit=30, migration_interval=2.0, stats=None, max_evaluations=None,
+            trace=None):
+    """
+    Asynchronous island model: one GRASP+PR island per process (own alpha,
+    elite size and local search), all sharing the distance matrix, with the
+    best elite member migrating around a ring every migration_interval s.
+
+    islands: list of dicts {'alpha', 'es_size', 'ls': "FLS"|"BLS"} and
+             optionally 'ls_stop', 'pair_order', 'pr_mode', 'pr_fraction',
+             'pr_no_improve'. Default: defaultIslands(cpu_count()).
+    stats: optional dict, filled with the per-island results and the distance
+           lookups / move evaluations of all the islands together.
+    max_evaluations: evaluation budget (distance lookups) instead of, or on
+                     top of, time_limit (None: no time limit), split evenly
+                     among the islands. Migrations stay on the clock, so a
+                     run with a budget is still not reproducible.
+    trace: optional structure/trace; gets the improvements of every island
+           merged in time order (evaluations are those of the island that
+           found each one).
+    Returns (best, iterations) like grasp_pr_time.execute.
+    """
+    if islands is None:
+        islands = defaultIslands(multiprocessing.cpu_count())
+    k = len(islands)
+    for config in islands:
+        if config['ls'] not in LOCAL_SEARCHES:
+            raise ValueError(f"Unknown local search: {config['ls']}")
+
+    shm, meta = parallel.shareInstance(inst)
+    inboxes = [multiprocessing.Queue() for _ in range(k)]
+    results = multiprocessing.Queue()
+    procs = []
+    try:
+        limits = [f"{time_limit}s"] if time_limit is not None else []
+        if max_evaluations is not None:
+            limits.append(f"{max_evaluations} evals")
+        print(f"Starting {k} islands (Limit: {', '.join(limits)}, migration every {migration_interval}s)...")
+        for i, config in enumerate(islands):
+            seed = random.getrandbits(32)
+            budget = None
+            if max_evaluations is not None:
+                budget = max_evaluations // k + (1 if i < max_evaluations % k else 0)
+            proc = multiprocessing.Process(
+                target=_island,
+                args=(i, meta, config, seed, time_limit, budget, migration_interval,
+                      inboxes[i], inboxes[(i + 1) % k], results, trace))
+            proc.start()
+            procs.append(proc)
+
+        island_results = []
+        for _ in range(k):
+            try:
+                island_results.append(results.get(timeout=time_limit + 60 if time_limit is not None else None))
+            except queue.Empty:
+                raise RuntimeError("An island did not report its result (crashed?)")
+        for proc in procs:
+            proc.join()
+    finally:
+        for proc in procs:
+            if proc.is_alive():
+                proc.terminate()
+        for q in inboxes:
+            q.cancel_join_thread()
+        parallel.releaseShared(shm)
+
+    island_results.sort(key=lambda r: r['island'])
+    counted = {'distance_evals': 0, 'move_evals': 0}
+    for r in island_results:
+        evaluations.add(r)   # the islands' work, as the workers' in algorithms/parallel
+        counted['distance_evals'] += r['distance_evals']
+        counted['move_evals'] += r['move_evals']
+    if trace is not None:
+        for r in island_results:
+            traces.merge(trace, r['events'])
+    for r in island_results:
+        print(f"  island {r['island']} {r['config']}: of={r['of']} iters={r['iterations']} "
+              f"relinks={r['relinks']} sent={r['sent']} received={r['received']} "
+              f"overshoot={round(r['overshoot_s'], 4)}s evaluations={r['distance_evals']}")
+    if stats is not None:
+        stats['islands'] = island_results
+        stats['evaluation_overshoot'] = sum(r['evaluation_overshoot'] for r in island_results)
+        stats.update(counted)
+
+    top = max(island_results, key=lambda r: r['of'])
+    if top['sol'] is None:
+        return None, 0
+    best = parallel.rebuild(inst, top['sol'], top['of'])
+    return best, sum(r['iterations'] for r in island_results)
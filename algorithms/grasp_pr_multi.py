@@ -0,0 +1,174 @@
+from algorithms import prgreedy_good
+from constructives import cgrasp
+from localsearch import lsfirstimp
+from structure import bounds
+from structure import deadline as dl
+from structure import elite
+from structure import evaluations
+from structure import stopping
+from structure import trace as traces
+
+
+def instanceViews(inst, ps):
+    """{p: inst with that p}. The views share 'd' (and everything else), so
+    one instance in memory serves every p."""
+    views = {}
+    for p in ps:
+        if not 2 <= p <= inst['n']:
+            raise ValueError(f"Invalid p={p} for n={inst['n']}")
+        views[p] = dict(inst, p=p)
+        views[p].pop('upper_bound', None)   # depends on p
+    return views
+
+
+def _light_copy(sol):
+    return {'instance': sol['instance'], 'sol': set(sol['sol']), 'of': sol['of']}
+
+
+def execute(inst, ps, alpha, es_size=10, time_limit=30, time_doing_grasp=0.4,
+            ls_stop=None, stats=None, pr_mode="both", pr_fraction=1.0, pr_no_improve=None,
+            pair_order="diversity", stop_at_bound=True, max_evaluations=None, trace=None):
+    """
+    GRASP + PR for several p on the same instance in one run (e.g. the
+    0.1n and 0.3n of M_FRACS, or a sweep of p).
+
+    Each GRASP iteration builds one construction up to max(ps); its first p
+    picks are the construction for every smaller p (cgrasp snapshots), so a
+    single pass over the candidate list feeds every p. The distance matrix is
+    shared by all p (instanceViews); each p keeps its own local search, Elite
+    Set and upper bound, since solutions of different sizes are not
+    interchangeable. The PR phase relinks the pending pairs of every p in
+    round robin; a p proven optimal (best reaches its upper bound) gets no
+    more work. When no pairs remain and there is time left, the run goes
+    back to nested GRASP until a new elite member of some p queues new
+    pairs, then relinks again (as grasp_pr_time; stats[p]['cycles'] counts
+    these returns).
+
+    Same parameters as grasp_pr_time.execute for a single p (sequential only),
+    max_evaluations included: an evaluation budget for the whole run.
+    stats: optional dict; stats[p] gets the stop reasons / bound info of p
+           and the distance lookups / move evaluations of the run.
+    trace: optional {p: structure/trace}; each one gets the improvements of
+           the best of its p (phase "grasp" / "pr").
+    Returns ({p: best}, iterations).
+    """
+    if pr_mode not in ("both", "bidirectional"):
+        raise ValueError(f"Unknown pr_mode: {pr_mode}")
+    ps = sorted(set(ps))
+    views = instanceViews(inst, ps)
+    top = ps[-1]
+    # the bounds are not part of the run: computed before its time starts
+    upper = {p: bounds.upperBound(views[p]) for p in ps}
+
+    counts = evaluations.snapshot()
+    deadline = dl.createDeadline(time_limit, max_evaluations)
+
+    pools = {p: elite.createElitePool(es_size, order=pair_order) for p in ps}
+    best = {p: None for p in ps}
+    ls_reasons = {p: {} for p in ps}
+    optimal = {p: False for p in ps}
+    if ls_stop is None:
+        ls_stop = stopping.defaultLocalSearch(inst)
+
+    def merge(p, sol, ls_reason, phase):
+        stopping.countReason(ls_reasons[p], ls_reason)
+        elite.update(pools[p], sol)
+        if best[p] is None or sol['of'] > best[p]['of']:
+            best[p] = _light_copy(sol)
+            optimal[p] = stop_at_bound and bounds.isOptimal(sol['of'], upper[p])
+            if trace is not None:
+                traces.record(trace.get(p), sol['of'], phase)
+
+    limits = [f"{round(time_limit * time_doing_grasp, 2)}s"] if time_limit is not None else []
+    if max_evaluations is not None:
+        limits.append(f"{int(max_evaluations * time_doing_grasp)} evals")
+    print(f"Starting multi-p GRASP Phase (p={ps}, Limit: {', '.join(limits)})...")
+    pr_options = {'mode': pr_mode, 'max_fraction': pr_fraction, 'max_no_improve': pr_no_improve}
+    relinks = {p: 0 for p in ps}
+    iterations = 0
+    grasp_reason = None
+    # cycle 0 is the usual GRASP -> PR split. When PR runs out of pairs with
+    # time left, go back to GRASP until a new elite member queues new pairs
+    cycles = 0
+
+    while True:
+        # --- PHASE 1: GRASP, one nested construction per iteration ---
+        while True:
+            grasp_reason = dl.expiredReason(deadline)
+            if grasp_reason is not None:
+                break
+            if cycles == 0 and dl.progress(deadline) > time_doing_grasp and \
+                    all(len(pools[p]['members']) >= es_size for p in ps):
+                grasp_reason = "grasp_time"
+                break
+            if all(optimal.values()):
+                grasp_reason = "optimal"
+                break
+            # back to GRASP after PR: relink as soon as some p has new pairs
+            if cycles > 0 and any(elite.pendingPairs(pools[p]) for p in ps if not optimal[p]):
+                grasp_reason = "new_pairs"
+                break
+
+            # only as far as the largest p still open
+            open_ps = [p for p in ps if not optimal[p]]
+            snapshots = {p: None for p in open_ps}
+            if cgrasp.construct(views[open_ps[-1]], alpha, deadline, snapshots) is None:
+                grasp_reason = dl.expiredReason(deadline) or "time_limit"
+                break
+            iterations += 1
+
+            for p in open_ps:
+                sol = snapshots[p]
+                sol['instance'] = views[p]
+                merge(p, sol, lsfirstimp.improve(sol, stop=ls_stop, deadline=deadline), "grasp")
+
+        # --- PHASE 2: Path Relinking, round robin over p ---
+        if cycles == 0:
+            split_reason = grasp_reason
+            print(f"\nGRASP Phase stopped ({grasp_reason}) after {iterations} iterations.")
+        active = [p for p in ps if not optimal[p]]
+        while active and not dl.expired(deadline):
+            for p in list(active):
+                pair = elite.nextPair(pools[p])
+                if pair is None:
+                    active.remove(p)
+                    continue
+                relinks[p] += 1
+                path_sol = prgreedy_good.relink(*pair, **pr_options, deadline=deadline)
+                merge(p, path_sol, lsfirstimp.improve(path_sol, stop=ls_stop, deadline=deadline), "pr")
+                if optimal[p]:
+                    active.remove(p)
+                if dl.expired(deadline):
+                    break
+
+        if all(optimal.values()) or dl.expired(deadline):
+            break
+        cycles += 1
+
+    overshoot = dl.overshoot(deadline)
+    counted = evaluations.since(counts)
+    for p in ps:
+        if optimal[p]:
+            pr_reason = "optimal"
+        else:
+            pr_reason = dl.expiredReason(deadline) or "no_pairs"
+        gap = bounds.gap(best[p]['of'], upper[p]) if best[p] else None
+        print(f"  p={p}: of={best[p]['of'] if best[p] else None} relinks={relinks[p]} "
+              f"returns to GRASP: {cycles} PR stop: {pr_reason}. Gap to UB {round(upper[p], 4)}: {gap}")
+        if stats is not None:
+            stats[p] = {
+                'grasp_stop_reason': split_reason,
+                'cycles': cycles,
+                'elapsed_s': dl.elapsed(deadline),
+                'pr_stop_reason': pr_reason,
+                'ls_stop_reasons': ls_reasons[p],
+                'overshoot_s': overshoot,
+                'evaluation_overshoot': dl.evaluationOvershoot(deadline),
+                'upper_bound': upper[p],
+                'gap_to_ub': gap,
+                'proven_optimal': optimal[p],
+                'relinks': relinks[p],
+            }
+            stats[p].update(counted)   # of the whole run, not only of p
+
+    return best, iterations
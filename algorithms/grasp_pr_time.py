@@ -1,103 +1,253 @@
 from constructives import cgrasp
+from algorithms import parallel
 from algorithms import prgreedy_good
 from localsearch import lsfirstimp
-import time
+from structure import bounds
+from structure import deadline as dl
+from structure import elite
+from structure import evaluations
+from structure import profile
+from structure import stopping
+from structure import trace as traces
 import copy
-from itertools import combinations
 
-def updateEliteSet(sol, es_size, elite_set):
-    # Simple logic to add to set if not full
-    if len(elite_set) < es_size:
-        elite_set.append(copy.deepcopy(sol))
-        return True
+def _sequential_grasp(inst, alpha, ls_stop, deadline):
+    while True:
+        t0 = profile.start()
+        sol = cgrasp.construct(inst, alpha, deadline)
+        profile.stop("construction", t0)
+        if sol is None:  # deadline expired while constructing
+            yield None, stopping.DEADLINE
+            continue
+        t0 = profile.start()
+        reason = lsfirstimp.improve(sol, stop=ls_stop, deadline=deadline)
+        profile.stop("local_search", t0)
+        yield sol, reason
 
-    # Check if better than the worst in the set
-    worse_solutions = [s for s in elite_set if s['of'] < sol['of']]
-    
-    if not worse_solutions:
-        return False
+def _sequential_relink(pool, pr_options, ls_stop, deadline):
+    while not dl.expired(deadline):
+        pair = elite.nextPair(pool)
+        if pair is None:
+            return
+        t0 = profile.start()
+        path_sol = prgreedy_good.relink(*pair, **pr_options, deadline=deadline)
+        profile.stop("relinking", t0)
+        t0 = profile.start()
+        reason = lsfirstimp.improve(path_sol, stop=ls_stop, deadline=deadline)
+        profile.stop("local_search", t0)
+        yield path_sol, reason
 
-    # Find the most similar among the worse ones (Diversity preservation)
-    most_similar_sol = None
-    max_similarity = -1
-    new_sol_set = sol['sol']
-    
-    for s in worse_solutions:
-        similarity = len(new_sol_set.intersection(set(s['sol'])))
-        if similarity > max_similarity:
-            max_similarity = similarity
-            most_similar_sol = s
-    
-    elite_set.remove(most_similar_sol)
-    elite_set.append(sol)
-    return True
+def execute(inst, alpha, es_size=10, time_limit=30, time_doing_grasp = 0.4,
+            ls_stop=None, grasp_stop=None, stats=None,
+            pr_mode="both", pr_fraction=1.0, pr_no_improve=None,
+            pair_order="diversity", workers=1, upper_bound=None, stop_at_bound=True,
+            max_evaluations=None, trace=None):
+    """
+    ls_stop: stopping policy for every local search (default: old max_iter cap).
+    grasp_stop: optional policy over GRASP iterations (e.g. stopping.stagnation)
+                that ends the GRASP phase early once the Elite Set is full,
+                leaving the remaining time to PR.
+    stats: optional dict, filled with the stop reasons of the run, the
+           overshoot (seconds past time_limit), the time actually used
+           (elapsed_s) and the distance lookups /
+           move evaluations of the run (structure/evaluations).
+    pr_mode: "both" (greedy PR s1->s2 and s2->s1, keep the best) or
+             "bidirectional" (walk from both ends until they meet).
+    pr_fraction / pr_no_improve: truncate each path (see prgreedy_good).
+    pair_order: order of the pending elite pairs ("diversity" or "quality").
+                Each pair is relinked once; when no pairs remain and there is
+                time left, the run goes back to GRASP until a new elite member
+                brings new pairs (stats['cycles'] counts these returns).
+    workers: > 1 runs the GRASP constructions + local searches, and then the
+             relinkings of the elite pairs (+ their local search), in that many
+             processes sharing the distance matrix (see algorithms/parallel).
+             Results are merged in dispatch order: reproducible for a fixed
+             seed and worker count.
+    upper_bound: known upper bound of the optimal OF (default: structure/bounds,
+                 cached in inst). With stop_at_bound the run stops as soon as
+                 best['of'] reaches it (proven optimal); otherwise the gap is
+                 reported in stats.
+    max_evaluations: evaluation budget (distance lookups) instead of, or on
+                     top of, time_limit (None: no time limit). The GRASP/PR
+                     split then uses the fraction of the budget spent, so the
+                     run does not depend on the machine.
+    trace: optional structure/trace, gets an event per improvement of the best
+           (phase "grasp" / "pr"). If it has a target, the run stops as soon
+           as the best reaches it (time-to-target runs).
+    With structure/profile enabled, the phases of the run (construction,
+    local search, elite update, relinking, deepcopy; "workers" for the time
+    spent waiting for the worker processes) are timed.
+    """
+    if pr_mode not in ("both", "bidirectional"):
+        raise ValueError(f"Unknown pr_mode: {pr_mode}")
 
-def execute(inst, alpha, es_size=10, time_limit=30, time_doing_grasp = 0.4):
     best = None
-    elite_set = []
+    pool = elite.createElitePool(es_size, order=pair_order)
+    elite_set = pool['members']
     iterations = 0
-    start_time = time.time()
+    # the bound is not part of the run: computed before its time and counts start
+    if upper_bound is None:
+        upper_bound = bounds.upperBound(inst)
+    # monotonic deadline (+ evaluation budget), also checked inside construct / local search / PR
+    counts = evaluations.snapshot()
+    deadline = dl.createDeadline(time_limit, max_evaluations)
     
     # --- CONFIGURATION ---
     # Note: If the Elite Set isn't full, we ignore the split and keep building.
-    GRASP_TIME_LIMIT = time_limit * time_doing_grasp
-    mi = 50 if inst["n"] >= 500 else 200
+    if ls_stop is None:
+        ls_stop = stopping.defaultLocalSearch(inst)
+    ls_reasons = {}
+    grasp_state = stopping.start(grasp_stop) if grasp_stop is not None else None
+    grasp_reason = None
+    optimal = False
 
     # --- PHASE 1: GRASP Construction ---
-    print(f"Starting GRASP Phase (Limit: {round(GRASP_TIME_LIMIT, 2)}s)...")
-    
-    while True:
-        elapsed = time.time() - start_time
-        
-        # STOPPING CRITERIA:
-        # 1. If we passed the 70% mark AND we have a full Elite Set -> Switch to PR
-        # 2. If we are dangerously close to the absolute total limit (leaving 1s buffer) -> Switch/Stop
-        if (elapsed > GRASP_TIME_LIMIT and len(elite_set) >= es_size) or (elapsed > time_limit):
-            break
-
-        iterations += 1
-        
-        # 1. Construct
-        sol = cgrasp.construct(inst, alpha)
-        
-        # 2. Improve (Using lsfast for efficiency)
-        lsfirstimp.improve(sol, max_iter=mi)
-
-        
-        # 3. Update Elite Set & Best
-        updateEliteSet(sol, es_size, elite_set)
-        
-        if best is None or best['of'] < sol['of']:
-            best = copy.deepcopy(sol)
-            
-        # print(f"Iter {iterations}: {round(sol['of'], 2)}", end="\r")
-
-    # --- PHASE 2: Static Path Relinking ---
-    print(f"\nStarting PR Phase with {len(elite_set)} elite solutions...")
-    
-    # Generate all pairs from the Elite Set
-    pairs = list(combinations(elite_set, 2))
+    limits = [f"{round(time_limit * time_doing_grasp, 2)}s"] if time_limit is not None else []
+    if max_evaluations is not None:
+        limits.append(f"{int(max_evaluations * time_doing_grasp)} evals")
+    print(f"Starting GRASP Phase (Limit: {', '.join(limits)}, workers: {workers})...")
+    # one pool of workers for the whole run: GRASP and PR alternate in it
+    shared = parallel.startPool(inst, workers) if workers > 1 else None
+    if workers > 1:
+        results = parallel.graspResults(inst, alpha, ls_stop, workers, deadline, shared=shared)
+    else:
+        results = _sequential_grasp(inst, alpha, ls_stop, deadline)
+    pr_options = {'mode': pr_mode, 'max_fraction': pr_fraction, 'max_no_improve': pr_no_improve}
     p = 0
-    while time.time() - start_time < time_limit and len(pairs) > 0:
-        s1, s2 = pairs[p % len(pairs)]
-        p += 1
+    # cycle 0 is the usual GRASP -> PR split. When PR runs out of pairs with
+    # time left, go back to GRASP until a new elite member queues new pairs
+    # (as grasp_pr_islands does), so the whole time_limit is used.
+    cycles = 0
+
+    try:
+        while True:
+            while True:
+                # STOPPING CRITERIA:
+                # 1. If we passed the 70% mark AND we have a full Elite Set -> Switch to PR
+                # 2. If we are dangerously close to the absolute total limit (leaving 1s buffer) -> Switch/Stop
+                grasp_reason = dl.expiredReason(deadline)
+                if grasp_reason is not None:
+                    break
+                if cycles == 0 and dl.progress(deadline) > time_doing_grasp and len(elite_set) >= es_size:
+                    grasp_reason = "grasp_time"
+                    break
+                # 3. Proven optimal -> nothing left to do
+                if optimal:
+                    grasp_reason = "optimal"
+                    break
+                if traces.reached(trace):
+                    grasp_reason = "target"
+                    break
+                # 4. Converged GRASP (optional policy) -> give the rest of the time to PR
+                if cycles == 0 and grasp_state is not None and len(elite_set) >= es_size:
+                    grasp_reason = stopping.check(grasp_state)
+                    if grasp_reason is not None:
+                        break
+                # 5. Back to GRASP after PR: relink as soon as there are new pairs
+                if cycles > 0 and elite.pendingPairs(pool):
+                    grasp_reason = "new_pairs"
+                    break
+
+                iterations += 1
+
+                # 1. Construct + 2. Improve (Using lsfast for efficiency)
+                t0 = profile.start() if workers > 1 else None
+                sol, ls_reason = next(results)
+                profile.stop("workers", t0)
+                stopping.countReason(ls_reasons, ls_reason)
+                if sol is None:  # construction cancelled by the deadline
+                    iterations -= 1
+                    grasp_reason = dl.expiredReason(deadline) or "time_limit"
+                    break
+
+
+                # 3. Update Elite Set & Best
+                t0 = profile.start()
+                elite.update(pool, sol)
+                profile.stop("elite_update", t0)
+
+                if best is None or best['of'] < sol['of']:
+                    t0 = profile.start()
+                    best = copy.deepcopy(sol)
+                    profile.stop("deepcopy", t0)
+                    optimal = stop_at_bound and bounds.isOptimal(best['of'], upper_bound)
+                    traces.record(trace, best['of'], "grasp")
+
+                if grasp_state is not None:
+                    stopping.step(grasp_state, best['of'])
+
+                # print(f"Iter {iterations}: {round(sol['of'], 2)}", end="\r")
+
+            # --- PHASE 2: Static Path Relinking ---
+            if cycles == 0:
+                split_reason = grasp_reason
+                print(f"\nGRASP Phase stopped ({grasp_reason}) after {iterations} iterations. LS stops: {ls_reasons}")
+                print(f"Starting PR Phase with {len(elite_set)} elite solutions...")
+
+            if workers > 1:
+                relinked = parallel.relinkResults(inst, lambda: elite.nextPair(pool), pr_options, ls_stop,
+                                                  workers, deadline, shared=shared)
+            else:
+                relinked = _sequential_relink(pool, pr_options, ls_stop, deadline)
 
-        pr_1 = prgreedy_good.greedyPathRelinking(s1, s2)
-        if time.time() - start_time >= time_limit:
-            break
+            stream = relinked if not (optimal or traces.reached(trace)) else iter(())
+            while True:
+                t0 = profile.start() if workers > 1 else None
+                path_sol, ls_reason = next(stream, (None, None))
+                profile.stop("workers", t0)
+                if path_sol is None:
+                    break
+                p += 1
+                stopping.countReason(ls_reasons, ls_reason)
 
-        pr_2 = prgreedy_good.greedyPathRelinking(s2, s1)
-        path_sol = pr_1 if pr_1['of'] > pr_2['of'] else pr_2
+                t0 = profile.start()
+                elite.update(pool, path_sol)  # queues only the pairs of the new member
+                profile.stop("elite_update", t0)
 
-        if time.time() - start_time >= time_limit:
-            break
+                if best is None or path_sol['of'] > best['of']:
+                    t0 = profile.start()
+                    best = copy.deepcopy(path_sol)
+                    profile.stop("deepcopy", t0)
+                    traces.record(trace, best['of'], "pr")
+                    if stop_at_bound and bounds.isOptimal(best['of'], upper_bound):
+                        optimal = True
+                        break
+                    if traces.reached(trace):
+                        break
+            relinked.close()
 
-        lsfirstimp.improve(path_sol, max_iter=mi)
+            if optimal or traces.reached(trace) or dl.expired(deadline):
+                break
+            cycles += 1
+    finally:
+        results.close()
+        if shared is not None:
+            parallel.stopPool(*shared[:2])
 
-        updateEliteSet(path_sol, es_size, elite_set)
-        pairs = list(combinations(elite_set, 2))  # refresca pares con el elite nuevo
+    if optimal:
+        pr_reason = "optimal"
+    elif traces.reached(trace):
+        pr_reason = "target"
+    else:
+        pr_reason = dl.expiredReason(deadline) or "no_pairs"
+    overshoot = dl.overshoot(deadline)
+    counted = evaluations.since(counts)
 
-        if best is None or path_sol['of'] > best['of']:
-            best = copy.deepcopy(path_sol)
+    print(f"PR Phase stopped ({pr_reason}) after {p} pairs, {cycles} returns to GRASP "
+          f"({elite.pendingPairs(pool)} pending). LS stops: {ls_reasons}. "
+          f"Overshoot: {round(overshoot, 4)}s. Evaluations: {counted}. Gap to UB {round(upper_bound, 4)}: "
+          f"{round(bounds.gap(best['of'], upper_bound), 6) if best else None}")
+    if stats is not None:
+        stats['grasp_stop_reason'] = split_reason
+        stats['cycles'] = cycles
+        stats['elapsed_s'] = dl.elapsed(deadline)
+        stats['pr_stop_reason'] = pr_reason
+        stats['ls_stop_reasons'] = ls_reasons
+        stats['overshoot_s'] = overshoot
+        stats['evaluation_overshoot'] = dl.evaluationOvershoot(deadline)
+        stats.update(counted)
+        stats['upper_bound'] = upper_bound
+        stats['gap_to_ub'] = bounds.gap(best['of'], upper_bound) if best else None
+        stats['proven_optimal'] = optimal
 
-    return best, iterations
\ No newline at end of file
+    return best, iterations
@@ -0,0 +1,260 @@
+from constructives import cgrasp
+from localsearch import lsfirstimp
+from structure import deadline as dl
+from structure import evaluations
+from structure import solution
+from structure import spatial
+from structure import stopping
+from structure import trace as traces
+import collections
+import heapq
+import math
+import random
+import time
+
+COARSE_PER_SQRT = 20
+
+
+def defaultCoarseSize(n, p):
+    # O(sqrt(n)) representatives, but at least 2p so the coarse problem still
+    # has a choice. The coarse instance has no matrix (its distances are
+    # computed on demand with the k-d tree), so a large p costs no m^2 memory.
+    return min(n, max(COARSE_PER_SQRT * math.isqrt(n), 2 * p))
+
+
+def coarsen(inst, m):
+    """Clusters the points of inst around m random representatives (each point
+    goes to its nearest representative, k-d tree query).
+    Returns (coarse instance, reps, members, second): coarse point i is
+    reps[i], members[i] are the points of its cluster and second[u] is the
+    second nearest representative of point u (a neighbouring cluster).
+    The coarse instance is matrixless (d None)."""
+    n, coords = inst['n'], inst['coords']
+    reps = sorted(random.sample(range(n), m))
+    coarse_coords = [coords[r] for r in reps]
+    coarse = {'n': m, 'p': inst['p'], 'coords': coarse_coords, 'd': None}
+
+    # k-d tree over the m representatives only (all of them selected)
+    index = spatial.createIndex(coarse, range(m))
+    members = [[] for _ in range(m)]
+    second = [None] * n
+    for u in range(n):
+        _, c, _, c2 = spatial.nearestTwoTo(index, coords[u])
+        members[c].append(u)
+        second[u] = c2
+    return coarse, reps, members, second
+
+
+def greedyPick(coarse, deadline=None):
+    """Cheap coarse solution when no GRASP construction finished in time:
+    farthest-point greedy (cgrasp with alpha = 0) with lazy distances. The
+    distance of a candidate to the selection only goes down, so the heap
+    keeps upper bounds and only the candidate on top is re-queried (k-d
+    tree); it is taken if it is still the farthest. Once the deadline
+    expires the rest are taken from the heap without re-querying
+    (O(log m) each)."""
+    m = coarse['n']
+    sol = solution.createEmptySolution(coarse)
+    first = random.randrange(m)
+    solution.addToSolution(sol, first)
+    heap = [(-solution.distance(coarse, first, u), u) for u in range(m) if u != first]
+    heapq.heapify(heap)
+    while not solution.isFeasible(sol):
+        _, u = heapq.heappop(heap)
+        if dl.expired(deadline):
+            solution.addToSolution(sol, u)
+            continue
+        du = solution.distanceToSol(sol, u)
+        if not heap or du >= -heap[0][0]:
+            solution.addToSolution(sol, u)
+        else:
+            heapq.heappush(heap, (-du, u))
+    return sol
+
+
+def _no_room(deadline, needed, queries, start, start_evals):
+    # is what is left of the deadline (time and budget) only enough for
+    # `needed` more queries at the cost per query measured so far?
+    if dl.remaining(deadline) < needed * (time.monotonic() - start) / queries:
+        return True
+    spent = evaluations.COUNTS['distances'] - start_evals
+    return 'evals_end' in deadline and \
+        deadline['evals_end'] - evaluations.COUNTS['distances'] < needed * spent / queries
+
+
+def _partDeadline(deadline, fraction):
+    """Deadline that expires once `fraction` of deadline (its time and its
+    evaluation budget) has been used."""
+    seconds = evals = None
+    if deadline['limit'] is not None:
+        seconds = max(0.0, fraction * deadline['limit'] - dl.elapsed(deadline))
+    if 'evals_end' in deadline:
+        used = evaluations.COUNTS['distances'] - deadline['evals_start']
+        evals = max(0, int(fraction * deadline['evals_limit']) - used)
+    return dl.createDeadline(seconds, evals)
+
+
+def uncoarsen(inst, coarse_sol, reps, members, deadline=None):
+    """Fine solution of the chosen clusters. The representatives are points of
+    inst, so they keep the coarse OF; then each chosen cluster moves to its
+    best member (the one farthest from the rest of the selection), a best
+    response that never lowers the OF. The moves are made on a k-d tree
+    index of the selection (one nearest query per member, O(n log n)) and the
+    solution is built once at the end, which costs about one query per
+    selected point: the moves stop when the time or evaluations left (at the
+    measured cost per query) are just enough for that, and the remaining
+    clusters keep their representative."""
+    chosen = sorted((reps[c], c) for c in coarse_sol['sol'])
+    index = spatial.createIndex(inst, [x for x, _ in chosen])
+    selection = []
+    start, start_evals, queries = time.monotonic(), evaluations.COUNTS['distances'], 0
+    for x, c in chosen:
+        if deadline is not None and queries and _no_room(deadline, len(chosen), queries, start, start_evals):
+            selection.append(x)
+            continue
+        best_u, best_d = x, spatial.nearest(index, x, (x,))[0]
+        for u in members[c]:
+            if u != x:
+                du = spatial.nearest(index, u, (x,))[0]
+                if du > best_d:
+                    best_u, best_d = u, du
+        queries += len(members[c])
+        if best_u != x:
+            spatial.remove(index, x)
+            spatial.insert(index, best_u)
+        selection.append(best_u)
+
+    sol = solution.createEmptySolution(inst)
+    for u in selection:
+        solution.addToSolution(sol, u)
+    return sol
+
+
+def neighbourhoods(coarse, members, second, k):
+    """Candidate points for each cluster: its members and those of the k
+    clusters it borders the most (the second nearest representative of
+    most of its members). O(n), no distances."""
+    cluster_of = {}
+    for c, pts in enumerate(members):
+        for u in pts:
+            cluster_of[u] = c
+    near = []
+    for c in range(coarse['n']):
+        borders = collections.Counter(second[u] for u in members[c] if second[u] is not None)
+        closest = [c] + [o for o, _ in borders.most_common(k)]
+        near.append([u for o in closest for u in members[o]])
+    return cluster_of, near
+
+
+def refine(sol, cluster_of, near, stop, deadline=None, trace=None):
+    """First improvement restricted to the neighbourhood of the selection:
+    the selected element closest to the rest can only be swapped with a point
+    of its own or a nearby cluster. Returns the stop reason.
+    trace: optional structure/trace (phase "refine")."""
+    state = stopping.start(stop, sol['of'], deadline)
+    reason = stopping.check(state)
+    while reason is None:
+        # selected element closest to the rest (a k-d tree query each without a matrix)
+        ds, s = float('inf'), None
+        for v in sol['sol']:
+            if dl.expired(deadline):
+                return stopping.DEADLINE
+            dv = solution.distanceToSol(sol, v, without=v)
+            if s is None or (dv, v) < (ds, s):
+                ds, s = dv, v
+        moved = False
+        for u in near[cluster_of[s]]:
+            if solution.contains(sol, u):
+                continue
+            stopping.charge(state)
+            if solution.distanceToSol(sol, u, without=s) > ds:
+                solution.removeFromSolution(sol, s)
+                solution.addToSolution(sol, u)
+                traces.record(trace, sol['of'], "refine")
+                moved = True
+                break
+        if not moved:
+            return stopping.exhausted(state) or stopping.LOCAL_OPTIMUM
+        reason = stopping.step(state, sol['of'])
+    return reason
+
+
+def execute(inst, alpha=0.1, time_limit=30, coarse_size=None, coarse_time=0.5,
+            neighbours=5, ls_stop=None, refine_stop=None, stats=None, max_evaluations=None, trace=None):
+    """
+    Multilevel coarsen-solve-refine for large coordinate-backed (Geo)
+    instances, also without a distance matrix (readInstance(matrix=False)).
+
+    1. coarsen: cluster the n points around coarse_size representatives.
+    2. solve: GRASP (cgrasp + lsfirstimp) on the coarse instance for
+       coarse_time * time_limit seconds (and coarse_time of the evaluation
+       budget). If not even one construction finishes in that time,
+       greedyPick (with half of what is left) gives the coarse solution.
+    3. uncoarsen: map each chosen cluster to its best member (never below
+       the coarse OF, see uncoarsen).
+    4. refine: local search on the full instance restricted to the members
+       of the chosen clusters and of their `neighbours` nearest clusters,
+       with the remaining time.
+    coarse_size: default defaultCoarseSize (O(sqrt(n)), at least 2p). The
+    coarse instance computes its distances on demand, so apart from the
+    coarse GRASP (bounded by its time share) everything is O(n log n) and
+    every phase sees the deadline.
+    max_evaluations: evaluation budget (distance lookups) instead of, or on
+                     top of, time_limit (None: no time limit), shared by
+                     the phases as the time is.
+    stats: optional dict (coarse size, coarse OF, OF before/after refine,
+           stop reasons, distance lookups / move evaluations of the run).
+    trace: optional structure/trace (phases "coarse", "uncoarsen", "refine";
+           the coarse OF is the OF of the representatives in inst).
+    Returns (best, iterations of the coarse GRASP).
+    """
+    n, p = inst['n'], inst['p']
+    counts = evaluations.snapshot()
+    deadline = dl.createDeadline(time_limit, max_evaluations)
+    m = coarse_size if coarse_size is not None else defaultCoarseSize(n, p)
+    if m < p:
+        raise ValueError(f"coarse_size={m} < p={p}")
+
+    coarse, reps, members, second = coarsen(inst, m)
+    if ls_stop is None:
+        ls_stop = stopping.defaultLocalSearch(coarse)
+
+    # --- solve the coarse instance (its share of the time, what is left of it) ---
+    coarse_deadline = _partDeadline(deadline, coarse_time)
+    coarse_best = None
+    iterations = 0
+    while not dl.expired(coarse_deadline):
+        sol = cgrasp.construct(coarse, alpha, coarse_deadline)
+        if sol is None:
+            break
+        lsfirstimp.improve(sol, stop=ls_stop, deadline=coarse_deadline)
+        iterations += 1
+        if coarse_best is None or sol['of'] > coarse_best['of']:
+            coarse_best = sol
+            traces.record(trace, sol['of'], "coarse")
+    fallback = coarse_best is None
+    if fallback:
+        # half of the time left for the pick, the rest for uncoarsen + refine
+        coarse_best = greedyPick(coarse, _partDeadline(deadline, (1 + dl.progress(deadline)) / 2))
+        traces.record(trace, coarse_best['of'], "coarse")
+    # --- uncoarsen + refine ---
+    best = uncoarsen(inst, coarse_best, reps, members, deadline)
+    of_uncoarsened = best['of']
+    traces.record(trace, of_uncoarsened, "uncoarsen")
+    cluster_of, near = neighbourhoods(coarse, members, second, neighbours)
+    reason = refine(best, cluster_of, near, refine_stop or stopping.maxIterations(10 * p), deadline, trace)
+
+    print(f"Multilevel: n={n} -> {m} clusters, coarse OF {round(coarse_best['of'], 4)} "
+          f"({iterations} iterations{', greedy pick' if fallback else ''}), uncoarsened {round(of_uncoarsened, 4)}, "
+          f"refined {round(best['of'], 4)} ({reason})")
+    if stats is not None:
+        stats['coarse_size'] = m
+        stats['coarse_of'] = coarse_best['of']
+        stats['coarse_iterations'] = iterations
+        stats['coarse_fallback'] = fallback
+        stats['uncoarsened_of'] = of_uncoarsened
+        stats['refine_stop_reason'] = reason
+        stats['overshoot_s'] = dl.overshoot(deadline)
+        stats['evaluation_overshoot'] = dl.evaluationOvershoot(deadline)
+        stats.update(evaluations.since(counts))
+    return best, iterations
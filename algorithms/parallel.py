@@ -0,0 +1,234 @@
+import array
+import collections
+import multiprocessing
+import random
+from multiprocessing import shared_memory
+
+from algorithms import prgreedy_good
+from constructives import cgrasp
+from localsearch import lsfirstimp
+from structure import deadline as dl
+from structure import evaluations
+from structure import sparse
+from structure import stopping
+
+# ---------------------------------------------------------------------------
+# Distance matrix in shared memory
+# ---------------------------------------------------------------------------
+# The coordinator copies d once into a block of n*n doubles (n*n int16 /
+# int32 for the compact integer rows of structure/instance); workers attach
+# to it by name and see every row as a memoryview, so d[u][v] keeps working
+# and nothing n x n is pickled per task.
+# Only dense matrices can be shared: a matrixless instance (d None, distances
+# from the coordinates) or a sparse one (structure/sparse) raises ValueError.
+
+def shareInstance(inst):
+    """Returns (shm, meta). meta is what the workers need to attach."""
+    if sparse.isSparse(inst):
+        raise ValueError("Cannot share a sparse instance (structure/sparse): use workers=1")
+    if inst['d'] is None:
+        raise ValueError("Cannot share a matrixless instance (d is None): use workers=1")
+    n = inst['n']
+    code = inst['d'][0].typecode if inst.get('integer') else 'd'
+    itemsize = array.array(code).itemsize
+    shm = shared_memory.SharedMemory(create=True, size=max(1, n * n * itemsize))
+    flat = shm.buf.cast(code)
+    for i, row in enumerate(inst['d']):
+        flat[i * n:(i + 1) * n] = row if code != 'd' else array.array('d', row)
+    flat.release()
+
+    meta = {k: v for k, v in inst.items() if k != 'd'}
+    meta['shm_name'] = shm.name
+    meta['shm_code'] = code
+    return shm, meta
+
+
+def attachInstance(meta):
+    """Returns (inst, shm) with inst['d'] backed by the shared block."""
+    shm = shared_memory.SharedMemory(name=meta['shm_name'])
+    n = meta['n']
+    flat = shm.buf.cast(meta['shm_code'])
+    inst = {k: v for k, v in meta.items() if k not in ('shm_name', 'shm_code')}
+    inst['d'] = [flat[i * n:(i + 1) * n] for i in range(n)]
+    return inst, shm
+
+
+def releaseShared(shm):
+    shm.close()
+    shm.unlink()
+
+
+# ---------------------------------------------------------------------------
+# Worker side
+# ---------------------------------------------------------------------------
+_worker = {}
+
+
+def _init_worker(meta):
+    inst, shm = attachInstance(meta)
+    _worker['inst'] = inst
+    _worker['shm'] = shm   # keep the mapping alive while the worker lives
+
+
+# Every task starts from the coordinator's evaluation counts at dispatch and
+# returns what it counted, which the coordinator adds to its own. With an
+# evaluation budget each task only gets its share of what is left: the
+# coordinator splits the budget not yet counted nor claimed by the tasks in
+# flight among the free slots, so all the tasks together stay within it up
+# to how often each one checks its deadline (instead of each one checking
+# the whole remaining budget). The claims are
+# kept per pool, so a stream that shares the pool with another one that is
+# suspended with tasks in flight (GRASP and PR in grasp_pr_time) does not
+# hand out budget they already hold.
+
+def _grasp_task(alpha, ls_stop, seed, deadline, counts):
+    """construct + local search. Returns (selection, of, ls stop reason, counted);
+    selection is None if the deadline expired while constructing."""
+    random.seed(seed)
+    evaluations.restore(counts)
+    sol = cgrasp.construct(_worker['inst'], alpha, deadline)
+    if sol is None:
+        return None, None, stopping.DEADLINE, evaluations.since(counts)
+    reason = lsfirstimp.improve(sol, stop=ls_stop, deadline=deadline)
+    return sorted(sol['sol']), sol['of'], reason, evaluations.since(counts)
+
+
+def _relink_task(sel1, of1, sel2, of2, pr_options, ls_stop, seed, deadline, counts):
+    """relink of one elite pair + local search. Returns (selection, of, ls stop reason, counted)."""
+    random.seed(seed)
+    evaluations.restore(counts)
+    inst = _worker['inst']
+    path_sol = prgreedy_good.relink(rebuild(inst, sel1, of1), rebuild(inst, sel2, of2), **pr_options,
+                                    deadline=deadline)
+    reason = lsfirstimp.improve(path_sol, stop=ls_stop, deadline=deadline)
+    return sorted(path_sol['sol']), path_sol['of'], reason, evaluations.since(counts)
+
+
+# ---------------------------------------------------------------------------
+# Coordinator side
+# ---------------------------------------------------------------------------
+def startPool(inst, workers):
+    """Returns (pool, shm, claims). Call stopPool(pool, shm) when done.
+    claims: evaluations claimed by the tasks in flight in the pool."""
+    shm, meta = shareInstance(inst)
+    try:
+        pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(meta,))
+    except Exception:
+        releaseShared(shm)
+        raise
+    return pool, shm, {'evaluations': 0}
+
+
+def stopPool(pool, shm):
+    pool.terminate()
+    pool.join()
+    releaseShared(shm)
+
+
+def _share(deadline, pending, workers, claims):
+    """Distance evaluations for the next task: the budget not yet counted nor
+    claimed by the tasks in flight in the pool, split among the free slots of
+    `pending` (None without budget)."""
+    if deadline is None or 'evals_end' not in deadline:
+        return None
+    left = max(0, deadline['evals_end'] - evaluations.COUNTS['distances'] - claims['evaluations'])
+    return left // (workers - len(pending))
+
+
+def _dispatch(pending, claims, task, share):
+    pending.append((task, share))
+    claims['evaluations'] += share or 0
+
+
+def _collect(pending, claims):
+    task, share = pending.popleft()
+    claims['evaluations'] -= share or 0
+    return task.get()
+
+
+def _abandon(pending, claims):
+    # tasks in flight when a stream is closed: nobody counts them any more
+    claims['evaluations'] -= sum(share or 0 for _, share in pending)
+    pending.clear()
+
+
+def _task_deadline(deadline, share):
+    if share is None:
+        return deadline
+    return dict(deadline, evals_end=evaluations.COUNTS['distances'] + share)
+
+
+def rebuild(inst, selection, of):
+    """Solution dict in the coordinator from a worker result (None if none)."""
+    if selection is None:
+        return None
+    return {'instance': inst, 'sol': set(selection), 'of': of}
+
+
+def graspResults(inst, alpha, ls_stop, workers, deadline=None, shared=None):
+    """Endless stream of (sol, ls stop reason) computed by `workers` processes.
+    sol is None for a construction cancelled by the deadline.
+
+    Keeps `workers` tasks in flight and hands results back in submission
+    order, so with a fixed seed and worker count the stream is reproducible.
+    Closing the generator stops the workers (tasks in flight are abandoned).
+    shared: (pool, shm, claims) from startPool to run the tasks in instead of
+            a pool of its own; it is left running when the stream is closed.
+    """
+    pool, shm, claims = shared if shared is not None else startPool(inst, workers)
+    pending = collections.deque()  # (task, evaluations claimed)
+    try:
+        while True:
+            while len(pending) < workers:
+                seed = random.getrandbits(32)
+                share = _share(deadline, pending, workers, claims)
+                _dispatch(pending, claims, pool.apply_async(
+                    _grasp_task, (alpha, ls_stop, seed, _task_deadline(deadline, share),
+                                  evaluations.snapshot())), share)
+            selection, of, reason, counted = _collect(pending, claims)
+            evaluations.add(counted)
+            yield rebuild(inst, selection, of), reason
+    finally:
+        _abandon(pending, claims)
+        if shared is None:
+            stopPool(pool, shm)
+
+
+def relinkResults(inst, next_pair, pr_options, ls_stop, workers, deadline=None, shared=None):
+    """Stream of (path_sol, ls stop reason) for the elite pairs given by
+    next_pair(), relinked by `workers` processes.
+
+    Results come back in dispatch order and a new pair is only requested
+    after the previous result has been consumed, so merging each result into
+    the elite set before resuming the generator makes the run reproducible
+    for a fixed seed and worker count. Ends when next_pair() has no more pairs
+    and nothing is in flight, or when the deadline expires (workers then
+    return the best state they reached, which is still merged).
+    shared: as in graspResults.
+    """
+    pool, shm, claims = shared if shared is not None else startPool(inst, workers)
+    pending = collections.deque()  # (task, evaluations claimed)
+    try:
+        while True:
+            while len(pending) < workers:
+                if dl.expired(deadline):
+                    break
+                pair = next_pair()
+                if pair is None:
+                    break
+                s1, s2 = pair
+                seed = random.getrandbits(32)
+                share = _share(deadline, pending, workers, claims)
+                _dispatch(pending, claims, pool.apply_async(
+                    _relink_task,
+                    (sorted(s1['sol']), s1['of'], sorted(s2['sol']), s2['of'], pr_options, ls_stop, seed,
+                     _task_deadline(deadline, share), evaluations.snapshot())), share)
+            if not pending:
+                return
+            selection, of, reason, counted = _collect(pending, claims)
+            evaluations.add(counted)
+            yield rebuild(inst, selection, of), reason
+    finally:
+        _abandon(pending, claims)
+        if shared is None:
+            stopPool(pool, shm)
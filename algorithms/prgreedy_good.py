@@ -1,40 +1,67 @@
-from structure import solution
+import math
+
+from structure import deadline as dl
+from structure import evaluations
+from structure import profile
+from structure import spatial
+from structure import sparse
+
+INF = float('inf')
+
+
+def _kd(inst):
+    # sense matriu i amb coordenades (Geo): consultes al k-d tree
+    return inst['d'] is None and 'coords' in inst
+
+
+def _row(inst, u):
+    # fila u: de la matriu o, en una instància dispersa Ran, del fitxer de files
+    d = inst['d']
+    return d[u] if d is not None else sparse.distanceRow(inst, u)
+
+
+def _two_smallest(row):
+    """(b1, pos1, b2) d'una llista de distàncies amb min()/index() (bucles en C).
+    pos1 és la primera posició amb el mínim, com feien els bucles originals.
+    ATENCIÓ: modifica row.
+    """
+    if not row:
+        return INF, None, INF
+    b1 = min(row)
+    k = row.index(b1)
+    row[k] = INF
+    b2 = min(row) if len(row) > 1 else INF
+    return b1, k, b2
 
 
 def _nn_in_solution(sol):
     """Calcula, per a cada element s en S, les 2 distàncies més menudes a altres
     elements de S (nn1, nn2) i quin era el veí més pròxim (arg1).
 
-    Cost: O(p^2)
+    Cost: O(p^2), però per files: cada fila és una llista i el mínim es fa amb min().
     """
     S = list(sol['sol'])
-    d = sol['instance']['d']
-
-    nn1 = {s: float('inf') for s in S}
-    nn2 = {s: float('inf') for s in S}
-    arg1 = {s: None for s in S}
-
-    for a_i in range(len(S)):
-        a = S[a_i]
-        for b_i in range(a_i + 1, len(S)):
-            b = S[b_i]
-            dist = d[a][b]
-
-            # update a
-            if dist < nn1[a]:
-                nn2[a] = nn1[a]
-                nn1[a] = dist
-                arg1[a] = b
-            elif dist < nn2[a]:
-                nn2[a] = dist
-
-            # update b
-            if dist < nn1[b]:
-                nn2[b] = nn1[b]
-                nn1[b] = dist
-                arg1[b] = a
-            elif dist < nn2[b]:
-                nn2[b] = dist
+    inst = sol['instance']
+
+    nn1 = {}
+    nn2 = {}
+    arg1 = {}
+
+    if _kd(inst):  # instància Geo sense matriu: consultes al k-d tree
+        index = spatial.createIndex(inst, S)
+        for a in S:
+            nn1[a], arg1[a], nn2[a], _ = spatial.nearestTwo(index, a, (a,))
+        return nn1, nn2, arg1
+
+    evaluations.COUNTS['distances'] += len(S) * len(S)
+    for a_i, a in enumerate(S):
+        row = _row(inst, a)
+        dists = [row[b] for b in S]
+        dists[a_i] = INF          # a no és veí d'ell mateix
+        b1, k, b2 = _two_smallest(dists)
+        nn1[a] = b1
+        nn2[a] = b2
+        arg1[a] = S[k] if b1 < INF else None
 
     return nn1, nn2, arg1
 
@@ -43,30 +70,28 @@ def _best_two_to_S(sol, candidates):
     """Per a cada candidat j, calcula les 2 distàncies més menudes a la solució
     actual S (best1, best2) i l'element de S que dona best1 (arg1).
 
-    Cost: O(|candidates| * p)
+    Cost: O(|candidates| * p), amb min() sobre la fila de cada candidat.
     """
-    S = sol['sol']
-    d = sol['instance']['d']
+    S = list(sol['sol'])
+    inst = sol['instance']
 
     best1 = {}
     best2 = {}
     arg1 = {}
 
+    if _kd(inst):  # instància Geo sense matriu: consultes al k-d tree
+        index = spatial.createIndex(inst, S)
+        for j in candidates:
+            best1[j], arg1[j], best2[j], _ = spatial.nearestTwo(index, j)
+        return best1, best2, arg1
+
+    evaluations.COUNTS['distances'] += len(candidates) * len(S)
     for j in candidates:
-        b1 = float('inf')
-        b2 = float('inf')
-        a1 = None
-        for s in S:
-            dist = d[j][s]
-            if dist < b1:
-                b2 = b1
-                b1 = dist
-                a1 = s
-            elif dist < b2:
-                b2 = dist
+        row = _row(inst, j)
+        b1, k, b2 = _two_smallest([row[s] for s in S])
         best1[j] = b1
         best2[j] = b2
-        arg1[j] = a1
+        arg1[j] = S[k] if k is not None else None
 
     return best1, best2, arg1
 
@@ -75,25 +100,34 @@ def _compute_of_without(current, A, nn1, nn2, argS):
     """Per a cada i en A (elements a traure), calcula OF(S \ {i})
     sense recomputar evaluate() per cada i.
 
-    Cost: O(|A| * p)
+    OF(S \ {i}) = min( nn2[s] per als s amb argS[s] == i,
+                       nn1[s] per a la resta de s != i )
+    S'ordena S per nn1 una sola vegada; per a cada i el segon terme és el primer
+    element de l'ordre que no és i ni depén de i.
+
+    Cost: O(p log p + |A| + p)
     """
-    of_without = {}
-    size_after = len(current['sol']) - 1
+    # coherent amb solution.evaluate(): si |S|<2 -> 0.0
+    if len(current['sol']) - 1 < 2:
+        return {i: 0.0 for i in A}
 
-    for i in A:
-        # coherent amb solution.evaluate(): si |S|<2 -> 0.0
-        if size_after < 2:
-            of_without[i] = 0.0
-            continue
+    order = sorted(nn1, key=nn1.__getitem__)
+
+    # elements que tenen i com a veí més pròxim
+    dependents = {}
+    for s, a in argS.items():
+        dependents.setdefault(a, []).append(s)
 
-        best = float('inf')
-        for s in current['sol']:
-            if s == i:
+    of_without = {}
+    for i in A:
+        deps = dependents.get(i)
+        best = min([nn2[s] for s in deps]) if deps else INF
+        for s in order:
+            if s == i or argS[s] == i:
                 continue
-            # si el veí més pròxim de s era i, cal usar el 2n més pròxim
-            val = nn1[s] if argS[s] != i else nn2[s]
-            if val < best:
-                best = val
+            if nn1[s] < best:
+                best = nn1[s]
+            break
         of_without[i] = best
 
     return of_without
@@ -123,28 +157,213 @@ def findBestSwap(current_sol, sel_initiating_dif, sel_guiding_dif):
     b1, b2, argJ = _best_two_to_S(current_sol, sel_guiding_dif)
 
     # 4) avaluació O(1) per parella (i,j)
-    best_of = -float('inf')
-    best_swap = None
+    return _best_pair(sel_initiating_dif, sel_guiding_dif, of_without, b1, b2, argJ)
+
+
+def _best_pair(A, B, of_without, b1, b2, argJ):
+    """Retorna la millor parella (i,j) de A x B sense recórrer la matriu sencera.
+
+    cand_of(i,j) = min(of_without[i], c_i[j]) amb c_i[j] = b2[j] si argJ[j] == i
+    i b1[j] si no. Per a cada i, el màxim de la fila és min(of_without[i], M_i),
+    on M_i és el màxim de b1 fora de les excepcions E_i = {j : argJ[j] == i}
+    (primer valor d'un ordre descendent de b1 que no està en E_i) o de b2 dins E_i.
+
+    Desempat idèntic al doble bucle original: primera i en ordre d'iteració de A
+    que arriba al màxim i, dins d'ella, primera j de B amb c_i[j] >= màxim.
+
+    Cost: O(|B| log |B| + |A| + |B|) en lloc de O(|A| * |B|)
+    """
+    if not A or not B:
+        return None, -INF
+    # tot el veïnat A x B queda avaluat (encara que no es recórrega parella a parella)
+    evaluations.COUNTS['moves'] += len(A) * len(B)
+
+    B_list = list(B)
+    B1 = [b1[j] for j in B_list]
+    top = sorted(range(len(B_list)), key=B1.__getitem__, reverse=True)
+
+    exceptions = {}
+    for pos, j in enumerate(B_list):
+        exceptions.setdefault(argJ[j], []).append(pos)
+
+    best_of = -INF
+    best_i = None
+    for i in A:
+        E = exceptions.get(i)
+        if E:
+            M = max([b2[B_list[pos]] for pos in E])
+            E = set(E)
+            for pos in top:
+                if pos not in E:
+                    if B1[pos] > M:
+                        M = B1[pos]
+                    break
+        else:
+            M = B1[top[0]]
+        v = min(of_without[i], M)
+        if v > best_of:
+            best_of = v
+            best_i = i
+
+    # primera j que dona best_of per a best_i
+    for j in B_list:
+        c = b2[j] if argJ[j] == best_i else b1[j]
+        if c >= best_of:
+            return (best_i, j), best_of
+
+    return None, -INF
+
+
+# ---------------------------------------------------------------------------
+# Motor incremental de Path Relinking
+# ---------------------------------------------------------------------------
+# En lloc de recalcular _nn_in_solution (O(p^2)) i evaluate() a cada pas, es
+# mantenen per a cada s en S els dos veïns més pròxims dins S (nn1/arg1,
+# nn2/arg2) i per a cada candidat j de B les dues distàncies més menudes a S
+# (b1/argJ, b2/argJ2). Després d'un swap (i -> j) només cal re-escanejar els
+# elements que tenien i com a 1r o 2n veí.
+
+def _two_nearest(inst, u, S, skip=None, index=None):
+    """(nn1, arg1, nn2, arg2) de u respecte a S, ignorant u i skip. Cost: O(p)
+    Sense matriu (Geo) es consulta index, el k-d tree dels elements de S."""
+    if index is not None:
+        return spatial.nearestTwo(index, u, (u, skip))
+    b1 = b2 = INF
+    a1 = a2 = None
+    row = _row(inst, u)
+    evaluations.COUNTS['distances'] += len(S)
+    for s in S:
+        if s == u or s == skip:
+            continue
+        dist = row[s]
+        if dist < b1:
+            b2, a2 = b1, a1
+            b1, a1 = dist, s
+        elif dist < b2:
+            b2, a2 = dist, s
+    return b1, a1, b2, a2
+
+
+def _push(near, u, dist, v):
+    """Actualitza near[u] = [nn1, arg1, nn2, arg2] amb un nou veí v."""
+    e = near[u]
+    if dist < e[0]:
+        e[2], e[3] = e[0], e[1]
+        e[0], e[1] = dist, v
+    elif dist < e[2]:
+        e[2], e[3] = dist, v
+
+
+def createPathState(sol, candidates):
+    """Estat del motor incremental per a la solució actual del camí.
+
+    Cost: O(p^2 + |candidates| * p), només una vegada per camí.
+    """
+    S = set(sol['sol'])
+    inst = sol['instance']
+    index = spatial.createIndex(inst, S) if _kd(inst) else None
+
+    near = {s: list(_two_nearest(inst, s, S, index=index)) for s in S}
+    cand = {j: list(_two_nearest(inst, j, S, index=index)) for j in candidates}
+
+    return {'inst': inst, 'S': S, 'near': near, 'cand': cand, 'of': sol['of'],
+            'index': index, 'coords': inst.get('coords')}
+
+
+def _state_of_without(state, A):
+    """OF(S \ {i}) per a cada i en A a partir de near. Cost: O(p log p + |A| + p)"""
+    near = state['near']
+    nn1 = {s: e[0] for s, e in near.items()}
+    nn2 = {s: e[2] for s, e in near.items()}
+    argS = {s: e[1] for s, e in near.items()}
+    return _compute_of_without({'sol': state['S']}, A, nn1, nn2, argS)
 
-    for i in sel_initiating_dif:
-        base = of_without[i]
-        for j in sel_guiding_dif:
-            dist_to_S_wo_i = b1[j] if argJ[j] != i else b2[j]
-            cand_of = min(base, dist_to_S_wo_i)
 
-            if cand_of > best_of:
-                best_of = cand_of
-                best_swap = (i, j)
+def findBestSwapIncremental(state, sel_initiating_dif, sel_guiding_dif):
+    """Com findBestSwap però usant l'estat incremental (sense O(p^2))."""
+    if not sel_initiating_dif or not sel_guiding_dif:
+        return None, None
+
+    of_without = _state_of_without(state, sel_initiating_dif)
 
-    return best_swap, best_of
+    cand = state['cand']
+    b1 = {j: cand[j][0] for j in sel_guiding_dif}
+    argJ = {j: cand[j][1] for j in sel_guiding_dif}
+    b2 = {j: cand[j][2] for j in sel_guiding_dif}
 
+    return _best_pair(sel_initiating_dif, sel_guiding_dif, of_without, b1, b2, argJ)
 
-def greedyPathRelinking(initiating_sol, guiding_sol):
+
+def applySwap(state, i, j, new_of):
+    """Aplica el swap (i ix, j entra) i actualitza near/cand incrementalment.
+
+    Cost: O(p + |B| + k * p), on k és el nombre d'elements que tenien i (o j,
+    per a near) com a 1r o 2n veí.
+    """
+    inst = state['inst']
+    S = state['S']
+    near = state['near']
+    cand = state['cand']
+    index = state['index']
+
+    # 1) i ix de S
+    S.discard(i)
+    if index is not None:
+        spatial.remove(index, i)
+    del near[i]
+    for s, e in near.items():
+        if e[1] == i or e[3] == i:
+            near[s] = list(_two_nearest(inst, s, S, index=index))
+    for c, e in cand.items():
+        if c != j and (e[1] == i or e[3] == i):
+            cand[c] = list(_two_nearest(inst, c, S, index=index))
+
+    # 2) j entra a S
+    del cand[j]
+    if index is not None:
+        spatial.insert(index, j)
+        row = spatial.distanceRow(state['coords'], j)
+    else:
+        row = _row(inst, j)
+        evaluations.COUNTS['distances'] += len(S) + len(cand)
+    near_j = [INF, None, INF, None]
+    for s in S:
+        dist = row[s]
+        _push(near, s, dist, j)
+        if dist < near_j[0]:
+            near_j[2], near_j[3] = near_j[0], near_j[1]
+            near_j[0], near_j[1] = dist, s
+        elif dist < near_j[2]:
+            near_j[2], near_j[3] = dist, s
+    S.add(j)
+    near[j] = near_j
+    for c in cand:
+        _push(cand, c, row[c], j)
+
+    state['of'] = new_of
+
+
+def _max_steps(r, max_fraction):
+    """Nombre de passos d'un camí de longitud r truncat a max_fraction."""
+    if max_fraction >= 1.0:
+        return r
+    return max(1, int(math.ceil(max_fraction * r)))
+
+
+def greedyPathRelinking(initiating_sol, guiding_sol, max_fraction=1.0, max_no_improve=None,
+                        deadline=None):
+    """Path Relinking greedy de initiating_sol cap a guiding_sol.
+
+    - max_fraction: recorre només aquesta fracció del camí (1.0 = camí sencer)
+    - max_no_improve: para després de k passos seguits sense millorar el millor
+      del camí (None = no para)
+    - deadline: si expira, retorna el millor punt trobat fins ara
+    """
 
     sel_initiating_dif = set(initiating_sol['sol']) - set(guiding_sol['sol'])
     sel_guiding_dif = set(guiding_sol['sol']) - set(initiating_sol['sol'])
 
-    r = len(sel_initiating_dif)
+    r = _max_steps(len(sel_initiating_dif), max_fraction)
 
     # còpia "lleugera"
     current_sol = {
@@ -159,19 +378,24 @@ def greedyPathRelinking(initiating_sol, guiding_sol):
         'of': current_sol['of']
     }
 
+    state = createPathState(current_sol, sel_guiding_dif)
+    current_sol['sol'] = state['S']
+    no_improve = 0
+    steps = 0
+
     for _ in range(r):
-        swap, best_of = findBestSwap(current_sol, sel_initiating_dif, sel_guiding_dif)
+        if dl.expired(deadline):
+            break
+        swap, best_of = findBestSwapIncremental(state, sel_initiating_dif, sel_guiding_dif)
         if swap is None:
             break
 
         i, j = swap
 
-        # aplica swap (una sola volta per iteració)
-        solution.removeFromSolution(current_sol, i)
-        solution.addToSolution(current_sol, j)
-
-
+        # aplica swap (incremental, sense evaluate())
+        applySwap(state, i, j, best_of)
         current_sol['of'] = best_of
+        steps += 1
 
         sel_initiating_dif.remove(i)
         sel_guiding_dif.remove(j)
@@ -179,5 +403,87 @@ def greedyPathRelinking(initiating_sol, guiding_sol):
         if current_sol['of'] > best_sol_in_path['of']:
             best_sol_in_path['sol'] = set(current_sol['sol'])
             best_sol_in_path['of'] = current_sol['of']
+            no_improve = 0
+        else:
+            no_improve += 1
+            if max_no_improve is not None and no_improve >= max_no_improve:
+                break
+
+    profile.path(steps)
+    return best_sol_in_path
+
 
+def bidirectionalPathRelinking(sol_a, sol_b, max_fraction=1.0, max_no_improve=None,
+                               deadline=None):
+    """Path Relinking bidireccional: alterna un pas des de sol_a cap a la
+    solució actual de l'altre extrem i un pas des de sol_b, fins que es troben.
+
+    Cada pas elimina un element de cada diferència, així que el camí sencer
+    són r swaps (no 2r com fent greedyPathRelinking en els dos sentits).
+    Retorna el millor punt del camí (o el millor extrem si cap el millora).
+    """
+    only_a = set(sol_a['sol']) - set(sol_b['sol'])
+    only_b = set(sol_b['sol']) - set(sol_a['sol'])
+
+    r = _max_steps(len(only_a), max_fraction)
+
+    state_a = createPathState(sol_a, only_b)
+    state_b = createPathState(sol_b, only_a)
+
+    start = sol_a if sol_a['of'] >= sol_b['of'] else sol_b
+    best_sol_in_path = {
+        'instance': sol_a['instance'],
+        'sol': set(start['sol']),
+        'of': start['of']
+    }
+
+    sides = [(state_a, only_a, only_b, state_b), (state_b, only_b, only_a, state_a)]
+    no_improve = 0
+    steps = 0
+
+    for step in range(r):
+        if dl.expired(deadline):
+            break
+        state, remove_from, add_from, other = sides[step % 2]
+
+        swap, best_of = findBestSwapIncremental(state, remove_from, add_from)
+        if swap is None:
+            break
+
+        i, j = swap
+        applySwap(state, i, j, best_of)
+        steps += 1
+
+        remove_from.remove(i)
+        add_from.remove(j)
+        # i ja no és a aquest extrem: l'altre ja no el pot afegir
+        other['cand'].pop(i, None)
+
+        if state['of'] > best_sol_in_path['of']:
+            best_sol_in_path['sol'] = set(state['S'])
+            best_sol_in_path['of'] = state['of']
+            no_improve = 0
+        else:
+            no_improve += 1
+            if max_no_improve is not None and no_improve >= max_no_improve:
+                break
+
+    profile.path(steps)
     return best_sol_in_path
+
+
+def relink(s1, s2, mode="both", max_fraction=1.0, max_no_improve=None, deadline=None):
+    """Relinka una parella d'elit i retorna el millor punt dels camins.
+
+    - mode "both": greedy s1 -> s2 i s2 -> s1, es queda el millor
+    - mode "bidirectional": bidirectionalPathRelinking
+    """
+    if mode == "bidirectional":
+        return bidirectionalPathRelinking(s1, s2, max_fraction, max_no_improve, deadline)
+    if mode != "both":
+        raise ValueError(f"Unknown PR mode: {mode}")
+    pr_1 = greedyPathRelinking(s1, s2, max_fraction, max_no_improve, deadline)
+    if dl.expired(deadline):
+        return pr_1
+    pr_2 = greedyPathRelinking(s2, s1, max_fraction, max_no_improve, deadline)
+    return pr_1 if pr_1['of'] > pr_2['of'] else pr_2
@@ -1,13 +1,15 @@
 from structure import solution
+from structure import deadline as dl
 import random
 import math
 
 
-def construct(inst, beta):
+def construct(inst, beta, deadline=None):
     """
     GRC2 for Max-Min Diversity:
     - Build RCL2 by selecting ceil(beta * |CL|) candidates uniformly at random from CL
     - Pick the best candidate (max min-distance to current solution) within RCL2
+    If `deadline` expires before the solution is complete, returns None.
     """
     sol = solution.createEmptySolution(inst)
     n = inst['n']
@@ -24,6 +26,8 @@ def construct(inst, beta):
     beta = beta if beta > 0 else random.random()
 
     while not solution.isFeasible(sol):
+        if dl.expired(deadline):
+            return None
         if not cl:
             break  # should not happen unless p > n or something inconsistent
 
@@ -59,6 +63,6 @@ def createCandidateList(sol, first):
 
 def updateCandidateList(sol, cl, added):
     # Max-Min: score(c) = min(score(c), d(added, c))
-    dmat = sol['instance']['d']
+    row = solution.distanceRow(sol['instance'], added)
     for i in range(len(cl)):
-        cl[i][0] = min(cl[i][0], dmat[added][cl[i][1]])
+        cl[i][0] = min(cl[i][0], row[cl[i][1]])
@@ -1,8 +1,13 @@
 from structure import solution
+from structure import deadline as dl
 import random
 
 
-def construct(inst, alpha):
+def construct(inst, alpha, deadline=None, snapshots=None):
+    # deadline: if it expires before the solution is complete, returns None
+    # snapshots: optional dict {k: None}; filled with a copy of the partial
+    # solution when it reaches k nodes (the first k picks are a GRASP
+    # solution for p = k, since the RCL does not depend on p)
     sol = solution.createEmptySolution(inst)
     n = inst['n']
 
@@ -13,7 +18,8 @@ def construct(inst, alpha):
     alpha = alpha if alpha >= 0 else random.random()
 
     while not solution.isFeasible(sol):
-
+        if dl.expired(deadline):
+            return None
 
         if not cl:
             raise RuntimeError(
@@ -38,6 +44,9 @@ def construct(inst, alpha):
         cl.remove(cSel)
         updateCandidateList(sol, cl, cSel[1])
 
+        if snapshots is not None and len(sol['sol']) in snapshots:
+            snapshots[len(sol['sol'])] = {'instance': inst, 'sol': set(sol['sol']), 'of': sol['of']}
+
     return sol
 
 
@@ -62,7 +71,8 @@ def createCandidateList(sol, first):
 
 
 def updateCandidateList(sol, cl, added):
+    row = solution.distanceRow(sol['instance'], added)
     for i in range(len(cl)):
         c = cl[i]
-        c[0] = min(c[0], sol['instance']['d'][added][c[1]])
+        c[0] = min(c[0], row[c[1]])
 
@@ -0,0 +1,204 @@
+"""
+F-race (Birattari et al., 2002) for tuning configurations on a sequence of
+instances (blocks).
+
+Every surviving candidate is evaluated on each new instance; after
+min_blocks instances, a Friedman test over the blocks seen so far checks
+whether the survivors differ, and if so every candidate whose rank sum is
+significantly worse than the best one (Friedman post-hoc, t distribution)
+is dropped. Larger values are better (OF maximisation); ties get the
+average rank.
+
+The chi-square and t tails are computed with the regularized incomplete
+gamma / beta functions (no scipy).
+"""
+import math
+
+_ITMAX = 300
+_FPMIN = 1e-300
+_EPS = 3e-16
+
+
+# ---------------- distributions ----------------
+def _gamma_q(a, x):
+    """Regularized upper incomplete gamma Q(a, x)."""
+    if x <= 0:
+        return 1.0
+    gln = math.lgamma(a)
+    if x < a + 1:
+        # serie de P(a, x)
+        ap, s = a, 1.0 / a
+        term = s
+        for _ in range(_ITMAX):
+            ap += 1
+            term *= x / ap
+            s += term
+            if abs(term) < abs(s) * _EPS:
+                break
+        return 1.0 - s * math.exp(-x + a * math.log(x) - gln)
+    # fracció contínua de Q(a, x)
+    b = x + 1 - a
+    c = 1.0 / _FPMIN
+    d = 1.0 / b
+    h = d
+    for i in range(1, _ITMAX):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = _FPMIN if abs(d) < _FPMIN else d
+        c = b + an / c
+        c = _FPMIN if abs(c) < _FPMIN else c
+        d = 1.0 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < _EPS:
+            break
+    return math.exp(-x + a * math.log(x) - gln) * h
+
+
+def _beta_cf(a, b, x):
+    qab, qap, qam = a + b, a + 1, a - 1
+    c = 1.0
+    d = 1 - qab * x / qap
+    d = _FPMIN if abs(d) < _FPMIN else d
+    d = 1.0 / d
+    h = d
+    for m in range(1, _ITMAX):
+        m2 = 2 * m
+        aa = m * (b - m) * x / ((qam + m2) * (a + m2))
+        d = 1 + aa * d
+        d = _FPMIN if abs(d) < _FPMIN else d
+        c = 1 + aa / c
+        c = _FPMIN if abs(c) < _FPMIN else c
+        d = 1.0 / d
+        h *= d * c
+        aa = -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))
+        d = 1 + aa * d
+        d = _FPMIN if abs(d) < _FPMIN else d
+        c = 1 + aa / c
+        c = _FPMIN if abs(c) < _FPMIN else c
+        d = 1.0 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < _EPS:
+            break
+    return h
+
+
+def _beta_i(a, b, x):
+    """Regularized incomplete beta I_x(a, b)."""
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    bt = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b)
+                  + a * math.log(x) + b * math.log(1 - x))
+    if x < (a + 1) / (a + b + 2):
+        return bt * _beta_cf(a, b, x) / a
+    return 1 - bt * _beta_cf(b, a, 1 - x) / b
+
+
+def chi2Sf(x, df):
+    """P(X > x), X ~ chi-square(df)."""
+    return _gamma_q(df / 2.0, x / 2.0)
+
+
+def tTwoSided(t, df):
+    """P(|T| > |t|), T ~ Student t(df)."""
+    return _beta_i(df / 2.0, 0.5, df / (df + t * t))
+
+
+# ---------------- Friedman ----------------
+def _ranks(values):
+    """Ranks 1..m of values (largest = 1), ties averaged."""
+    order = sorted(range(len(values)), key=lambda i: -values[i])
+    ranks = [0.0] * len(values)
+    i = 0
+    while i < len(order):
+        j = i
+        while j + 1 < len(order) and values[order[j + 1]] == values[order[i]]:
+            j += 1
+        for t in range(i, j + 1):
+            ranks[order[t]] = (i + j) / 2.0 + 1
+        i = j + 1
+    return ranks
+
+
+def friedman(blocks, cands):
+    """
+    Friedman test of the candidates cands over blocks ({cand: value}).
+    Returns (statistic, p-value, rank sums {cand: R}, ties term) or None if
+    there are fewer than 2 candidates/blocks or all blocks are ties.
+    """
+    k, m = len(blocks), len(cands)
+    if m < 2 or k < 2:
+        return None
+    sums = dict.fromkeys(cands, 0.0)
+    sq = 0.0
+    for block in blocks:
+        ranks = _ranks([block[c] for c in cands])
+        for c, r in zip(cands, ranks):
+            sums[c] += r
+            sq += r * r
+    denom = sq - k * m * (m + 1) ** 2 / 4.0
+    if denom <= 1e-12:
+        return None
+    stat = (m - 1) * sum((r - k * (m + 1) / 2.0) ** 2 for r in sums.values()) / denom
+    return stat, chi2Sf(stat, m - 1), sums, denom
+
+
+# ---------------- race ----------------
+def createRace(candidates, confidence=0.95, min_blocks=5):
+    """candidates: list of configurations (any objects); they are referred to
+    by their index."""
+    return {'candidates': candidates, 'alive': list(range(len(candidates))),
+            'blocks': [], 'confidence': confidence, 'min_blocks': min_blocks,
+            'history': []}
+
+
+def alive(race):
+    return [race['candidates'][c] for c in race['alive']]
+
+
+def addBlock(race, values, label=None):
+    """values: {cand index: value} for every alive candidate on one more
+    instance. Runs the test and drops the dominated candidates.
+    Returns the list of dropped indices."""
+    missing = [c for c in race['alive'] if c not in values]
+    if missing:
+        raise ValueError(f"missing values for candidates {missing}")
+    race['blocks'].append(dict(values))
+    k, cands = len(race['blocks']), race['alive']
+    step = {'block': k, 'label': label, 'alive_before': len(cands),
+            'statistic': None, 'p_value': None, 'dropped': []}
+    race['history'].append(step)
+    if k < race['min_blocks']:
+        return []
+    test = friedman(race['blocks'], cands)
+    if test is None:
+        return []
+    stat, p, sums, denom = test
+    step['statistic'], step['p_value'] = stat, p
+    alpha = 1 - race['confidence']
+    if p >= alpha:
+        return []
+
+    # post-hoc: cada candidat contra el de menor suma de rangs
+    m = len(cands)
+    df = (k - 1) * (m - 1)
+    scale = math.sqrt(max(0.0, 2 * k * (1 - stat / (k * (m - 1))) * denom / df))
+    best = min(cands, key=lambda c: sums[c])
+    dropped = []
+    for c in cands:
+        if c == best:
+            continue
+        diff = sums[c] - sums[best]
+        if scale <= 0:
+            significant = diff > 0
+        else:
+            significant = tTwoSided(diff / scale, df) < alpha
+        if significant:
+            dropped.append(c)
+    race['alive'] = [c for c in cands if c not in dropped]
+    step['dropped'] = dropped
+    return dropped
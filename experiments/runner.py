@@ -0,0 +1,103 @@
+"""
+Job-based experiment runner shared by the experiment scripts.
+
+A script expands its grid (dataset x n x instance x method/config x rep)
+into a list of jobs, plain dicts, each with its own seed (jobSeed), and a
+top-level function job_fn(job) -> result dict that runs one of them.
+runJobs executes the jobs in a process pool and hands the results back in
+the coordinator, grouped (e.g. per instance) so the script can build the
+same rows and CSVs as the sequential loops.
+
+Results do not depend on the number of workers: every job seeds the RNG
+from its own key. Time-limited jobs should not use more workers than
+physical cores, or the time budgets are shared.
+
+With a sink (experiments/sink), every result is appended as a row (the job's
+key fields + the result) as soon as it arrives, and jobs whose key is already
+stored are not run again: their stored row is the result (checkpoint/resume).
+"""
+import multiprocessing
+import random
+import zlib
+
+from experiments import sink as sinks
+
+
+def jobSeed(base, *key):
+    """Stable seed for a job key (the same in every process and run, unlike hash())."""
+    return (base + zlib.crc32(repr(key).encode("utf-8"))) % (2 ** 32)
+
+
+# ---------------- instance cache (one per process) ----------------
+_cache = {}
+
+
+def cachedInstance(key, loader, *args):
+    """loader(*args), reusing the last instance loaded in this process.
+    Jobs are dispatched in instance order, so consecutive jobs of a worker
+    usually share it."""
+    if _cache.get('key') != key:
+        _cache.clear()
+        _cache['key'] = key
+        _cache['inst'] = loader(*args)
+    return _cache['inst']
+
+
+def _run(job_fn, index, job):
+    random.seed(job['seed'])
+    return index, job_fn(job)
+
+
+def _star_run(args):
+    return _run(*args)
+
+
+def runJobs(jobs, job_fn, workers=1, group_key=None, on_group=None, sink=None):
+    """
+    Runs job_fn(job) for every job (random seeded with job['seed'] first).
+
+    group_key(job) -> hashable: when every job of a group has finished,
+    on_group(group, [(job, result), ...]) is called in this process (jobs in
+    their original order), e.g. to append the rows of one instance.
+    sink: optional run sink; the jobs must hold its key fields and job_fn
+    must return flat dicts (one CSV row). Stored jobs are skipped.
+    Returns [(job, result), ...] in the order of jobs.
+    """
+    results = [None] * len(jobs)
+    stored = {}
+    if sink is not None:
+        stored = {sinks.keyOf(sink, row): row for row in sink['rows']}
+    pending = {}
+    if group_key is not None:
+        for job in jobs:
+            g = group_key(job)
+            pending[g] = pending.get(g, 0) + 1
+
+    def done(index, result, new=True):
+        results[index] = result
+        if sink is not None and new:
+            job = jobs[index]
+            sinks.append(sink, [{**{f: job[f] for f in sink['key_fields']}, **result}])
+        if group_key is None:
+            return
+        g = group_key(jobs[index])
+        pending[g] -= 1
+        if pending[g] == 0 and on_group is not None:
+            on_group(g, [(job, results[i]) for i, job in enumerate(jobs) if group_key(job) == g])
+
+    tasks = []
+    for i, job in enumerate(jobs):
+        row = stored.get(sinks.keyOf(sink, job)) if sink is not None else None
+        if row is not None:
+            done(i, row, new=False)
+        else:
+            tasks.append((job_fn, i, job))
+    if workers <= 1:
+        for task in tasks:
+            done(*_run(*task))
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            for index, result in pool.imap_unordered(_star_run, tasks):
+                done(index, result)
+
+    return list(zip(jobs, results))
@@ -0,0 +1,132 @@
+"""
+Append-only CSV result sink with checkpoint/resume.
+
+A sink is a CSV file that only grows: rows are appended as jobs (or
+instances) finish, flushed at once and fsync'ed in batches (every
+fsync_every rows or fsync_interval seconds), so a crash loses at most the
+last unsynced batch and never the rows already written. Each row has a key
+(the values of key_fields, compared as strings); opening an existing file
+with resume=True loads its rows and keys, so a driver can skip the jobs it
+already has and rebuild its summaries from the stored rows. With
+resume=False the file is started from scratch (the old behaviour).
+
+Summaries are small (one row per group), so they are recomputed from
+running accumulators and replaced atomically with writeAtomic.
+
+With store=db (experiments/store) every row is also written to the table of
+the file in the result store; the CSV stays the source of truth (the table is
+cleared on a fresh run and refilled from the CSV on resume).
+"""
+import csv
+import os
+import time
+
+from experiments import store as stores
+
+
+def _key(key_fields, row):
+    return tuple(str(row[f]) for f in key_fields)
+
+
+def _drop_partial_line(path):
+    # una fila a mitges (crash durant l'escriptura) es descarta
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+def openSink(path, key_fields, resume=True, fsync_every=50, fsync_interval=5.0, store=None):
+    """Opens (or creates) the sink at path. sink['rows'] holds the rows that
+    were already stored (parsed), sink['keys'] their keys. store: optional
+    result store db mirrored by the sink."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    rows = []
+    fields = None
+    if resume and os.path.exists(path) and os.path.getsize(path) > 0:
+        _drop_partial_line(path)
+        with open(path, "r", newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            fields = reader.fieldnames
+            for raw in reader:
+                if None in raw.values() or None in raw:
+                    continue
+                rows.append({k: stores.parseValue(v) for k, v in raw.items()})
+    f = open(path, "a" if fields else "w", newline="", encoding="utf-8")
+    table = stores.tableFor(path)
+    if store is not None:
+        stores.clearTable(store, table)
+        stores.insertRows(store, table, rows, key_fields)
+    return {'path': path, 'file': f, 'fields': fields, 'writer': None,
+            'store': store, 'table': table,
+            'key_fields': tuple(key_fields), 'rows': rows,
+            'keys': {_key(key_fields, r) for r in rows},
+            'fsync_every': fsync_every, 'fsync_interval': fsync_interval,
+            'unsynced': 0, 'last_sync': time.monotonic(), 'appended': 0}
+
+
+def keyOf(sink, row):
+    return _key(sink['key_fields'], row)
+
+
+def contains(sink, key):
+    """key: tuple of the key_fields values (any type, compared as str)."""
+    return tuple(str(v) for v in key) in sink['keys']
+
+
+def newRows(sink, rows):
+    """The rows whose key is not stored yet (to append a group only once)."""
+    return [row for row in rows if keyOf(sink, row) not in sink['keys']]
+
+
+def append(sink, rows):
+    """Appends rows (dicts with the same columns) and flushes them."""
+    if not rows:
+        return
+    if sink['fields'] is None:
+        sink['fields'] = list(rows[0].keys())
+    if sink['writer'] is None:
+        sink['writer'] = csv.DictWriter(sink['file'], fieldnames=sink['fields'])
+        if sink['file'].tell() == 0:
+            sink['writer'].writeheader()
+    for row in rows:
+        if len(row) != len(sink['fields']) or any(k not in row for k in sink['fields']):
+            raise ValueError(f"{sink['path']}: row columns {list(row)} != {sink['fields']}")
+        sink['writer'].writerow(row)
+        sink['keys'].add(keyOf(sink, row))
+    sink['file'].flush()
+    if sink['store'] is not None:
+        stores.insertRows(sink['store'], sink['table'], rows, sink['key_fields'])
+    sink['unsynced'] += len(rows)
+    sink['appended'] += len(rows)
+    if (sink['unsynced'] >= sink['fsync_every']
+            or time.monotonic() - sink['last_sync'] >= sink['fsync_interval']):
+        sync(sink)
+
+
+def sync(sink):
+    if sink['unsynced']:
+        sink['file'].flush()
+        os.fsync(sink['file'].fileno())
+        sink['unsynced'] = 0
+    sink['last_sync'] = time.monotonic()
+
+
+def closeSink(sink):
+    sync(sink)
+    sink['file'].close()
+
+
+def writeAtomic(path, rows):
+    """Whole-file CSV write through a temporary file + os.replace, so a crash
+    leaves either the old or the new file (for summaries)."""
+    if not rows:
+        return
+    tmp = path + ".tmp"
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        w.writeheader()
+        w.writerows(rows)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
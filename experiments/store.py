@@ -0,0 +1,171 @@
+"""
+Local result store: one SQLite file (results/results.sqlite, stdlib sqlite3)
+with a table per result file (finalcomparison, configs_per_instance,
+per_instance, cgr_cgr2_iterlog, ..._runs, optima, ...).
+
+The drivers mirror every row they append to a sink into the store (openSink
+with store=db), so the CSVs stay as they were and the store always holds
+the same rows. Tables and columns are created from the rows themselves; a
+row is identified by its key columns (unique index, INSERT OR REPLACE), and
+'' is stored as NULL.
+
+summarize / rankPoints compute Dev_avg, #Best and rank points for any
+grouping straight from the best values, with the same definitions as the
+drivers:
+  best_global = max(value) over the configs compared on an instance
+  Dev         = (best_global - value) / best_global   (0 if best_global ~ 0)
+  #Best       = number of instances with value == best_global (1e-9)
+  points      = top, top-1, ... by rank on each instance, ties averaged
+so a summary for another grouping or subset of configs is a query
+(milliseconds) instead of a rerun.
+"""
+import csv
+import os
+import sqlite3
+
+DEFAULT_PATH = os.path.join("results", "results.sqlite")
+EPS = 1e-12
+BEST_TOL = 1e-9
+
+
+def _q(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def parseValue(value):
+    """CSV string -> int / float / str ('' stays ''). str(float) round-trips,
+    so stored floats come back bit for bit."""
+    if value is None or value == "":
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def _value(v):
+    return None if v == "" else v
+
+
+def openStore(path=DEFAULT_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    db = sqlite3.connect(path)
+    db.row_factory = sqlite3.Row
+    return db
+
+
+def closeStore(db):
+    db.commit()
+    db.close()
+
+
+def tableFor(path):
+    """Table of a result file: results/finalcomparison.csv -> finalcomparison."""
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def tables(db):
+    return [r[0] for r in db.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")]
+
+
+def columns(db, table):
+    return [r[1] for r in db.execute(f"PRAGMA table_info({_q(table)})")]
+
+
+def _ensure_table(db, table, fields, key_fields):
+    existing = columns(db, table)
+    if not existing:
+        db.execute(f"CREATE TABLE {_q(table)} ({', '.join(_q(f) for f in fields)})")
+        if key_fields:
+            db.execute(f"CREATE UNIQUE INDEX {_q(table + '_key')} ON {_q(table)} "
+                       f"({', '.join(_q(f) for f in key_fields)})")
+        return
+    for f in fields:
+        if f not in existing:
+            db.execute(f"ALTER TABLE {_q(table)} ADD COLUMN {_q(f)}")
+
+
+def insertRows(db, table, rows, key_fields=()):
+    """INSERT OR REPLACE of rows (dicts) into table, created on first use."""
+    if not rows:
+        return
+    fields = list(rows[0].keys())
+    _ensure_table(db, table, fields, key_fields)
+    sql = (f"INSERT OR REPLACE INTO {_q(table)} ({', '.join(_q(f) for f in fields)}) "
+           f"VALUES ({', '.join('?' for _ in fields)})")
+    db.executemany(sql, [[_value(row[f]) for f in fields] for row in rows])
+    db.commit()
+
+
+def clearTable(db, table):
+    if columns(db, table):
+        db.execute(f"DELETE FROM {_q(table)}")
+        db.commit()
+
+
+def ensureIndex(db, table, cols):
+    """Index on cols (e.g. the instance or grouping columns of the queries)."""
+    name = table + "_" + "_".join(cols)
+    db.execute(f"CREATE INDEX IF NOT EXISTS {_q(name)} ON {_q(table)} ({', '.join(_q(c) for c in cols)})")
+
+
+def importCsv(db, path, key_fields=(), table=None):
+    """Replaces the table of a result CSV (e.g. results written before the
+    store existed) with its rows. Returns the number of rows."""
+    table = table or tableFor(path)
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = [{k: parseValue(v) for k, v in raw.items()} for raw in csv.DictReader(f)]
+    clearTable(db, table)
+    insertRows(db, table, rows, key_fields)
+    return len(rows)
+
+
+def query(db, sql, params=()):
+    return [dict(r) for r in db.execute(sql, params)]
+
+
+def _scored(table, value, instance_cols, where):
+    inst = ", ".join(_q(c) for c in instance_cols)
+    cond = f"WHERE {where}" if where else ""
+    return (f"SELECT *, MAX({_q(value)}) OVER (PARTITION BY {inst}) AS best_global, "
+            f"RANK() OVER (PARTITION BY {inst} ORDER BY {_q(value)} DESC) AS rank_pos, "
+            f"COUNT(*) OVER (PARTITION BY {inst}, {_q(value)}) AS ties "
+            f"FROM {_q(table)} {cond}")
+
+
+def summarize(db, table, value, instance_cols, config_cols, group_cols=(), where=None, params=()):
+    """
+    Dev_avg / #Best / num_instances of each config per group.
+    value: column maximised (e.g. best_method_of); instance_cols: columns of
+    one compared instance (e.g. dataset, instance, m); config_cols: what is
+    compared (e.g. method); group_cols: summary groups (e.g. dataset, n, m).
+    where/params: optional SQL filter (e.g. a subset of configs).
+    """
+    ensureIndex(db, table, list(instance_cols))
+    out = [_q(c) for c in list(group_cols) + list(config_cols)]
+    sql = (f"WITH t AS ({_scored(table, value, instance_cols, where)}) "
+           f"SELECT {', '.join(out)}, "
+           f"AVG(CASE WHEN best_global <= {EPS} THEN 0.0 "
+           f"ELSE (best_global - {_q(value)}) * 1.0 / best_global END) AS Dev_avg, "
+           f"SUM(ABS({_q(value)} - best_global) <= {BEST_TOL}) AS \"#Best\", "
+           f"COUNT(*) AS num_instances "
+           f"FROM t GROUP BY {', '.join(out)} ORDER BY {', '.join(out)}")
+    return query(db, sql, params)
+
+
+def rankPoints(db, table, value, instance_cols, config_cols, group_cols=(), top=6, where=None, params=()):
+    """Rank points per config and group: on each instance the best config
+    gets top, the next top-1, ...; tied configs share the average of their
+    places (same as MethodComparison)."""
+    ensureIndex(db, table, list(instance_cols))
+    out = [_q(c) for c in list(group_cols) + list(config_cols)]
+    pts = f"({top} - (rank_pos - 1) - (ties - 1) / 2.0)"
+    sql = (f"WITH t AS ({_scored(table, value, instance_cols, where)}) "
+           f"SELECT {', '.join(out)}, SUM({pts}) AS points, AVG({pts}) AS avg_points, "
+           f"COUNT(*) AS num_instances "
+           f"FROM t GROUP BY {', '.join(out)} ORDER BY {', '.join(out)}")
+    return query(db, sql, params)
@@ -1,20 +1,23 @@
 import random
 from structure import solution
+from structure import deadline as dl
+from structure import evaluations
 
 EPS = 1e-9
 
-def improve_imls(sol, k=3, shuffle=False):
+def improve_imls(sol, k=3, shuffle=False, deadline=None):
     """
     IMLS (Improved Local Search) per al Max-Min Diversity.
     - k: nombre de distàncies més baixes a considerar en e(i)
     - shuffle: si True, desempata aleatòriament (opcional)
+    - deadline: si expira, para i deixa la solució actual (sempre vàlida)
     """
     improved = True
-    while improved:
-        improved = tryImprove_imls(sol, k=k, shuffle=shuffle)
+    while improved and not dl.expired(deadline):
+        improved = tryImprove_imls(sol, k=k, shuffle=shuffle, deadline=deadline)
 
 
-def tryImprove_imls(sol, k=3, shuffle=False):
+def tryImprove_imls(sol, k=3, shuffle=False, deadline=None):
     """
     Una iteració d'IMLS.
     1) Troba els elements crítics i (d_i == d*)
@@ -52,7 +55,9 @@ def tryImprove_imls(sol, k=3, shuffle=False):
                 continue
             if s == x:
                 continue
-            dists.append(dmat[x][s])
+            dists.append(dmat[x][s] if dmat is not None else solution.distance(sol["instance"], x, s))
+        if dmat is not None:
+            evaluations.COUNTS['distances'] += len(dists)
         if not dists:
             return float("inf")
         dists.sort()
@@ -105,6 +110,9 @@ def tryImprove_imls(sol, k=3, shuffle=False):
 
         # Prova cada candidat i aplica el primer moviment millorant
         for j in cand_order:
+            if dl.expired(deadline):
+                return False
+            evaluations.COUNTS['moves'] += 1
             # --- aplica swap temporal ---
             _remove_from_solution(sol, i_star)
             _add_to_solution(sol, j)
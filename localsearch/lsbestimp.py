@@ -1,16 +1,25 @@
+from structure import profile
 from structure import solution
+from structure import stopping
 
-def improve(sol, max_iter=50):
-    improve = True
-    it = 0
-    while improve and it < max_iter:
-        improve = tryImprove(sol)
-        it += 1
+def improve(sol, max_iter=50, stop=None, deadline=None):
+    """Returns the reason why the search stopped (see structure/stopping).
+    If `deadline` expires, returns with the current (valid) solution."""
+    state = stopping.start(stop if stop is not None else stopping.maxIterations(max_iter), sol['of'], deadline)
+    reason = stopping.check(state)
+    while reason is None:
+        if not tryImprove(sol, state):
+            reason = stopping.LOCAL_OPTIMUM
+            break
+        reason = stopping.step(state, sol['of'])
+    profile.localSearch(state['it'])
+    return reason
 
 
 
-def tryImprove(sol):
+def tryImprove(sol, state=None):
     sel, ofVarSel, unsel, ofVarUnsel = selectInterchange(sol)
+    stopping.charge(state, sol['instance']['n'])
     if ofVarSel < ofVarUnsel:
         solution.removeFromSolution(sol, sel)
         solution.addToSolution(sol, unsel)
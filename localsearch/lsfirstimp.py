@@ -1,26 +1,38 @@
 import random
 
+from structure import profile
 from structure import solution
+from structure import stopping
 
-def improve(sol, max_iter=200):
-    improve_flag = True
-    it = 0
-    while improve_flag and it < max_iter:
-        improve_flag = tryImprove(sol)
-        it += 1
+def improve(sol, max_iter=200, stop=None, deadline=None):
+    """Returns the reason why the search stopped (see structure/stopping).
+    If `deadline` expires, returns with the current (valid) solution."""
+    state = stopping.start(stop if stop is not None else stopping.maxIterations(max_iter), sol['of'], deadline)
+    reason = stopping.check(state)
+    while reason is None:
+        if not tryImprove(sol, state):
+            reason = stopping.exhausted(state) or stopping.LOCAL_OPTIMUM
+            break
+        reason = stopping.step(state, sol['of'])
+    profile.localSearch(state['it'])
+    return reason
 
-def tryImprove(sol):
+def tryImprove(sol, state=None):
     selected, unselected = createSelectedAndUnselected(sol)
     random.shuffle(selected)
     random.shuffle(unselected)
     for s in selected:
+        if stopping.exhausted(state):
+            return False
         ds = solution.distanceToSol(sol, s, without=s)
-        for u in unselected:
+        for k, u in enumerate(unselected):
             du = solution.distanceToSol(sol, u, without=s)
             if du > ds:
+                stopping.charge(state, k + 1)
                 solution.removeFromSolution(sol, s)
                 solution.addToSolution(sol, u)
                 return True
+        stopping.charge(state, len(unselected))
     return False
 
 
@@ -33,4 +45,4 @@ def createSelectedAndUnselected(sol):
             selected.append(v)
         else:
             unselected.append(v)
-    return selected, unselected
\ No newline at end of file
+    return selected, unselected
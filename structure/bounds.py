@@ -0,0 +1,153 @@
+"""
+Cheap upper bounds for Max-Min Diversity (max over |S| = p of min d(u,v), u,v in S).
+
+- Row bound: if u is selected, its nearest selected neighbour is at most the
+  (p-1)-th largest value of row u (r_u). Hence OF <= p-th largest r_u.
+- Threshold graph: OF >= t iff G_t (edges with d >= t) has a p-clique. A
+  clique lives in the (p-1)-core of G_t and needs p colours, so if the core
+  has < p nodes or a greedy colouring of it uses < p colours, OF < t.
+  A binary search over the distinct distances <= row bound gives the
+  largest value that cannot be discarded this way.
+"""
+import bisect
+import math
+
+from structure import sparse
+
+EPS = 1e-9
+
+
+def _row(inst, u):
+    # fila u: de la matriu o, en una instància dispersa, del fitxer de files
+    d = inst['d']
+    return d[u] if d is not None else sparse.distanceRow(inst, u)
+
+
+def _row_values(inst):
+    """r_u = (p-1)-th largest distance from u to the other nodes."""
+    n, p = inst['n'], inst['p']
+    r = []
+    for u in range(n):
+        du = _row(inst, u)
+        row = sorted((du[v] for v in range(n) if v != u), reverse=True)
+        r.append(row[p - 2] if p >= 2 else float('inf'))
+    return r
+
+
+def rowBound(inst, r=None):
+    if r is None:
+        r = _row_values(inst)
+    return sorted(r, reverse=True)[inst['p'] - 1]
+
+
+def _adjacency(inst, t, nodes):
+    """Bitmasks of G_t restricted to `nodes`."""
+    adj = {}
+    for u in nodes:
+        row = _row(inst, u)
+        mask = 0
+        for v in nodes:
+            if v != u and row[v] >= t:
+                mask |= 1 << v
+        adj[u] = mask
+    return adj
+
+
+def _greedy_colours(adj, alive, limit):
+    """Number of colour classes of a greedy colouring (stops at `limit`)."""
+    colours = 0
+    uncoloured = alive
+    while uncoloured and colours < limit:
+        colours += 1
+        avail = uncoloured
+        while avail:
+            low = avail & -avail
+            v = low.bit_length() - 1
+            uncoloured &= ~low
+            avail &= ~(adj[v] | low)
+    return colours
+
+
+def thresholdCore(inst, t, r=None):
+    """(adj, alive) of the (p-1)-core of G_t: adj[u] bitmask of the neighbours
+    of u, alive bitmask of the nodes of the core. Any p-set with all its
+    distances >= t is inside the core."""
+    p = inst['p']
+    if r is None:
+        r = _row_values(inst)
+    # only nodes with at least p-1 neighbours in G_t can be in the clique
+    nodes = [u for u in range(inst['n']) if r[u] >= t]
+    adj = _adjacency(inst, t, nodes)
+
+    alive = 0
+    for u in nodes:
+        alive |= 1 << u
+    changed = True
+    while changed:
+        changed = False
+        for u in nodes:
+            bit = 1 << u
+            if alive & bit and (adj[u] & alive).bit_count() < p - 1:
+                alive &= ~bit
+                changed = True
+    return adj, alive
+
+
+def noCliqueAt(inst, t, r=None):
+    """True if it is proven that no p-set has all its distances >= t (OF < t)."""
+    p = inst['p']
+    adj, alive = thresholdCore(inst, t, r)
+    if alive.bit_count() < p:
+        return True
+    return _greedy_colours(adj, alive, p) < p
+
+
+def upperBound(inst):
+    """Upper bound on the optimal OF of inst (cached in inst['upper_bound'])."""
+    if 'upper_bound' in inst:
+        return inst['upper_bound']
+    if inst['d'] is None and 'coords' in inst:
+        # sin matriz (Geo por coordenadas): la diagonal de la caja envolvente
+        coords = inst['coords']
+        ub = math.sqrt(sum((max(c[t] for c in coords) - min(c[t] for c in coords)) ** 2
+                           for t in range(len(coords[0]))))
+        inst['upper_bound'] = ub
+        return ub
+
+    n = inst['n']
+    r = _row_values(inst)
+    ub = rowBound(inst, r)
+
+    values = set()
+    for u in range(n):
+        row = _row(inst, u)
+        values.update(row[v] for v in range(u + 1, n))
+    values = sorted(values)
+    values = values[:bisect.bisect_right(values, ub)]
+
+    if values and noCliqueAt(inst, values[-1], r):
+        # invariant: values[lo] not discarded, values[hi] discarded
+        lo, hi = 0, len(values) - 1
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if noCliqueAt(inst, values[mid], r):
+                hi = mid
+            else:
+                lo = mid
+        ub = values[lo]
+
+    inst['upper_bound'] = ub
+    return ub
+
+
+def gap(of, ub):
+    """Relative gap to the upper bound (0.0 = proven optimal)."""
+    if ub <= EPS:
+        return 0.0
+    if math.isinf(ub):
+        return 1.0
+    return max(0.0, (ub - of) / ub)
+
+
+def isOptimal(of, ub):
+    return of >= ub - EPS
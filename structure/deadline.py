@@ -0,0 +1,80 @@
+import time
+
+from structure import evaluations
+
+# A deadline is a plain dict on the monotonic clock. It is passed down to the
+# constructives, local searches and path relinking, which check it in their
+# inner loops and return their best state so far once it has expired.
+# CLOCK_MONOTONIC is system-wide, so a deadline can be sent to worker
+# processes on the same machine.
+# With an evaluation budget the deadline also expires after that many
+# distance lookups (structure/evaluations) counted from its creation, and
+# seconds may be None (budget only).
+
+
+def createDeadline(seconds, max_evaluations=None):
+    now = time.monotonic()
+    end = now + seconds if seconds is not None else float('inf')
+    deadline = {'start': now, 'end': end, 'limit': seconds}
+    if max_evaluations is not None:
+        deadline['evals_start'] = evaluations.COUNTS['distances']
+        deadline['evals_end'] = deadline['evals_start'] + max_evaluations
+        deadline['evals_limit'] = max_evaluations
+    return deadline
+
+
+def expired(deadline):
+    if deadline is None:
+        return False
+    if time.monotonic() >= deadline['end']:
+        return True
+    return 'evals_end' in deadline and evaluations.COUNTS['distances'] >= deadline['evals_end']
+
+
+def expiredReason(deadline):
+    """"time_limit" / "evaluations" once expired, else None."""
+    if deadline is None:
+        return None
+    if time.monotonic() >= deadline['end']:
+        return "time_limit"
+    if 'evals_end' in deadline and evaluations.COUNTS['distances'] >= deadline['evals_end']:
+        return "evaluations"
+    return None
+
+
+def elapsed(deadline):
+    return time.monotonic() - deadline['start']
+
+
+def remaining(deadline):
+    return deadline['end'] - time.monotonic()
+
+
+def progress(deadline):
+    """Fraction of the deadline used (time or evaluations, whichever is
+    further along)."""
+    used = 0.0
+    if deadline['limit'] is not None:
+        used = elapsed(deadline) / deadline['limit'] if deadline['limit'] > 0 else 1.0
+    if 'evals_end' in deadline:
+        spent = evaluations.COUNTS['distances'] - deadline['evals_start']
+        used = max(used, spent / deadline['evals_limit'] if deadline['evals_limit'] > 0 else 1.0)
+    return used
+
+
+def overshoot(deadline):
+    """Seconds past the deadline (0.0 if still within it)."""
+    return max(0.0, time.monotonic() - deadline['end'])
+
+
+def evaluationOvershoot(deadline):
+    """Distance lookups past the evaluation budget (0 without budget)."""
+    if 'evals_end' not in deadline:
+        return 0
+    return max(0, evaluations.COUNTS['distances'] - deadline['evals_end'])
+
+
+def summarizeOvershoots(values):
+    if not values:
+        return {'avg_overshoot_s': 0.0, 'max_overshoot_s': 0.0}
+    return {'avg_overshoot_s': sum(values) / len(values), 'max_overshoot_s': max(values)}
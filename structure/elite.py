@@ -0,0 +1,132 @@
+import bisect
+import heapq
+
+
+def toMask(selected):
+    """Selection as an integer bitmask (bit v set <=> v selected)."""
+    mask = 0
+    for v in selected:
+        mask |= 1 << v
+    return mask
+
+
+def fingerprint(sol):
+    return sol['mask'] if 'mask' in sol else toMask(sol['sol'])
+
+
+def similarity(mask_a, mask_b):
+    return (mask_a & mask_b).bit_count()
+
+
+def createElitePool(es_size, order="diversity"):
+    """
+    Elite Set + scheduler of the pairs still to relink.
+    Members are kept sorted by objective (worst first) and carry the bitmask
+    of their selection, so similarities are popcounts.
+    order: "diversity" (most different pairs first) or "quality" (best pairs first)
+    """
+    if order not in ("diversity", "quality"):
+        raise ValueError(f"Unknown pair order: {order}")
+    return {
+        'size': es_size,
+        'order': order,
+        'members': [],       # sorted by 'of', ascending
+        'ofs': [],           # parallel list of objectives (for bisect)
+        'by_fp': {},         # fingerprint (mask) -> member
+        'queue': [],         # heap of (priority, seq, fp1, fp2)
+        'queued': set(),     # pairs (fp_min, fp_max) in the queue
+        'done': set(),       # pairs already relinked
+        'seq': 0,
+    }
+
+
+def worst(pool):
+    return pool['members'][0] if pool['members'] else None
+
+
+def best(pool):
+    return pool['members'][-1] if pool['members'] else None
+
+
+def mostSimilarWorse(pool, of, mask):
+    """Index in pool['members'] of the most similar member among the ones with
+    objective < of (None if none). Ties: the worst one."""
+    k = bisect.bisect_left(pool['ofs'], of)
+    members = pool['members']
+    most_similar = None
+    max_similarity = -1
+    for idx in range(k):
+        sim = similarity(members[idx]['mask'], mask)
+        if sim > max_similarity:
+            max_similarity = sim
+            most_similar = idx
+    return most_similar
+
+
+def update(pool, sol):
+    """Same policy as the old updateEliteSet: fill the set, then replace the
+    most similar among the worse members. Duplicates are rejected.
+    Queues the pairs of the new member with the rest."""
+    fp = toMask(sol['sol'])
+
+    if fp in pool['by_fp']:
+        return False
+
+    if len(pool['members']) >= pool['size']:
+        # Check if better than the worst in the set
+        if pool['ofs'][0] >= sol['of']:
+            return False
+
+        # Find the most similar among the worse ones (Diversity preservation)
+        idx = mostSimilarWorse(pool, sol['of'], fp)
+        removed = pool['members'].pop(idx)
+        del pool['ofs'][idx]
+        del pool['by_fp'][removed['mask']]
+
+    _insert(pool, sol, fp)
+    return True
+
+
+def _insert(pool, sol, fp):
+    # the instance is shared, only the selection is copied
+    new = {'instance': sol['instance'], 'sol': set(sol['sol']), 'of': sol['of'], 'mask': fp}
+    k = bisect.bisect_right(pool['ofs'], new['of'])
+    pool['members'].insert(k, new)
+    pool['ofs'].insert(k, new['of'])
+    pool['by_fp'][fp] = new
+
+    for fp_other, s in pool['by_fp'].items():
+        if s is new:
+            continue
+        key = (fp, fp_other) if fp < fp_other else (fp_other, fp)
+        if key in pool['done'] or key in pool['queued']:
+            continue
+        if pool['order'] == "diversity":
+            priority = -(fp ^ fp_other).bit_count()
+        else:
+            priority = -(new['of'] + s['of'])
+        pool['seq'] += 1
+        heapq.heappush(pool['queue'], (priority, pool['seq'], fp, fp_other))
+        pool['queued'].add(key)
+
+
+def nextPair(pool):
+    """Pops the next unexplored pair whose members are still in the pool
+    (and marks it as relinked). Returns None when no pairs remain."""
+    queue = pool['queue']
+    by_fp = pool['by_fp']
+    while queue:
+        _, _, fp1, fp2 = heapq.heappop(queue)
+        key = (fp1, fp2) if fp1 < fp2 else (fp2, fp1)
+        pool['queued'].discard(key)
+        if fp1 not in by_fp or fp2 not in by_fp:
+            continue
+        pool['done'].add(key)
+        return by_fp[fp1], by_fp[fp2]
+    return None
+
+
+def pendingPairs(pool):
+    """Queued pairs whose two members are still in the pool."""
+    by_fp = pool['by_fp']
+    return sum(1 for _, _, fp1, fp2 in pool['queue'] if fp1 in by_fp and fp2 in by_fp)
@@ -0,0 +1,43 @@
+# Machine-independent effort counters (one set per process):
+#   'distances': distance lookups (d[u][v], or a distance computed from the
+#                coordinates of a matrixless instance)
+#   'moves':     candidate moves evaluated by the local searches and by path
+#                relinking (swap pairs of the neighbourhood)
+# structure/solution, the constructives (through solution), the local
+# searches (through stopping.charge) and algorithms/prgreedy_good add to
+# them. A deadline created with an evaluation budget expires once that many
+# distance lookups have been counted (see structure/deadline), so results
+# with a budget do not depend on the machine or its load.
+# Worker processes count on their own; algorithms/parallel starts each task
+# from the coordinator's count and adds back what the task counted.
+
+COUNTS = {'distances': 0, 'moves': 0}
+
+
+def distances(k=1):
+    COUNTS['distances'] += k
+
+
+def moves(k=1):
+    COUNTS['moves'] += k
+
+
+def snapshot():
+    return dict(COUNTS)
+
+
+def since(snap):
+    """Counts since snapshot() as {'distance_evals', 'move_evals'} (the
+    column names of the result rows)."""
+    return {'distance_evals': COUNTS['distances'] - snap['distances'],
+            'move_evals': COUNTS['moves'] - snap['moves']}
+
+
+def restore(snap):
+    COUNTS.update(snap)
+
+
+def add(delta):
+    """Adds the counts of another process (a since() dict)."""
+    COUNTS['distances'] += delta['distance_evals']
+    COUNTS['moves'] += delta['move_evals']
@@ -1,7 +1,10 @@
+import array
 import os
 import re
 import math
 
+from structure import sparse
+
 
 def _last_number_in_filename(path: str) -> int:
     nums = re.findall(r"\d+", os.path.basename(path))
@@ -27,11 +30,36 @@ def infer_p_for_glover(path: str, n: int) -> int:
     return max(2, min(p, n))
 
 
-def readInstance(path: str):
+def compactIntegerDistances(inst):
+    # distancias enteras (RAN): filas como array.array de int16 (int32 si no
+    # caben), 2-4 bytes por par en vez de un float de Python. inst["dmax"]
+    # permite a structure/solution usar cubetas indexadas por la distancia.
+    # No hace nada si alguna distancia no es entera o es negativa (la usan
+    # también los cargadores RAN de los scripts de experimentos).
+    values = [v for row in inst["d"] for v in row]
+    lo, hi = min(values), max(values)
+    if lo < 0 or not all(float(v).is_integer() for v in values):
+        return
+    code = "h" if hi < 2 ** 15 else "i"
+    if code == "i" and hi >= 2 ** 31:
+        return
+    inst["d"] = [array.array(code, map(int, row)) for row in inst["d"]]
+    inst["integer"] = True
+    inst["dmax"] = int(hi)
+
+
+def readInstance(path: str, matrix: bool = True, threshold: float = None):
+    # matrix=False (solo GEO/GLOVER): no se construye la matriz n x n; la
+    # instancia guarda las coordenadas y d=None, y las distancias se calculan
+    # con structure/spatial (k-d tree) desde structure/solution.
+    # threshold: instancia dispersa (structure/sparse), listas de vecinos con
+    # d < threshold y d=None; las demás distancias salen de las coordenadas
+    # (GEO/GLOVER) o de las filas compactas de RAN, que pasan a un fichero
+    # temporal y se leen por filas cuando hacen falta.
+    lower = path.lower()
     with open(path, "r") as f:
         lines = [line.strip() for line in f if line.strip()]
 
-    lower = path.lower()
     inst = {}
 
     # ---------------- RAN (n + triples u v dist) ----------------
@@ -49,6 +77,9 @@ def readInstance(path: str):
         inst["n"] = n
         inst["p"] = p
         inst["d"] = d
+        compactIntegerDistances(inst)
+        if threshold is not None:
+            return sparse.sparsify(inst, threshold)
         return inst
 
     # ---------------- GEO / GLOVER (n + k + coords) ----------------
@@ -80,6 +111,19 @@ def readInstance(path: str):
     if any(c is None for c in coords):
         raise ValueError(f"Faltan coordenadas o índices mal formateados en {path}")
 
+    if p < 2 or p > n:
+        raise ValueError(f"Instancia inválida {path}: p={p}, n={n}")
+
+    inst["n"] = n
+    inst["p"] = p
+    inst["coords"] = coords
+    if threshold is not None:
+        inst["d"] = None
+        return sparse.sparsify(inst, threshold)
+    if not matrix:
+        inst["d"] = None
+        return inst
+
     # construir matriz euclídea
     d = [[0.0] * n for _ in range(n)]
     for i in range(n):
@@ -92,10 +136,5 @@ def readInstance(path: str):
             d[i][j] = dist
             d[j][i] = dist
 
-    if p < 2 or p > n:
-        raise ValueError(f"Instancia inválida {path}: p={p}, n={n}")
-
-    inst["n"] = n
-    inst["p"] = p
     inst["d"] = d
     return inst
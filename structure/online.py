@@ -0,0 +1,187 @@
+"""
+Online Max-Min Diversity: keeps a diverse subset of size p of a stream of
+points that are inserted and deleted over time, without re-solving.
+
+A stream is a plain dict with the same 'sol' / 'of' keys as a solution of
+structure/solution (so printSolution works on it), plus:
+  points: {id: point}
+  dS:     dS[x][s] = d(x, s) for every point x and every selected s != x
+          (the only distances kept: O(N p) memory, no N x N matrix)
+  nn:     nn[x] = [d1, s1, d2, s2], the two nearest selected points of x
+After every event the subset is completed up to p (greedy) and repaired with
+at most max_repairs swaps of lsbestimp: drop the selected point closest to
+the rest, add the unselected point farthest from the others, while that
+improves. Each swap costs O(N) distance computations, so the work per event
+is bounded by O(N * max_repairs).
+"""
+import math
+import time
+
+from structure import deadline as dl
+
+INF = float('inf')
+
+
+def euclidean(a, b):
+    return math.dist(a, b)
+
+
+def createStream(p, distance=euclidean, max_repairs=5):
+    """distance(a, b): distance between two points (default: Euclidean on
+    coordinate tuples)."""
+    if p < 2:
+        raise ValueError(f"Invalid p={p}")
+    return {
+        'p': p,
+        'distance': distance,
+        'max_repairs': max_repairs,
+        'points': {},
+        'sol': set(),
+        'of': 0.0,
+        'dS': {},
+        'nn': {},
+        'swaps': 0,
+        'evals': 0,
+        'last_update_s': 0.0,
+    }
+
+
+# ---------------- caches ----------------
+def _two_nearest(row):
+    d1 = d2 = INF
+    s1 = s2 = -1
+    for s, d in row.items():
+        if d < d1:
+            d2, s2 = d1, s1
+            d1, s1 = d, s
+        elif d < d2:
+            d2, s2 = d, s
+    return [d1, s1, d2, s2]
+
+
+def _push(nn, s, d):
+    if d < nn[0]:
+        nn[2], nn[3] = nn[0], nn[1]
+        nn[0], nn[1] = d, s
+    elif d < nn[2]:
+        nn[2], nn[3] = d, s
+
+
+def _refresh_of(stream):
+    sol, nn = stream['sol'], stream['nn']
+    stream['of'] = min(nn[s][0] for s in sol) if len(sol) >= 2 else 0.0
+
+
+def _select(stream, u):
+    points, dS, nn = stream['points'], stream['dS'], stream['nn']
+    pu = points[u]
+    dist = stream['distance']
+    for x in points:
+        if x != u:
+            d = dist(points[x], pu)
+            dS[x][u] = d
+            _push(nn[x], u, d)
+    stream['evals'] += len(points) - 1
+    stream['sol'].add(u)
+
+
+def _unselect(stream, s):
+    dS, nn = stream['dS'], stream['nn']
+    stream['sol'].remove(s)
+    for x in stream['points']:
+        if x != s:
+            del dS[x][s]
+            if nn[x][1] == s or nn[x][3] == s:
+                nn[x] = _two_nearest(dS[x])
+
+
+def _without(nn, s):
+    """Distance to the nearest selected point other than s."""
+    return nn[2] if nn[1] == s else nn[0]
+
+
+def _fill(stream):
+    """Greedy completion up to p: the unselected point farthest from the subset."""
+    sol, nn = stream['sol'], stream['nn']
+    while len(sol) < stream['p']:
+        u, best = None, -1.0
+        for x in stream['points']:
+            if x not in sol and nn[x][0] > best:
+                u, best = x, nn[x][0]
+        if u is None:
+            return
+        _select(stream, u)
+
+
+# ---------------- API ----------------
+def repair(stream, max_swaps=None, deadline=None):
+    """Up to max_swaps improving swaps (lsbestimp.selectInterchange on the
+    caches). Returns the number of swaps done."""
+    if max_swaps is None:
+        max_swaps = stream['max_repairs']
+    sol, nn = stream['sol'], stream['nn']
+    swaps = 0
+    while swaps < max_swaps and len(sol) == stream['p'] and not dl.expired(deadline):
+        sel, bestSel = -1, INF
+        for s in sol:
+            if nn[s][0] < bestSel:
+                sel, bestSel = s, nn[s][0]
+        unsel, bestUnsel = None, 0.0
+        for x in stream['points']:
+            if x not in sol:
+                d = _without(nn[x], sel)
+                if d > bestUnsel:
+                    unsel, bestUnsel = x, d
+        if unsel is None or not bestSel < bestUnsel:
+            break
+        _unselect(stream, sel)
+        _select(stream, unsel)
+        swaps += 1
+    stream['swaps'] += swaps
+    _refresh_of(stream)
+    return swaps
+
+
+def insertPoint(stream, pid, point, deadline=None):
+    """Adds a point (pid must be new). Returns the objective after the update."""
+    t0 = time.perf_counter()
+    if pid in stream['points']:
+        raise ValueError(f"Point {pid} already in the stream")
+    dist = stream['distance']
+    points = stream['points']
+    points[pid] = point
+    row = {s: dist(point, points[s]) for s in stream['sol']}
+    stream['evals'] += len(row)
+    stream['dS'][pid] = row
+    stream['nn'][pid] = _two_nearest(row)
+
+    _fill(stream)
+    repair(stream, deadline=deadline)
+    stream['last_update_s'] = time.perf_counter() - t0
+    return stream['of']
+
+
+def deletePoint(stream, pid, deadline=None):
+    """Removes a point. Returns the objective after the update."""
+    t0 = time.perf_counter()
+    if pid in stream['sol']:
+        _unselect(stream, pid)
+    del stream['points'][pid]
+    del stream['dS'][pid]
+    del stream['nn'][pid]
+
+    _fill(stream)
+    repair(stream, deadline=deadline)
+    stream['last_update_s'] = time.perf_counter() - t0
+    return stream['of']
+
+
+def evaluate(stream):
+    """Objective recomputed from scratch (for checks)."""
+    items = list(stream['sol'])
+    if len(items) < 2:
+        return 0.0
+    dist = stream['distance']
+    points = stream['points']
+    return min(dist(points[items[i]], points[items[j]])
+               for i in range(len(items)) for j in range(i + 1, len(items)))
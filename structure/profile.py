@@ -0,0 +1,120 @@
+"""
+Opt-in profiling of a run: wall time per phase, call counts of the hot
+solution functions, local-search iterations and path-relinking path lengths.
+
+Disabled (the default) it costs one flag test per phase / local search /
+path, and nothing in the hot functions: enable() swaps distanceToSol,
+evaluate, addToSolution and removeFromSolution of structure/solution for
+counting wrappers (every caller goes through the module, so they all see
+them) and disable() puts the originals back.
+
+    profile.enable()
+    profile.reset()          # at the start of each run
+    ... run ...
+    row = profile.row()      # flat dict, e.g. for a run row of a sink
+
+The data is per process: with workers > 1 the construction, local search
+and relinking happen in the workers, so the coordinator only sees the time
+it waits for them (phase "workers").
+"""
+import functools
+import time
+
+from structure import solution
+
+PHASES = ("construction", "local_search", "elite_update", "relinking", "deepcopy",
+          "check_solution", "workers")
+CALLS = ("distanceToSol", "evaluate", "addToSolution", "removeFromSolution")
+
+ENABLED = False
+_originals = {}
+_data = {}
+
+
+def _counted(name, fn):
+    calls = _data['calls']
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        calls[name] += 1
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+def reset():
+    _data['phases'] = {p: [0.0, 0] for p in PHASES}
+    if 'calls' in _data:
+        for name in CALLS:     # the wrappers keep a reference to this dict
+            _data['calls'][name] = 0
+    else:
+        _data['calls'] = dict.fromkeys(CALLS, 0)
+    _data['ls_calls'] = 0
+    _data['ls_iterations'] = 0
+    _data['pr_paths'] = 0
+    _data['pr_steps'] = 0
+    _data['pr_max_steps'] = 0
+
+
+def enable():
+    global ENABLED
+    if ENABLED:
+        return
+    reset()
+    for name in CALLS:
+        _originals[name] = getattr(solution, name)
+        setattr(solution, name, _counted(name, _originals[name]))
+    ENABLED = True
+
+
+def disable():
+    global ENABLED
+    if not ENABLED:
+        return
+    for name, fn in _originals.items():
+        setattr(solution, name, fn)
+    _originals.clear()
+    ENABLED = False
+
+
+# ---------------- hooks ----------------
+def start():
+    """Start of a phase: pass the value to stop() (None when disabled)."""
+    return time.perf_counter() if ENABLED else None
+
+
+def stop(phase, t0):
+    if t0 is not None:
+        acc = _data['phases'][phase]
+        acc[0] += time.perf_counter() - t0
+        acc[1] += 1
+
+
+def localSearch(iterations):
+    """One local search call that made `iterations` iterations."""
+    if ENABLED:
+        _data['ls_calls'] += 1
+        _data['ls_iterations'] += iterations
+
+
+def path(steps):
+    """One relinking path of `steps` swaps."""
+    if ENABLED:
+        _data['pr_paths'] += 1
+        _data['pr_steps'] += steps
+        _data['pr_max_steps'] = max(_data['pr_max_steps'], steps)
+
+
+# ---------------- export ----------------
+def row():
+    """Flat dict with everything recorded since reset() (fixed columns)."""
+    out = {}
+    for p in PHASES:
+        out[f"{p}_s"], out[f"{p}_n"] = _data['phases'][p]
+    for name in CALLS:
+        out[f"calls_{name}"] = _data['calls'][name]
+    for k in ("ls_calls", "ls_iterations", "pr_paths", "pr_steps", "pr_max_steps"):
+        out[k] = _data[k]
+    return out
+
+
+reset()
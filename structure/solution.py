@@ -1,3 +1,104 @@
+from structure import evaluations
+from structure import sparse
+from structure import spatial
+
+
+# Instàncies Geo sense matriu (inst['d'] None, inst['coords']): les distàncies
+# a la solució es consulten a un k-d tree (structure/spatial) amb els
+# seleccionats, que es crea la primera vegada que cal i es manté a
+# addToSolution / removeFromSolution.
+def _index(sol):
+    if 'index' not in sol:
+        sol['index'] = spatial.createIndex(sol['instance'], sol['sol'])
+    return sol['index']
+
+
+def _matrixless(sol):
+    # sense matriu ni llistes de veïns (structure/sparse): k-d tree
+    inst = sol['instance']
+    return inst['d'] is None and not sparse.isSparse(inst)
+
+
+def distance(inst, u, v):
+    if inst['d'] is None:
+        if 'coords' in inst:
+            return spatial.distance(inst['coords'], u, v)
+        evaluations.COUNTS['distances'] += 1
+        return sparse.distance(inst, u, v)  # Ran dispersa: fitxer de files
+    evaluations.COUNTS['distances'] += 1
+    return inst['d'][u][v]
+
+
+def distanceRow(inst, u):
+    """Row u of the distance matrix (computed from the coordinates, or read
+    from the rows file of a sparse instance, if there is no matrix)."""
+    if inst['d'] is None:
+        if 'coords' in inst:
+            return spatial.distanceRow(inst['coords'], u)
+        evaluations.COUNTS['distances'] += inst['n']
+        return sparse.distanceRow(inst, u)
+    evaluations.COUNTS['distances'] += inst['n']  # el que llig qui recorre la fila
+    return inst['d'][u]
+
+
+# Instàncies disperses (structure/sparse): el veí seleccionat més pròxim es
+# busca a la llista de veïns (ordenada per distància) i només si no n'hi ha
+# cap per davall del llindar es calculen les distàncies reals a tota la
+# solució (coordenades en Geo, la fila de u llegida del fitxer en Ran). Les
+# distàncies són sempre exactes.
+def _sparse_distance_to_sol(sol, u, without=-1):
+    inst = sol['instance']
+    found = sparse.nearestSelected(inst, u, sol['sol'], without)
+    if found is not None:
+        return found
+    if 'coords' not in inst:
+        row = sparse.distanceRow(inst, u)
+        others = [s for s in sol['sol'] if s != without]
+        evaluations.COUNTS['distances'] += len(others)
+        return min((row[s] for s in others), default=float("inf"))
+    best = float("inf")
+    for s in sol['sol']:
+        if s != without:
+            best = min(best, distance(inst, s, u))
+    return best
+
+
+def _check_threshold(sol):
+    # instància dispersa: si l'OF d'una solució completa arriba al llindar, les
+    # llistes ja no tenen cap seleccionat i cada consulta acaba calculant totes
+    # les distàncies -> pugem el llindar. Les parcials del constructiu no compten.
+    inst = sol['instance']
+    if not sparse.isSparse(inst):
+        return
+    while isFeasible(sol) and sol['of'] >= sparse.threshold(inst):
+        sparse.raiseThreshold(inst)
+
+
+# Instàncies amb distàncies enteres (inst['integer'], RAN): cubetes
+# pairs[v] = nombre de parells de S a distància v. L'OF és la primera cubeta
+# no buida, de manera que traure un element costa O(p + dmax) en lloc de
+# recalcular evaluate() en O(p^2).
+def _pairs(sol):
+    if 'pairs' not in sol:
+        inst = sol['instance']
+        d = inst['d']
+        pairs = [0] * (inst['dmax'] + 1)
+        items = list(sol['sol'])
+        evaluations.COUNTS['distances'] += len(items) * (len(items) - 1) // 2
+        for i in range(len(items)):
+            row = d[items[i]]
+            for j in range(i + 1, len(items)):
+                pairs[int(row[items[j]])] += 1
+        sol['pairs'] = pairs
+    return sol['pairs']
+
+
+def _bucketed(sol):
+    # no a les instàncies disperses: no tenen files en memòria
+    inst = sol['instance']
+    return inst.get('integer', False) and inst['d'] is not None
+
+
 def createEmptySolution(instance):
     sol = {}
     sol['instance'] = instance
@@ -18,9 +119,25 @@ def contains(sol, u):
 def evaluate(sol):
     if len(sol['sol']) < 2:
         return 0.0          # <-- abans era inf
-
-    dmat = sol['instance']['d']
+    if _matrixless(sol):
+        index = _index(sol)
+        return min(spatial.nearest(index, s, (s,))[0] for s in sol['sol'])
+    inst = sol['instance']
+    if sparse.isSparse(inst):
+        best = sparse.closestPair(inst, sol['sol'])
+        if best is not None:
+            return best
+        items = list(sol['sol'])
+        if 'coords' not in inst:
+            evaluations.COUNTS['distances'] += len(items) * (len(items) - 1) // 2
+            rows = [sparse.distanceRow(inst, s) for s in items[:-1]]
+            return min(rows[i][items[j]] for i in range(len(rows)) for j in range(i + 1, len(items)))
+        return min(distance(inst, items[i], items[j])
+                   for i in range(len(items)) for j in range(i + 1, len(items)))
+
+    dmat = inst['d']
     items = list(sol['sol'])
+    evaluations.COUNTS['distances'] += len(items) * (len(items) - 1) // 2
     best = float("inf")
     for i in range(len(items)):
         for j in range(i+1, len(items)):
@@ -31,15 +148,28 @@ def evaluate(sol):
 
 def addToSolution(sol, u):
     dmat = sol['instance']['d']
+    if _matrixless(sol):
+        index = _index(sol)
+        min_to_sol = spatial.nearest(index, u)[0] if sol['sol'] else 0.0
+        spatial.insert(index, u)
 
     if len(sol['sol']) == 0:
         sol['sol'].add(u)
         sol['of'] = 0.0      # <-- abans era inf
         return
 
-    min_to_sol = float("inf")
-    for s in sol['sol']:
-        min_to_sol = min(min_to_sol, dmat[u][s])
+    if sparse.isSparse(sol['instance']):
+        min_to_sol = _sparse_distance_to_sol(sol, u)
+    elif dmat is not None:
+        evaluations.COUNTS['distances'] += len(sol['sol'])
+        min_to_sol = float("inf")
+        for s in sol['sol']:
+            min_to_sol = min(min_to_sol, dmat[u][s])
+    if dmat is not None and _bucketed(sol):
+        pairs = _pairs(sol)
+        row = dmat[u]
+        for s in sol['sol']:
+            pairs[int(row[s])] += 1
 
     # si ja tenies un valor real, mantens el min
     if sol['of'] == 0.0 and len(sol['sol']) == 1:
@@ -48,13 +178,33 @@ def addToSolution(sol, u):
         sol['of'] = min(sol['of'], min_to_sol)
 
     sol['sol'].add(u)
+    _check_threshold(sol)
 
 
 
 def removeFromSolution(sol, u):
+    if _bucketed(sol):
+        pairs = _pairs(sol)
+        sol['sol'].remove(u)
+        row = sol['instance']['d'][u]
+        evaluations.COUNTS['distances'] += len(sol['sol'])
+        for s in sol['sol']:
+            pairs[int(row[s])] -= 1
+        if len(sol['sol']) < 2:
+            sol['of'] = 0.0
+        else:
+            # traure només pot pujar el mínim: busquem des de l'OF anterior
+            v = int(sol['of'])
+            while pairs[v] == 0:
+                v += 1
+            sol['of'] = v
+        return
     sol['sol'].remove(u)
+    if _matrixless(sol):
+        spatial.remove(_index(sol), u)
     # easiest safe way: recompute of
     sol['of'] = evaluate(sol)
+    _check_threshold(sol)
 
 
 def distanceToSol(sol, u, without=-1):
@@ -66,7 +216,12 @@ def distanceToSol(sol, u, without=-1):
     dmat = sol['instance']['d']
     if len(sol['sol']) == 0:
         return float("inf")
+    if sparse.isSparse(sol['instance']):
+        return _sparse_distance_to_sol(sol, u, without)
+    if dmat is None:
+        return spatial.nearest(_index(sol), u, (without,))[0]
 
+    evaluations.COUNTS['distances'] += len(sol['sol'])
     best = float("inf")
     for s in sol['sol']:
         if s == without:
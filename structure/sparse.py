@@ -0,0 +1,174 @@
+"""
+Threshold-sparse neighbour lists.
+
+Max-Min only ever looks at small distances: the nearest selected neighbour
+of a node, the closest pair of a solution. A sparse instance keeps, per
+node u, its neighbours with d < threshold sorted by distance in two compact
+arrays (ids and distances: 2-4 + 2-8 bytes per pair), and no n x n matrix
+in memory (inst['d'] is None). The distances that fall outside the lists
+are computed when needed: from the coordinates of a Geo instance, or read
+row by row from an unlinked temporary file that holds the int16/int32 rows
+of a Ran instance (structure/instance). structure/solution answers "nearest
+selected neighbour of u" by scanning the list of u up to the first selected
+node, and the closest pair of a solution with a bisect cut at the best pair
+so far; only when nothing selected is below the threshold does it compute
+the true distances to the whole selection. Distances are always exact, so
+OFs and trajectories are those of the dense instance.
+Each stored pair costs two list entries (4 bytes each for int16 ids and
+distances), against 2 x 2 bytes for the same pair in int16 rows, so a Ran
+instance only takes less memory than its compact rows while the lists keep
+well under half of the pairs.
+Once a complete solution reaches the threshold the lists no longer help
+(every query falls back), so structure/solution raises it and the lists
+are rebuilt.
+"""
+import array
+import bisect
+import math
+import os
+import tempfile
+
+from structure import evaluations
+
+GROWTH = 1.25
+INF = float('inf')
+
+
+def _coord_row(coords, u):
+    # same formula as the instance loader (bit for bit), not counted
+    cu = coords[u]
+    row = []
+    for cv in coords:
+        s = 0.0
+        for a, b in zip(cu, cv):
+            diff = a - b
+            s += diff * diff
+        row.append(math.sqrt(s))
+    return row
+
+
+def _spill(inst, meta):
+    # the dense rows go to a temporary file (unlinked: it disappears with the
+    # process) and leave memory; only the descriptor stays in the instance
+    d = inst['d']
+    code = d[0].typecode if inst.get('integer') else 'd'
+    with tempfile.TemporaryFile() as f:
+        for row in d:
+            (row if code != 'd' else array.array('d', row)).tofile(f)
+        f.flush()
+        meta['fd'] = os.dup(f.fileno())
+    meta['code'] = code
+    meta['itemsize'] = array.array(code).itemsize
+    inst['d'] = None
+
+
+def distanceRow(inst, u):
+    """Row u of the distances (from the coordinates or the rows file), not counted."""
+    if 'coords' in inst:
+        return _coord_row(inst['coords'], u)
+    meta, n = inst['sparse'], inst['n']
+    row = array.array(meta['code'])
+    row.frombytes(os.pread(meta['fd'], n * meta['itemsize'], u * n * meta['itemsize']))
+    return row
+
+
+def distance(inst, u, v):
+    """d(u, v) (from the coordinates or the rows file), not counted."""
+    if 'coords' in inst:
+        s = 0.0
+        for a, b in zip(inst['coords'][u], inst['coords'][v]):
+            diff = a - b
+            s += diff * diff
+        return math.sqrt(s)
+    meta = inst['sparse']
+    size = meta['itemsize']
+    return array.array(meta['code'], os.pread(meta['fd'], size, (u * inst['n'] + v) * size))[0]
+
+
+def _build(inst, meta):
+    n, t, d = inst['n'], meta['threshold'], inst['d']
+    id_code = 'H' if n < 2 ** 16 else 'i'
+    dist_code = meta.get('code') or (d[0].typecode if d is not None and inst.get('integer') else 'd')
+    ids, dists = [], []
+    for u in range(n):
+        row = d[u] if d is not None else distanceRow(inst, u)
+        near = sorted((row[v], v) for v in range(n) if v != u and row[v] < t)
+        ids.append(array.array(id_code, [v for _, v in near]))
+        dists.append(array.array(dist_code, [dv for dv, _ in near]))
+    meta['ids'] = ids
+    meta['dists'] = dists
+
+
+def sparsify(inst, threshold):
+    """Adds the neighbour lists (d < threshold) to inst and returns it. The
+    dense rows of inst (Ran, compact if integer) are moved to the rows file
+    and inst['d'] becomes None; a Geo instance comes with d None and its
+    coordinates."""
+    meta = {'threshold': threshold, 'raises': 0}
+    inst['sparse'] = meta
+    _build(inst, meta)
+    if inst['d'] is not None:
+        _spill(inst, meta)
+    return inst
+
+
+def isSparse(inst):
+    return 'sparse' in inst
+
+
+def threshold(inst):
+    return inst['sparse']['threshold']
+
+
+def raiseThreshold(inst):
+    """threshold *= GROWTH; lists rebuilt from the distances of inst."""
+    meta = inst['sparse']
+    meta['threshold'] *= GROWTH
+    meta['raises'] += 1
+    _build(inst, meta)
+
+
+def nearestSelected(inst, u, selected, without=-1):
+    """Distance from u to its nearest node of `selected` (ignoring `without`),
+    or None if none is below the threshold."""
+    if u in selected and u != without:
+        return 0.0
+    ids = inst['sparse']['ids'][u]
+    for k, v in enumerate(ids):
+        if v in selected and v != without:
+            evaluations.COUNTS['distances'] += k + 1
+            return inst['sparse']['dists'][u][k]
+    evaluations.COUNTS['distances'] += len(ids)
+    return None
+
+
+def closestPair(inst, selected):
+    """Smallest distance between two nodes of `selected`, or None if none is
+    below the threshold. Each list is only scanned below the best so far."""
+    meta = inst['sparse']
+    best = INF
+    scanned = 0
+    for s in selected:
+        dists = meta['dists'][s]
+        cut = bisect.bisect_left(dists, best)
+        ids = meta['ids'][s]
+        for k in range(cut):
+            if ids[k] in selected:
+                best = dists[k]
+                scanned += k + 1
+                break
+        else:
+            scanned += cut
+    evaluations.COUNTS['distances'] += scanned
+    return best if best < INF else None
+
+
+def storedPairs(inst):
+    return sum(len(ids) for ids in inst['sparse']['ids']) // 2
+
+
+def memoryBytes(inst):
+    """Bytes of the neighbour lists (array buffers)."""
+    meta = inst['sparse']
+    return sum(a.itemsize * len(a) for a in meta['ids']) + \
+        sum(a.itemsize * len(a) for a in meta['dists'])
@@ -0,0 +1,174 @@
+"""
+k-d tree over the points of a coordinate-backed (Geo) instance, for
+"nearest selected point" queries without an n x n distance matrix.
+
+The tree is built once per instance over all n points (inst['kdtree'])
+and is shared; an index is the tree plus the set of selected points, kept
+as per-node counters, so insert/remove cost O(log n) and the queries skip
+subtrees with nothing selected. Queries prune with the bounding box of each
+node and return exact distances (same formula as the instance loaders, so
+they match the matrix bit for bit).
+"""
+import math
+
+from structure import evaluations
+
+INF = float('inf')
+LEAF_SIZE = 8
+
+
+# ---------------- tree (one per instance) ----------------
+def _build(tree, lo, hi, parent):
+    coords, perm = tree['coords'], tree['perm']
+    node = len(tree['lo'])
+    pts = perm[lo:hi]
+    k = tree['k']
+    bmin = [min(coords[u][t] for u in pts) for t in range(k)]
+    bmax = [max(coords[u][t] for u in pts) for t in range(k)]
+    tree['lo'].append(lo)
+    tree['hi'].append(hi)
+    tree['left'].append(-1)
+    tree['right'].append(-1)
+    tree['parent'].append(parent)
+    tree['bmin'].append(bmin)
+    tree['bmax'].append(bmax)
+
+    if hi - lo <= LEAF_SIZE:
+        for u in pts:
+            tree['leaf_of'][u] = node
+        return node
+
+    # tallem per la dimensió amb més rang, per la mediana
+    dim = max(range(k), key=lambda t: bmax[t] - bmin[t])
+    pts.sort(key=lambda u: coords[u][dim])
+    perm[lo:hi] = pts
+    mid = (lo + hi) // 2
+    tree['left'][node] = _build(tree, lo, mid, node)
+    tree['right'][node] = _build(tree, mid, hi, node)
+    return node
+
+
+def buildTree(coords):
+    n = len(coords)
+    tree = {'coords': coords, 'k': len(coords[0]) if n else 0, 'perm': list(range(n)),
+            'lo': [], 'hi': [], 'left': [], 'right': [], 'parent': [],
+            'bmin': [], 'bmax': [], 'leaf_of': [0] * n}
+    if n:
+        _build(tree, 0, n, -1)
+    return tree
+
+
+def getTree(inst):
+    if 'kdtree' not in inst:
+        inst['kdtree'] = buildTree(inst['coords'])
+    return inst['kdtree']
+
+
+def distance(coords, u, v):
+    evaluations.COUNTS['distances'] += 1
+    s = 0.0
+    for a, b in zip(coords[u], coords[v]):
+        diff = a - b
+        s += diff * diff
+    return math.sqrt(s)
+
+
+def distanceRow(coords, u):
+    return [distance(coords, u, v) for v in range(len(coords))]
+
+
+# ---------------- index (one per solution) ----------------
+def createIndex(inst, selected=()):
+    tree = getTree(inst)
+    index = {'tree': tree, 'count': [0] * len(tree['lo']), 'selected': bytearray(len(tree['perm']))}
+    for u in selected:
+        insert(index, u)
+    return index
+
+
+def insert(index, u):
+    if index['selected'][u]:
+        return
+    index['selected'][u] = 1
+    count, parent = index['count'], index['tree']['parent']
+    node = index['tree']['leaf_of'][u]
+    while node != -1:
+        count[node] += 1
+        node = parent[node]
+
+
+def remove(index, u):
+    if not index['selected'][u]:
+        return
+    index['selected'][u] = 0
+    count, parent = index['count'], index['tree']['parent']
+    node = index['tree']['leaf_of'][u]
+    while node != -1:
+        count[node] -= 1
+        node = parent[node]
+
+
+def _box_dist2(bmin, bmax, q):
+    s = 0.0
+    for lo, hi, x in zip(bmin, bmax, q):
+        if x < lo:
+            s += (lo - x) * (lo - x)
+        elif x > hi:
+            s += (x - hi) * (x - hi)
+    return s
+
+
+def nearestTwo(index, u, exclude=()):
+    """(d1, s1, d2, s2): the two selected points nearest to point u, ignoring
+    the ids in exclude (None if there are not enough)."""
+    return nearestTwoTo(index, index['tree']['coords'][u], exclude)
+
+
+def nearestTwoTo(index, q, exclude=()):
+    """nearestTwo for any point given by its coordinates q."""
+    tree = index['tree']
+    coords, perm = tree['coords'], tree['perm']
+    left, right = tree['left'], tree['right']
+    bmin, bmax = tree['bmin'], tree['bmax']
+    count, selected = index['count'], index['selected']
+
+    b1 = b2 = INF
+    a1 = a2 = None
+    computed = 0
+    stack = [0] if count else []
+    while stack:
+        node = stack.pop()
+        if count[node] == 0 or _box_dist2(bmin[node], bmax[node], q) > b2:
+            continue
+        l = left[node]
+        if l == -1:
+            for pos in range(tree['lo'][node], tree['hi'][node]):
+                v = perm[pos]
+                if not selected[v] or v in exclude:
+                    continue
+                computed += 1
+                s = 0.0
+                for a, b in zip(q, coords[v]):
+                    diff = a - b
+                    s += diff * diff
+                if s < b1:
+                    b2, a2 = b1, a1
+                    b1, a1 = s, v
+                elif s < b2:
+                    b2, a2 = s, v
+            continue
+        r = right[node]
+        # el fill més pròxim es visita primer (va al cim de la pila)
+        if _box_dist2(bmin[l], bmax[l], q) <= _box_dist2(bmin[r], bmax[r], q):
+            stack.append(r)
+            stack.append(l)
+        else:
+            stack.append(l)
+            stack.append(r)
+    evaluations.COUNTS['distances'] += computed
+    return math.sqrt(b1), a1, math.sqrt(b2), a2
+
+
+def nearest(index, u, exclude=()):
+    d1, s1, _, _ = nearestTwo(index, u, exclude)
+    return d1, s1
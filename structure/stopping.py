@@ -0,0 +1,124 @@
+import time
+
+from structure import deadline as dl
+from structure import evaluations
+
+EPS = 1e-9
+
+# Stop reasons (what improve()/drivers report)
+LOCAL_OPTIMUM = "local_optimum"
+MAX_ITER = "max_iter"
+STAGNATION = "stagnation"
+TIME = "time"
+EVALUATIONS = "evaluations"
+DEADLINE = "deadline"
+
+
+# ---------------- Policies ----------------
+# A policy is a plain dict describing *when* to stop. It holds no run state,
+# so the same policy can be reused for every local search call.
+
+def maxIterations(limit):
+    return {'kind': MAX_ITER, 'limit': limit}
+
+
+def stagnation(window, max_iter=None):
+    """Stop after `window` iterations without improving the objective."""
+    policy = {'kind': STAGNATION, 'window': window}
+    if max_iter is None:
+        return policy
+    return anyOf(policy, maxIterations(max_iter))
+
+
+def timeSlice(seconds):
+    return {'kind': TIME, 'seconds': seconds}
+
+
+def evaluationBudget(budget):
+    """Stop after `budget` move evaluations (charged by the caller)."""
+    return {'kind': EVALUATIONS, 'budget': budget}
+
+
+def anyOf(*policies):
+    return {'kind': 'any', 'policies': list(policies)}
+
+
+def defaultLocalSearch(inst):
+    # the old hardcoded cap of the GRASP drivers
+    return maxIterations(50 if inst["n"] >= 500 else 200)
+
+
+# ---------------- Run state ----------------
+def start(policy, of=0.0, deadline=None):
+    """deadline: optional structure/deadline shared by the whole run; once
+    expired it stops the search (inner checks included)."""
+    return {
+        'policy': policy,
+        'deadline': deadline,
+        'it': 0,
+        'evals': 0,
+        'best_of': of,
+        'last_improve': 0,
+        't0': time.perf_counter(),
+    }
+
+
+def charge(state, evals=1):
+    """Charges `evals` move evaluations to the run (and to the per-process
+    counters of structure/evaluations, also without a state)."""
+    evaluations.COUNTS['moves'] += evals
+    if state is not None:
+        state['evals'] += evals
+
+
+def step(state, of):
+    """Registers one finished iteration with objective `of`.
+    Returns the stop reason or None."""
+    state['it'] += 1
+    if of > state['best_of'] + EPS:
+        state['best_of'] = of
+        state['last_improve'] = state['it']
+    return check(state)
+
+
+def check(state):
+    if dl.expired(state['deadline']):
+        return DEADLINE
+    return _reason(state['policy'], state)
+
+
+def exhausted(state):
+    """Cheap check for inner loops: only budgets that can run out in the
+    middle of an iteration (time, evaluations)."""
+    if state is None:
+        return None
+    if dl.expired(state['deadline']):
+        return DEADLINE
+    return _reason(state['policy'], state, inner=True)
+
+
+def _reason(policy, state, inner=False):
+    kind = policy['kind']
+    if kind == 'any':
+        for p in policy['policies']:
+            r = _reason(p, state, inner)
+            if r is not None:
+                return r
+        return None
+    if kind == TIME:
+        if time.perf_counter() - state['t0'] >= policy['seconds']:
+            return TIME
+        return None
+    if kind == EVALUATIONS:
+        return EVALUATIONS if state['evals'] >= policy['budget'] else None
+    if inner:
+        return None
+    if kind == MAX_ITER:
+        return MAX_ITER if state['it'] >= policy['limit'] else None
+    if kind == STAGNATION:
+        return STAGNATION if state['it'] - state['last_improve'] >= policy['window'] else None
+    raise ValueError(kind)
+
+
+def countReason(reasons, reason):
+    reasons[reason] = reasons.get(reason, 0) + 1
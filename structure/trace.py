@@ -0,0 +1,69 @@
+import time
+
+from structure import evaluations
+
+# Anytime convergence trace of one run: an event (elapsed_s, evaluations,
+# best_of, phase) each time the best OF of the run improves, so a run costs
+# one tuple per improvement. elapsed_s is on the monotonic clock and
+# evaluations are distance lookups (structure/evaluations), both counted
+# from createTrace(). The algorithms take an optional trace and record()
+# their best; a trace with a target also tells them when to stop
+# (reached(), time-to-target runs).
+# start is on the monotonic clock, so a trace can be sent to other processes
+# (grasp_pr_islands: each island records with its own evaluation count).
+
+EPS = 1e-9
+
+
+def createTrace(target=None):
+    return {'start': time.monotonic(), 'evals_start': evaluations.COUNTS['distances'],
+            'target': target, 'best_of': -float('inf'), 'events': []}
+
+
+def record(trace, of, phase):
+    """Adds an event if of improves the best of the trace (None: no trace)."""
+    if trace is None or of <= trace['best_of']:
+        return
+    trace['best_of'] = of
+    trace['events'].append((time.monotonic() - trace['start'],
+                            evaluations.COUNTS['distances'] - trace['evals_start'], of, phase))
+
+
+def reached(trace):
+    return (trace is not None and trace['target'] is not None
+            and trace['best_of'] >= trace['target'] - EPS)
+
+
+def merge(trace, events):
+    """Adds the events of another process (e.g. one island), keeping only the
+    ones that improve the trace in time order."""
+    merged = []
+    best = -float('inf')
+    for event in sorted(trace['events'] + list(events)):
+        if event[2] > best:
+            best = event[2]
+            merged.append(event)
+    trace['events'] = merged
+    trace['best_of'] = best
+
+
+def timeToTarget(trace, target):
+    """(elapsed_s, evaluations) of the first event with best_of >= target, or
+    None if the run never reached it."""
+    for elapsed, evals, of, _ in trace['events']:
+        if of >= target - EPS:
+            return elapsed, evals
+    return None
+
+
+def formatEvents(events):
+    """Events as one CSV field: elapsed:evaluations:best_of:phase;..."""
+    return ";".join(f"{e!r}:{v}:{of!r}:{phase}" for e, v, of, phase in events)
+
+
+def parseEvents(text):
+    events = []
+    for item in text.split(";") if text else ():
+        e, v, of, phase = item.split(":")
+        events.append((float(e), int(v), float(of), phase))
+    return events